@@ -0,0 +1,117 @@
+#!/usr/bin/env python3
+
+"""Compare loading Gradescope exports from CSV with the --export-cache Arrow cache, cold, warm, touched and changed."""
+
+import argparse
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+
+from synthetic import write_evaluations, write_submission_metadata
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.join(BENCH_DIR, "..")
+PLAGIARISM_DIR = os.path.join(ROOT, "plagiarism")
+EXAM_DIR = os.path.join(BENCH_DIR, "..", "gradescope-exam")
+
+LOADERS = {
+    "metadata": """
+cache = ExportCache(default_cache_dir(path)) if cached else None
+rows = len(gm.parse_metadata(path, cache))
+""",
+    "evaluations": """
+cache = ExportCache(default_cache_dir(path)) if cached else None
+rows = evaluations.load_exam(path, cache=cache).scores.size
+""",
+}
+
+HARNESS = """
+import json, resource, sys, time
+sys.path[:0] = [{plagiarism!r}, {exam!r}, {root!r}]
+import pandas  # gradescope_metadata imports it on first parse; keep that out of the timing.
+import gradescope_metadata as gm
+import evaluations
+from teaching_utilities.export_cache import ExportCache, default_cache_dir
+path, cached = {path!r}, {cached!r}
+baseline = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+start = time.perf_counter()
+{body}
+elapsed = time.perf_counter() - start
+if cache:
+    cache.save()
+peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+print(json.dumps({{"rows": rows, "seconds": elapsed, "peak_rss_mb": peak / 1024, "delta_rss_mb": (peak - baseline) / 1024,
+                  "parsed": cache.misses if cache else None}}))
+"""
+
+
+def run(kind: str, path: str, cached: bool) -> dict:
+    code = HARNESS.format(plagiarism=PLAGIARISM_DIR, exam=EXAM_DIR, root=ROOT, path=path, cached=cached, body=LOADERS[kind])
+    output = subprocess.run([sys.executable, "-c", code], check=True, capture_output=True, text=True).stdout
+    return json.loads(output)
+
+
+def touch_all(path: str):
+    files = [path] if os.path.isfile(path) else [os.path.join(path, name) for name in os.listdir(path) if name.endswith(".csv")]
+    for name in files:
+        stat = os.stat(name)
+        os.utime(name, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10 ** 9))
+
+
+def edit_one(directory: str):
+    name = os.path.join(directory, sorted(name for name in os.listdir(directory) if name.endswith(".csv"))[0])
+    with open(name, "a") as f:
+        f.write("\n")
+
+
+def cases(kind: str, path: str) -> dict:
+    shutil.rmtree(os.path.join(path if os.path.isdir(path) else os.path.dirname(path), ".export-cache"),
+                  ignore_errors=True)
+    results = {"csv": run(kind, path, False), "cold": run(kind, path, True), "warm": run(kind, path, True)}
+    touch_all(path)
+    results["touched"] = run(kind, path, True)
+    if os.path.isdir(path):
+        edit_one(path)
+        results["changed"] = run(kind, path, True)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the columnar export cache against parsing CSV")
+    parser.add_argument("--students", type=int, default=5000)
+    parser.add_argument("--items", type=int, default=100, help="Items in submission_metadata.csv")
+    parser.add_argument("--exam-students", type=int, default=2000)
+    parser.add_argument("--exam-items", type=int, default=200, help="Item files in the evaluations export")
+    parser.add_argument("--json", type=str, help="Also write the results to this JSON file")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        metadata = os.path.join(tmp, "submission_metadata.csv")
+        print(f"Generating {args.students} students x {args.items} items of metadata...")
+        write_submission_metadata(metadata, args.students, args.items)
+        export = os.path.join(tmp, "evaluations")
+        print(f"Generating {args.exam_students} students x {args.exam_items} evaluation files...")
+        write_evaluations(export, args.exam_students, args.exam_items)
+        sizes = {"metadata": os.path.getsize(metadata) / 2 ** 20,
+                 "evaluations": sum(os.path.getsize(os.path.join(export, name)) for name in os.listdir(export)) / 2 ** 20}
+
+        results = {"metadata": cases("metadata", metadata), "evaluations": cases("evaluations", export)}
+
+    for kind, runs in results.items():
+        print(f"\n{kind} ({sizes[kind]:.1f} MB of CSV)")
+        print(f"{'case':<10}{'seconds':>10}{'speedup':>10}{'peak RSS MB':>14}{'parsed':>8}")
+        for case, result in runs.items():
+            speedup = runs["csv"]["seconds"] / result["seconds"] if result["seconds"] else float("inf")
+            parsed = "-" if result["parsed"] is None else result["parsed"]
+            print(f"{case:<10}{result['seconds']:>10.2f}{speedup:>9.1f}x{result['peak_rss_mb']:>14.1f}{parsed:>8}")
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({"size_mb": sizes, "results": results}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
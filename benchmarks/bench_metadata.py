@@ -0,0 +1,81 @@
+#!/usr/bin/env python3
+
+"""Compare the memory and time needed to load submission_metadata.csv whole, by column, and streamed."""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+
+from synthetic import write_submission_metadata
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+PLAGIARISM_DIR = os.path.join(BENCH_DIR, "..", "plagiarism")
+
+LOADERS = {
+    "full": """
+metadata = pd.read_csv(path)
+columns = gm.STUDENT_DATA + [metadata.columns[i] for i in range(12, len(metadata.columns), 5)]
+rows = len(metadata[columns])
+""",
+    "columnar": """
+rows = len(gm.parse_metadata(path))
+""",
+    "streaming": """
+rows = sum(len(chunk) for chunk in gm.iter_metadata(path, chunksize=1000))
+""",
+}
+
+HARNESS = """
+import json, resource, sys, time
+sys.path.insert(0, {plagiarism!r})
+import pandas as pd
+import gradescope_metadata as gm
+path = {path!r}
+baseline = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+start = time.perf_counter()
+{body}
+elapsed = time.perf_counter() - start
+peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+print(json.dumps({{"rows": rows, "seconds": elapsed, "peak_rss_mb": peak / 1024, "delta_rss_mb": (peak - baseline) / 1024}}))
+"""
+
+
+def run_loader(name: str, path: str) -> dict:
+    code = HARNESS.format(plagiarism=PLAGIARISM_DIR, path=path, body=LOADERS[name])
+    output = subprocess.run([sys.executable, "-c", code], check=True, capture_output=True, text=True).stdout
+    return json.loads(output)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark loading a wide submission_metadata.csv")
+    parser.add_argument("--students", type=int, default=10000)
+    parser.add_argument("--items", type=int, default=100)
+    parser.add_argument("--metadata", type=str, help="Use an existing submission_metadata.csv instead of generating one")
+    parser.add_argument("--json", type=str, help="Also write the results to this JSON file")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = args.metadata
+        if not path:
+            path = os.path.join(tmp, "submission_metadata.csv")
+            print(f"Generating {args.students} students x {args.items} items...")
+            write_submission_metadata(path, args.students, args.items)
+        size_mb = os.path.getsize(path) / 2 ** 20
+
+        results = {name: run_loader(name, path) for name in LOADERS}
+
+    print(f"{size_mb:.1f} MB export")
+    print(f"{'loader':<12}{'seconds':>10}{'peak RSS MB':>14}{'load RSS MB':>14}")
+    for name, result in results.items():
+        print(f"{name:<12}{result['seconds']:>10.2f}{result['peak_rss_mb']:>14.1f}{result['delta_rss_mb']:>14.1f}")
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({"size_mb": size_mb, "results": results}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
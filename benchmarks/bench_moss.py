@@ -0,0 +1,111 @@
+#!/usr/bin/env python3
+
+"""Measure gradescope-to-moss.py file generation against the original per-row DataFrame.apply implementation."""
+
+import argparse
+import contextlib
+import importlib.util
+import json
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+import pandas as pd
+
+from synthetic import write_submission_metadata
+
+PLAGIARISM_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "plagiarism")
+sys.path.insert(0, PLAGIARISM_DIR)
+
+from gradescope_metadata import parse_metadata  # noqa: E402
+
+
+def load_script(name: str):
+    spec = importlib.util.spec_from_file_location(name.replace("-", "_"), os.path.join(PLAGIARISM_DIR, name))
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def legacy_generate_moss_file(moss_directory: str, row: pd.Series):
+    # The implementation this benchmark replaced, kept verbatim for comparison but for iloc[6:], which dropped the
+    # first item.
+    student_id = row["Student ID"]
+    first_name = row["First Name"]
+    last_name = row["Last Name"]
+    email = row["Email"]
+    filename = f"{student_id}-{first_name}-{last_name}.txt"
+    with open(os.path.join(moss_directory, filename), "w") as f:
+        f.write(f"{first_name}\n{last_name}\n{student_id}\n{email}\n\n\n\n")
+        extracted_columns = row.iloc[5:]
+        for index, value in extracted_columns.items():
+            f.write(f"{index}\n\n{value}\n\n\n\n")
+    print(f"Created Moss submission for {first_name} {last_name} ({student_id})")
+
+
+def legacy_generate_moss(moss_directory: str, submissions: pd.DataFrame):
+    submissions.apply(lambda row: legacy_generate_moss_file(moss_directory, row), axis=1)
+
+
+def timed(function) -> float:
+    start = time.perf_counter()
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        function()
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark MOSS file generation")
+    parser.add_argument("--students", type=int, default=5000)
+    parser.add_argument("--items", type=int, default=20)
+    parser.add_argument("--workers", type=int, default=8)
+    parser.add_argument("--json", type=str, help="Also write the results to this JSON file")
+    args = parser.parse_args()
+
+    moss = load_script("gradescope-to-moss.py")
+    with tempfile.TemporaryDirectory() as tmp:
+        metadata_file = os.path.join(tmp, "submission_metadata.csv")
+        write_submission_metadata(metadata_file, args.students, args.items)
+        submissions = parse_metadata(metadata_file)
+
+        def fresh(name):
+            path = os.path.join(tmp, name)
+            shutil.rmtree(path, ignore_errors=True)
+            os.makedirs(path)
+            return path
+
+        legacy_dir, new_dir = fresh("legacy"), fresh("new")
+        runs = {
+            "legacy apply": timed(lambda: legacy_generate_moss(legacy_dir, submissions)),
+            f"threaded ({args.workers} workers)": timed(lambda: moss.generate_moss(new_dir, submissions,
+                                                                                   workers=args.workers)),
+        }
+        for suffix in (".zip", ".tar.gz"):
+            archive = os.path.join(tmp, "moss" + suffix)
+
+            def write_archive():
+                with moss.open_archive(archive) as add:
+                    for filename, contents in moss.moss_files(submissions):
+                        add(filename, contents)
+            runs[f"archive ({suffix})"] = timed(write_archive)
+
+        for filename in os.listdir(legacy_dir):
+            with open(os.path.join(legacy_dir, filename)) as a, open(os.path.join(new_dir, filename)) as b:
+                assert a.read() == b.read(), f"{filename} differs from the legacy output"
+
+    results = {name: {"seconds": seconds, "files_per_second": args.students / seconds} for name, seconds in runs.items()}
+    print(f"{args.students} students x {args.items} items")
+    print(f"{'implementation':<24}{'seconds':>10}{'files/s':>12}{'speedup':>10}")
+    baseline = runs["legacy apply"]
+    for name, seconds in runs.items():
+        print(f"{name:<24}{seconds:>10.2f}{args.students / seconds:>12.0f}{baseline / seconds:>9.1f}x")
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({"students": args.students, "items": args.items, "results": results}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,78 @@
+#!/usr/bin/env python3
+
+"""Compare requests and prompt tokens for one ChatGPT request per response against packed requests."""
+
+import argparse
+import importlib.util
+import json
+import os
+import random
+import sys
+
+PLAGIARISM_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "plagiarism")
+sys.path.insert(0, PLAGIARISM_DIR)
+
+from response_packing import build_pack_messages, estimate_tokens, pack_items  # noqa: E402
+
+# Tokens the chat format adds around each message.
+MESSAGE_OVERHEAD_TOKENS = 4
+
+WORDS = ("the function returns a list of values because each loop iteration appends the "
+         "result so that time complexity is linear in the input size and memory grows with n "
+         "we use a dictionary to count occurrences then sort by frequency").split()
+
+
+def load_script(name: str):
+    spec = importlib.util.spec_from_file_location(name.replace("-", "_"), os.path.join(PLAGIARISM_DIR, name))
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def synthetic_responses(count: int, mean_words: int, seed: int) -> list:
+    rng = random.Random(seed)
+    responses = []
+    for _ in range(count):
+        length = max(1, int(rng.expovariate(1 / mean_words)))
+        responses.append(" ".join(rng.choice(WORDS) for _ in range(length)))
+    return responses
+
+
+def prompt_tokens(messages: list) -> int:
+    return sum(estimate_tokens(message["content"]) + MESSAGE_OVERHEAD_TOKENS for message in messages)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark packed ChatGPT requests against one request per response")
+    parser.add_argument("--responses", type=int, default=2400, help="Number of synthetic responses (default: 2400)")
+    parser.add_argument("--mean-words", type=int, default=25, help="Mean words per response (default: 25)")
+    parser.add_argument("--budgets", type=int, nargs="+", default=[500, 1000, 2000, 4000],
+                        help="Pack token budgets to compare")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", type=str, help="Also write the results to this JSON file")
+    args = parser.parse_args()
+
+    chatgpt = load_script("gradescope-to-chatgpt.py")
+    responses = synthetic_responses(args.responses, args.mean_words, args.seed)
+
+    baseline = sum(prompt_tokens(chatgpt.build_messages(text)) for text in responses)
+    rows = [{"mode": "one per request", "requests": len(responses), "prompt_tokens": baseline}]
+    for budget in args.budgets:
+        packs = pack_items([(f"r{i}", text) for i, text in enumerate(responses)], budget)
+        tokens = sum(prompt_tokens(build_pack_messages(pack)) for pack in packs)
+        rows.append({"mode": f"packed ({budget} tokens)", "requests": len(packs), "prompt_tokens": tokens})
+
+    print(f"{'mode':<24}{'requests':>10}{'prompt tokens':>16}{'requests saved':>16}{'tokens saved':>14}")
+    for row in rows:
+        row["requests_saved"] = 1 - row["requests"] / rows[0]["requests"]
+        row["tokens_saved"] = 1 - row["prompt_tokens"] / rows[0]["prompt_tokens"]
+        print(f"{row['mode']:<24}{row['requests']:>10}{row['prompt_tokens']:>16}"
+              f"{row['requests_saved']:>16.1%}{row['tokens_saved']:>14.1%}")
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({"responses": args.responses, "mean_words": args.mean_words, "results": rows}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,71 @@
+#!/usr/bin/env python3
+
+"""Measure drive/revoke-access.py against a fake Drive API with a fixed round trip."""
+
+import argparse
+import importlib.util
+import json
+import os
+import sys
+import time
+
+from fake_drive import DriveHandler, FakeDrive
+from fake_service import serve
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+DRIVE_DIR = os.path.join(ROOT, "drive")
+# drive_api imports teaching_utilities from the repository root.
+sys.path[:0] = [DRIVE_DIR, ROOT]
+
+from drive_api import BATCH_SIZE, DriveClient  # noqa: E402
+
+
+def load_script(name: str):
+    spec = importlib.util.spec_from_file_location(name.replace("-", "_"), os.path.join(DRIVE_DIR, name))
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def run(revoke, args, workers: int, batch_size: int) -> dict:
+    drive = FakeDrive(args.depth, args.fanout, args.files, args.permissions, shared_drive=args.shared_drive,
+                      latency=args.latency)
+    server = serve(drive, DriveHandler)
+    try:
+        start = time.perf_counter()
+        with DriveClient("token", api_url=f"http://127.0.0.1:{server.server_port}", workers=workers) as client:
+            counts = revoke.revoke_tree(client, revoke.Checkpoint(None, "root"), ["*"], workers=workers,
+                                        batch_size=batch_size, all_sharing=True)
+        elapsed = time.perf_counter() - start
+    finally:
+        server.shutdown()
+    return {"workers": workers, "batch_size": batch_size, "seconds": elapsed, "requests": drive.stats["requests"],
+            "revoked": counts["revoked"]}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark revoke-access.py against a fake Drive API")
+    parser.add_argument("--depth", type=int, default=2)
+    parser.add_argument("--fanout", type=int, default=4)
+    parser.add_argument("--files", type=int, default=20)
+    parser.add_argument("--permissions", type=int, default=3)
+    parser.add_argument("--latency", type=float, default=0.05, help="Seconds per request (default: 0.05)")
+    parser.add_argument("--shared-drive", action="store_true", help="List permissions separately, as in shared drives")
+    parser.add_argument("--workers", type=int, default=8)
+    parser.add_argument("--json", type=str, help="Also write the results to this JSON file")
+    args = parser.parse_args()
+
+    revoke = load_script("revoke-access.py")
+    results = [run(revoke, args, 1, 1), run(revoke, args, args.workers, 1), run(revoke, args, args.workers, BATCH_SIZE)]
+
+    print(f"{'workers':>8}{'batch':>7}{'seconds':>10}{'requests':>10}{'revoked':>9}")
+    for result in results:
+        print(f"{result['workers']:>8}{result['batch_size']:>7}{result['seconds']:>10.2f}{result['requests']:>10}"
+              f"{result['revoked']:>9}")
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,153 @@
+#!/usr/bin/env python3
+
+"""A local fake of the Drive v3 endpoints drive/revoke-access.py uses."""
+
+import argparse
+import itertools
+import json
+import re
+from urllib.parse import parse_qs, urlsplit
+
+from fake_service import FakeService, Handler, serve, wait_forever
+
+FOLDER_MIME_TYPE = "application/vnd.google-apps.folder"
+MIME_TYPES = ["application/pdf", "application/x-tex", "image/png", "text/plain"]
+
+
+class FakeDrive(FakeService):
+    def __init__(self, depth: int = 3, fanout: int = 4, files: int = 20, permissions: int = 3,
+                 page_size: int = 100, shared_drive: bool = False, rate_limit_every: int = 0, latency: float = 0.0):
+        super().__init__(latency)
+        self.files = {}
+        self.children = {}
+        self.page_size = page_size
+        self.shared_drive = shared_drive
+        self.rate_limit_every = rate_limit_every
+        self.calls = itertools.count(1)
+        self._add_folder("root", None, "root", depth, fanout, files, permissions)
+
+    def _add(self, file_id: str, parent: str, name: str, mime_type: str, permissions: int):
+        owner = {"id": "owner", "type": "user", "role": "owner", "emailAddress": "instructor@example.edu"}
+        shares = [{"id": f"{file_id}-p{i}", "type": "user", "role": ("reader", "writer", "commenter")[i % 3],
+                   "emailAddress": f"student{i}@example.edu"} for i in range(permissions)]
+        if self.shared_drive:
+            shares.append({"id": "staff", "type": "group", "role": "writer", "emailAddress": "staff@example.edu",
+                           "permissionDetails": [{"permissionType": "file", "role": "writer", "inherited": True}]})
+        self.files[file_id] = {"id": file_id, "name": name, "mimeType": mime_type,
+                               "permissions": {permission["id"]: permission for permission in [owner] + shares}}
+        if parent is not None:
+            self.children.setdefault(parent, []).append(file_id)
+
+    def _add_folder(self, folder_id, parent, name, depth, fanout, files, permissions):
+        self._add(folder_id, parent, name, FOLDER_MIME_TYPE, 1)
+        for i in range(files):
+            self._add(f"{folder_id}-f{i}", folder_id, f"{name}-{i}", MIME_TYPES[i % len(MIME_TYPES)], permissions)
+        if depth > 0:
+            for i in range(fanout):
+                self._add_folder(f"{folder_id}-d{i}", folder_id, f"{name}-{i}", depth - 1, fanout, files, permissions)
+
+    def snapshot(self) -> dict:
+        return dict(super().snapshot(), remaining=self.remaining())
+
+    def remaining(self) -> int:
+        with self.lock:
+            return sum(1 for file in self.files.values() for permission in file["permissions"].values()
+                       if permission["role"] != "owner" and not self.inherited(permission))
+
+    @staticmethod
+    def inherited(permission: dict) -> bool:
+        return any(detail["inherited"] for detail in permission.get("permissionDetails", []))
+
+    def rate_limited(self) -> bool:
+        with self.lock:
+            limited = self.rate_limit_every > 0 and next(self.calls) % self.rate_limit_every == 0
+            self.stats["rate_limited"] += limited
+            return limited
+
+    def call(self, method: str, path: str, query: dict) -> tuple:
+        """Handle one API call; (status, JSON body)."""
+        if self.rate_limited():
+            return 403, {"error": {"code": 403, "errors": [{"reason": "userRateLimitExceeded"}]}}
+        match = re.fullmatch(r"/drive/v3/files/([^/]+)/permissions(?:/([^/]+))?", path)
+        if match:
+            file = self.files.get(match.group(1))
+            if file is None:
+                return 404, {"error": {"code": 404, "errors": [{"reason": "notFound"}]}}
+            if method == "DELETE":
+                if self.inherited(file["permissions"].get(match.group(2), {})):
+                    return 403, {"error": {"code": 403, "errors": [{"reason": "cannotDeletePermission"}]}}
+                with self.lock:
+                    found = file["permissions"].pop(match.group(2), None)
+                    self.stats["deletes"] += found is not None
+                return (204, None) if found else (404, {"error": {"code": 404, "errors": [{"reason": "notFound"}]}})
+            return 200, {"permissions": list(file["permissions"].values())}
+        match = re.fullmatch(r"/drive/v3/files/([^/]+)", path)
+        if match and match.group(1) in self.files:
+            return 200, self._resource(self.files[match.group(1)], True)
+        if path == "/drive/v3/files":
+            parent = re.search(r"'([^']+)' in parents", query.get("q", [""])[0])
+            children = self.children.get(parent.group(1), []) if parent else []
+            start = int(query.get("pageToken", ["0"])[0])
+            page = {"files": [self._resource(self.files[child], not self.shared_drive)
+                              for child in children[start:start + self.page_size]]}
+            if start + self.page_size < len(children):
+                page["nextPageToken"] = str(start + self.page_size)
+            return 200, page
+        return 404, {"error": {"code": 404, "errors": [{"reason": "notFound"}]}}
+
+    @staticmethod
+    def _resource(file: dict, permissions: bool) -> dict:
+        resource = {key: file[key] for key in ("id", "name", "mimeType")}
+        if permissions:
+            resource["permissions"] = list(file["permissions"].values())
+        return resource
+
+    def batch(self, content_type: str, body: bytes) -> tuple:
+        """Answer a multipart/mixed batch; (boundary, response body)."""
+        boundary = re.search(r'boundary="?([^";]+)"?', content_type).group(1)
+        responses = []
+        for part in body.decode("utf-8").split("--" + boundary):
+            headers, _, request = part.partition("\r\n\r\n")
+            content_id = re.search(r"Content-ID:\s*<([^>]+)>", headers, re.I)
+            line = re.match(r"(\w+) (\S+)", request.strip())
+            if not content_id or not line:
+                continue
+            url = urlsplit(line.group(2))
+            status, result = self.call(line.group(1), url.path, parse_qs(url.query))
+            text = json.dumps(result) if result is not None else ""
+            responses.append(f"--batch_response\r\nContent-Type: application/http\r\n"
+                             f"Content-ID: <response-{content_id.group(1)}>\r\n\r\n"
+                             f"HTTP/1.1 {status} {'OK' if status < 300 else 'Error'}\r\n"
+                             f"Content-Type: application/json\r\n\r\n{text}\r\n")
+        self.count("batches")
+        return "batch_response", ("".join(responses) + "--batch_response--\r\n").encode("utf-8")
+
+
+class DriveHandler(Handler):
+    def handle_request(self):
+        url = urlsplit(self.path)
+        body = self.body()
+        if url.path == "/batch/drive/v3":
+            boundary, response = self.service.batch(self.headers["Content-Type"], body)
+            return self.reply(200, response, content_type=f"multipart/mixed; boundary={boundary}")
+        status, result = self.service.call(self.command, url.path, parse_qs(url.query))
+        self.reply(status, result)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Serve a fake Google Drive folder tree named 'root'")
+    parser.add_argument("--port", type=int, default=8790)
+    parser.add_argument("--depth", type=int, default=3, help="Levels of subfolders below root")
+    parser.add_argument("--fanout", type=int, default=4, help="Subfolders per folder")
+    parser.add_argument("--files", type=int, default=20, help="Files per folder, cycling through PDF, TeX, PNG and text")
+    parser.add_argument("--permissions", type=int, default=3, help="Shares per file besides the owner")
+    parser.add_argument("--latency", type=float, default=0.0, help="Seconds to delay every request")
+    parser.add_argument("--shared-drive", action="store_true", help="Leave permissions out of files.list")
+    parser.add_argument("--rate-limit-every", type=int, default=0, help="Rate limit every Nth call")
+    args = parser.parse_args()
+
+    drive = FakeDrive(args.depth, args.fanout, args.files, args.permissions, shared_drive=args.shared_drive,
+                      rate_limit_every=args.rate_limit_every, latency=args.latency)
+    server = serve(drive, DriveHandler, args.port)
+    print(f"Fake Drive with {len(drive.files)} files and {drive.remaining()} shares on http://127.0.0.1:{args.port}")
+    wait_forever(server)
@@ -0,0 +1,246 @@
+#!/usr/bin/env python3
+
+"""A local fake of the GitHub REST and GraphQL endpoints end-term.py and check-token.py use."""
+
+import argparse
+import json
+import os
+import re
+import subprocess
+import time
+from urllib.parse import parse_qs, urlencode, urlsplit
+
+from fake_service import FakeService, Handler, serve, wait_forever
+
+DEFAULT_PER_PAGE = 30
+MAX_PER_PAGE = 100
+
+
+class FakeGitHub(FakeService):
+    def __init__(self, org: str = "course", repos: int = 200, members: int = 150, owners: int = 2, teams: int = 30,
+                 collaborators: int = 2, git_dir: str = None, quota: int = 5000, mutation_gap: float = 0.0,
+                 mutation_burst: int = 0, retry_after: int = 1, latency: float = 0.0, jitter: float = 0.0,
+                 read_only: int = 1):
+        super().__init__(latency, jitter)
+        self.org = org
+        self.git_dir = git_dir
+        self.quota = quota
+        self.remaining = quota
+        self.reset = int(time.time()) + 3600
+        self.mutation_gap = mutation_gap
+        self.mutation_burst = mutation_burst
+        self.retry_after = retry_after
+        self.last_mutation = 0.0
+        self.mutating = 0
+        self.owners = [f"instructor{i}" for i in range(owners)]
+        self.members = [f"student{i}" for i in range(members)]
+        self.repos = {}
+        for i in range(repos):
+            # Classroom names repositories <assignment>-<login>.
+            name = f"hw{i % 5 + 1}-{self.members[i % members] if members else i}"
+            self.repos[name] = {"name": name, "archived": i % 25 == 24, "admin": i < repos - read_only,
+                                "collaborators": [self.members[(i + k) % members] for k in range(min(collaborators, members))]}
+        self.teams = {f"team-{i}": {"id": 1000 + i, "name": f"Team {i}", "slug": f"team-{i}",
+                                    "members": self.members[i::teams] if teams else []} for i in range(teams)}
+        if git_dir:
+            self.create_repositories()
+
+    def create_repositories(self):
+        os.makedirs(self.git_dir, exist_ok=True)
+        for name in self.repos:
+            path = os.path.join(self.git_dir, name + ".git")
+            if not os.path.exists(path):
+                subprocess.run(["git", "init", "-q", "--bare", path], check=True)
+
+    def repo_url(self, name: str) -> str:
+        if self.git_dir:
+            return "file://" + os.path.join(os.path.abspath(self.git_dir), name)
+        return f"https://github.invalid/{self.org}/{name}"
+
+    def use_quota(self) -> dict:
+        """Spend one request of the primary rate limit; its headers, or None if it is exhausted."""
+        with self.lock:
+            if time.time() >= self.reset:
+                self.remaining, self.reset = self.quota, int(time.time()) + 3600
+            if self.remaining <= 0:
+                self.stats["rate_limited"] += 1
+                return None
+            self.remaining -= 1
+            return {"X-RateLimit-Limit": str(self.quota), "X-RateLimit-Remaining": str(self.remaining),
+                    "X-RateLimit-Reset": str(self.reset), "X-RateLimit-Resource": "core"}
+
+    def start_mutation(self) -> bool:
+        """Whether a mutation may go ahead now; False means a secondary rate limit."""
+        with self.lock:
+            now = time.monotonic()
+            burst = (self.mutation_burst and self.mutating >= self.mutation_burst) or \
+                now - self.last_mutation < self.mutation_gap
+            if burst:
+                self.stats["secondary_limited"] += 1
+                return False
+            self.last_mutation = now
+            self.mutating += 1
+            return True
+
+    def end_mutation(self):
+        with self.lock:
+            self.mutating -= 1
+
+    def delete(self, path: str) -> bool:
+        """Remove the object at path; False if there is none."""
+        org = re.escape(self.org)
+        with self.lock:
+            match = re.fullmatch(rf"/repos/{org}/([^/]+)", path)
+            if match:
+                found = self.repos.pop(match.group(1), None)
+            elif re.fullmatch(rf"/orgs/{org}/teams/([^/]+)", path):
+                found = self.teams.pop(path.rsplit("/", 1)[1], None)
+            elif re.fullmatch(rf"/orgs/{org}/memberships/([^/]+)", path):
+                login = path.rsplit("/", 1)[1]
+                found = login in self.members
+                if found:
+                    self.members.remove(login)
+            else:
+                found = None
+            if found:
+                self.stats["deleted"] += 1
+            return bool(found)
+
+    def listing(self, path: str, query: dict):
+        """The full list behind a REST listing path, or None."""
+        org = re.escape(self.org)
+        if path == f"/orgs/{self.org}/repos":
+            return [self.repo_resource(repo) for repo in self.repos.values()]
+        if path == f"/orgs/{self.org}/members":
+            logins = self.owners if query.get("role") == ["admin"] else self.owners + self.members
+            return [self.user(login) for login in logins]
+        if path == f"/orgs/{self.org}/teams":
+            return [{key: team[key] for key in ("id", "name", "slug")} for team in self.teams.values()]
+        match = re.fullmatch(rf"/orgs/{org}/teams/([^/]+)/members", path)
+        if match and match.group(1) in self.teams:
+            return [self.user(login) for login in self.teams[match.group(1)]["members"]]
+        match = re.fullmatch(rf"/repos/{org}/([^/]+)/collaborators", path)
+        if match and match.group(1) in self.repos:
+            if not self.repos[match.group(1)]["admin"]:
+                raise PermissionError("Must have push access to view repository collaborators.")
+            return [self.user(login) for login in self.owners + self.repos[match.group(1)]["collaborators"]]
+        return None
+
+    def user(self, login: str) -> dict:
+        return {"login": login, "id": abs(hash(login)) % 10 ** 8, "type": "User"}
+
+    def repo_resource(self, repo: dict) -> dict:
+        return {"name": repo["name"], "full_name": f"{self.org}/{repo['name']}", "archived": repo["archived"],
+                "clone_url": self.repo_url(repo["name"]) + ".git", "owner": {"login": self.org},
+                "permissions": {"admin": repo["admin"], "push": repo["admin"], "pull": True}}
+
+    def graphql(self, query: str, variables: dict) -> dict:
+        after = int(variables.get("after") or 0)
+        # The first "first: N" sizes the organization's connection, the second a nested one.
+        sizes = [int(size) for size in re.findall(r"first:\s*(\d+)", query)] + [MAX_PER_PAGE, MAX_PER_PAGE]
+        size, nested = sizes[0], sizes[1]
+        with self.lock:
+            if "membersWithRole" in query:
+                field, key = "membersWithRole", "edges"
+                items = [{"role": "ADMIN", "node": {"login": login}} for login in self.owners] + \
+                        [{"role": "MEMBER", "node": {"login": login}} for login in self.members]
+            elif "repositories" in query:
+                field, key = "repositories", "nodes"
+                items = [{"name": repo["name"], "isArchived": repo["archived"], "url": self.repo_url(repo["name"]),
+                          "viewerCanAdminister": repo["admin"],
+                          "collaborators": self.connection(self.owners + repo["collaborators"], nested)
+                          if repo["admin"] else None}
+                         for repo in self.repos.values()]
+            else:
+                field, key = "teams", "nodes"
+                items = [{"name": team["name"], "slug": team["slug"], "databaseId": team["id"],
+                          "members": self.connection(team["members"], nested)} for team in self.teams.values()]
+        page = items[after:after + size]
+        more = after + size < len(items)
+        response = {"data": {"organization": {field: {key: page, "pageInfo": {"hasNextPage": more,
+                                                                              "endCursor": str(after + size)}}}}}
+        # GitHub still answers the rest of the query when a nested field is forbidden.
+        errors = [{"type": "FORBIDDEN", "path": ["organization", field, key, index, "collaborators"],
+                   "message": "Must have push access to view repository collaborators."}
+                  for index, item in enumerate(page) if field == "repositories" and item["collaborators"] is None]
+        if errors:
+            response["errors"] = errors
+        return response
+
+    @staticmethod
+    def connection(logins: list, size: int) -> dict:
+        return {"nodes": [{"login": login} for login in logins[:size]], "pageInfo": {"hasNextPage": len(logins) > size}}
+
+
+class GitHubHandler(Handler):
+    def handle_request(self):
+        url = urlsplit(self.path)
+        query = parse_qs(url.query)
+        body = self.body()
+        headers = self.service.use_quota()
+        if headers is None:
+            return self.reply(403, {"message": "API rate limit exceeded"},
+                              {"X-RateLimit-Limit": str(self.service.quota), "X-RateLimit-Remaining": "0",
+                               "X-RateLimit-Reset": str(self.service.reset)})
+
+        if self.command == "DELETE":
+            if not self.service.start_mutation():
+                return self.reply(403, {"message": "You have exceeded a secondary rate limit."},
+                                  dict(headers, **{"Retry-After": str(self.service.retry_after)}))
+            try:
+                repo = self.service.repos.get(url.path.rsplit("/", 1)[1]) if url.path.startswith("/repos/") else None
+                if repo is not None and not repo["admin"]:
+                    return self.reply(403, {"message": "Must have admin rights to Repository."}, headers)
+                found = self.service.delete(url.path)
+            finally:
+                self.service.end_mutation()
+            return self.reply(204, None, headers) if found else self.reply(404, {"message": "Not Found"}, headers)
+
+        if self.command == "POST" and url.path == "/graphql":
+            self.service.count("graphql")
+            request = json.loads(body or b"{}")
+            return self.reply(200, self.service.graphql(request.get("query", ""), request.get("variables") or {}),
+                              headers)
+
+        if url.path == "/user":
+            return self.reply(200, dict(self.service.user(self.service.owners[0] if self.service.owners else "owner"),
+                                        name="Course Staff"), dict(headers, **{"X-OAuth-Scopes": "repo, admin:org"}))
+        if url.path == f"/orgs/{self.service.org}":
+            return self.reply(200, {"login": self.service.org, "id": 1, "url": f"/orgs/{self.service.org}"}, headers)
+        try:
+            items = self.service.listing(url.path, query)
+        except PermissionError as e:
+            return self.reply(403, {"message": str(e)}, headers)
+        if items is None:
+            return self.reply(404, {"message": "Not Found"}, headers)
+        page = max(1, int(query.get("page", ["1"])[0]))
+        per_page = min(MAX_PER_PAGE, int(query.get("per_page", [str(DEFAULT_PER_PAGE)])[0]))
+        if page * per_page < len(items):
+            following = dict({key: values[0] for key, values in query.items()}, page=page + 1, per_page=per_page)
+            host = self.headers.get("Host", "127.0.0.1")
+            headers["Link"] = f'<http://{host}{url.path}?{urlencode(following)}>; rel="next"'
+        self.reply(200, items[(page - 1) * per_page:page * per_page], headers)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Serve a fake GitHub organization")
+    parser.add_argument("--port", type=int, default=8770)
+    parser.add_argument("--org", type=str, default="course")
+    parser.add_argument("--repos", type=int, default=200)
+    parser.add_argument("--members", type=int, default=150)
+    parser.add_argument("--teams", type=int, default=30)
+    parser.add_argument("--git-dir", type=str, help="Create the repositories here as bare Git repositories")
+    parser.add_argument("--quota", type=int, default=5000, help="Requests per hour before the primary rate limit")
+    parser.add_argument("--mutation-gap", type=float, default=0.0,
+                        help="Seconds required between mutations before the secondary rate limit")
+    parser.add_argument("--mutation-burst", type=int, default=0, help="Mutations allowed in flight at once (0: any)")
+    parser.add_argument("--latency", type=float, default=0.0, help="Seconds to delay every request")
+    parser.add_argument("--read-only", type=int, default=1, help="Repositories the token cannot administer")
+    args = parser.parse_args()
+
+    github = FakeGitHub(args.org, args.repos, args.members, teams=args.teams, git_dir=args.git_dir, quota=args.quota,
+                        mutation_gap=args.mutation_gap, mutation_burst=args.mutation_burst, latency=args.latency,
+                        read_only=args.read_only)
+    server = serve(github, GitHubHandler, args.port)
+    print(f"Fake GitHub organization {args.org} with {len(github.repos)} repositories on http://127.0.0.1:{args.port}")
+    wait_forever(server)
@@ -0,0 +1,135 @@
+#!/usr/bin/env python3
+
+"""A local fake of the MOSS server and report pages plagiarism/submit-to-moss.py uses."""
+
+import argparse
+import html
+import itertools
+import re
+import socketserver
+import threading
+import time
+from urllib.parse import urlsplit
+
+from fake_service import FakeService, Handler, serve, wait_forever
+
+
+class FakeMoss(FakeService):
+    def __init__(self, query_delay: float = 0.5, latency: float = 0.0):
+        super().__init__(latency)
+        self.query_delay = query_delay
+        self.reports = {}
+        self.ids = itertools.count(1)
+        self.http_port = None
+
+    def compare(self, files: list, directory: bool, show: int) -> list:
+        """Rows of (name1, percent1, name2, percent2, lines) for the most similar pairs."""
+        submissions = {}
+        for name, data in files:
+            key = name.split("/", 1)[0] if directory else name
+            submissions.setdefault(key, set()).update(line.strip() for line in data.splitlines() if line.strip())
+        names = sorted(submissions)
+        rows = []
+        for first, second in itertools.combinations(names, 2):
+            a, b = submissions[first], submissions[second]
+            shared = len(a & b)
+            if shared:
+                rows.append((first, 100 * shared // len(a), second, 100 * shared // len(b), shared))
+        rows.sort(key=lambda row: (-max(row[1], row[3]), -row[4]))
+        return rows[:show]
+
+    def query(self, files: list, options: dict) -> str:
+        """Compare one job and return the URL of its report."""
+        time.sleep(self.query_delay)
+        rows = self.compare(files, options.get("directory") == "1", int(options.get("show") or 250))
+        report = str(next(self.ids))
+        with self.lock:
+            self.reports[report] = rows
+        self.count("files", len(files))
+        self.count("queries")
+        return f"http://127.0.0.1:{self.http_port}/results/{report}"
+
+    def index_page(self, report: str) -> str:
+        url = f"http://127.0.0.1:{self.http_port}/results/{report}"
+        rows = "".join(
+            f'<TR><TD><A HREF="{url}/match{k}.html">{html.escape(first)} ({percent1}%)</A>\n'
+            f'    <TD><A HREF="{url}/match{k}.html">{html.escape(second)} ({percent2}%)</A>\n'
+            f"<TD ALIGN=right>{lines}\n"
+            for k, (first, percent1, second, percent2, lines) in enumerate(self.reports[report]))
+        return (f"<HTML>\n<HEAD>\n<TITLE>Moss Results</TITLE>\n</HEAD>\n<BODY>\nMoss Results<p>\n<TABLE>\n"
+                f"<TR><TH>File 1<TH>File 2<TH>Lines Matched\n{rows}</TABLE>\n</BODY>\n</HTML>\n")
+
+    def match_page(self, report: str, match: str, frame: str) -> str:
+        first, percent1, second, percent2, lines = self.reports[report][int(match)]
+        if not frame:
+            return (f'<HTML><FRAMESET ROWS="150,*"><FRAME SRC="match{match}-top.html">'
+                    f'<FRAMESET COLS="50%,50%"><FRAME SRC="match{match}-0.html"><FRAME SRC="match{match}-1.html">'
+                    "</FRAMESET></FRAMESET></HTML>\n")
+        if frame == "top":
+            return f"<HTML><BODY>{html.escape(first)} ({percent1}%) {html.escape(second)} ({percent2}%)</BODY></HTML>\n"
+        name = first if frame == "0" else second
+        return f"<HTML><BODY><PRE>{html.escape(name)}: {lines} lines matched</PRE></BODY></HTML>\n"
+
+
+class MossUpload(socketserver.StreamRequestHandler):
+    service = None
+
+    def handle(self):
+        options, files = {}, []
+        while True:
+            line = self.rfile.readline().decode("utf-8", "replace")
+            if not line:
+                return
+            command, _, rest = line.strip().partition(" ")
+            if command == "language":
+                self.wfile.write(b"yes\n")
+            elif command == "file":
+                _, _, size, name = rest.split(" ", 3)
+                files.append((name, self.rfile.read(int(size)).decode("utf-8", "replace")))
+            elif command == "query":
+                self.wfile.write((self.service.query(files, options) + "\n").encode())
+            elif command == "end":
+                return
+            else:
+                options[command] = rest
+
+
+class ReportHandler(Handler):
+    def handle_request(self):
+        path = urlsplit(self.path).path
+        match = re.fullmatch(r"/results/(\d+)(?:/?|/match(\d+)(?:-(top|0|1))?\.html)", path)
+        if not match or match.group(1) not in self.service.reports:
+            return self.reply(404, b"Not Found", content_type="text/html")
+        report, number, frame = match.groups()
+        if number is None:
+            page = self.service.index_page(report)
+        elif int(number) < len(self.service.reports[report]):
+            page = self.service.match_page(report, number, frame or "")
+        else:
+            return self.reply(404, b"Not Found", content_type="text/html")
+        self.reply(200, page.encode("utf-8"), content_type="text/html; charset=utf-8")
+
+
+def serve_moss(service: FakeMoss, port: int = 0, http_port: int = 0) -> tuple:
+    """Serve uploads on port and reports on http_port in background threads; (upload server, report server)."""
+    reports = serve(service, ReportHandler, http_port)
+    service.http_port = reports.server_port
+    socketserver.ThreadingTCPServer.allow_reuse_address = True
+    uploads = socketserver.ThreadingTCPServer(("127.0.0.1", port), type("MossUpload", (MossUpload,), {"service": service}))
+    uploads.daemon_threads = True
+    threading.Thread(target=uploads.serve_forever, daemon=True).start()
+    return uploads, reports
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Serve a fake MOSS server and its reports")
+    parser.add_argument("--port", type=int, default=7690, help="Upload port (MOSS uses 7690)")
+    parser.add_argument("--http-port", type=int, default=7691, help="Port for the report pages")
+    parser.add_argument("--query-delay", type=float, default=0.5, help="Seconds to compare each job")
+    parser.add_argument("--latency", type=float, default=0.0, help="Seconds to delay every report page")
+    args = parser.parse_args()
+
+    moss = FakeMoss(args.query_delay, args.latency)
+    uploads, reports = serve_moss(moss, args.port, args.http_port)
+    print(f"Fake MOSS on 127.0.0.1:{args.port}, reports on http://127.0.0.1:{args.http_port}")
+    wait_forever(reports)
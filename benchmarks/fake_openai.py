@@ -0,0 +1,106 @@
+#!/usr/bin/env python3
+
+"""A local fake of the OpenAI chat completions endpoint plagiarism/gradescope-to-chatgpt.py uses."""
+
+import argparse
+import itertools
+import json
+import zlib
+from urllib.parse import urlsplit
+
+from fake_service import FakeService, Handler, serve, wait_forever
+
+
+def probability(text: str) -> float:
+    return (zlib.crc32(text.encode("utf-8")) % 100) / 100
+
+
+class FakeOpenAI(FakeService):
+    def __init__(self, latency: float = 0.5, jitter: float = 0.0, rate_limit_every: int = 0, retry_after_ms: int = 200,
+                 rate_limit_headers: dict = None, insufficient_quota: bool = False):
+        super().__init__(latency, jitter)
+        self.rate_limit_every = rate_limit_every
+        self.rate_limit_headers = rate_limit_headers or {"retry-after-ms": str(retry_after_ms)}
+        self.insufficient_quota = insufficient_quota
+        self.calls = itertools.count(1)
+        self.in_flight = 0
+
+    def rate_limited(self) -> bool:
+        with self.lock:
+            limited = self.rate_limit_every > 0 and next(self.calls) % self.rate_limit_every == 0
+            self.stats["rate_limited"] += limited
+            return limited
+
+    def enter(self):
+        with self.lock:
+            self.in_flight += 1
+            self.stats["max_in_flight"] = max(self.stats["max_in_flight"], self.in_flight)
+
+    def leave(self):
+        with self.lock:
+            self.in_flight -= 1
+
+    def complete(self, request: dict) -> dict:
+        messages = request.get("messages") or [{"content": ""}]
+        prompt = "".join(str(message.get("content", "")) for message in messages)
+        text = str(messages[-1].get("content", ""))
+        if (request.get("response_format") or {}).get("type") == "json_object":
+            responses = json.loads(text).get("responses", [])
+            content = json.dumps({"results": [{"id": response["id"], "probability": probability(response["text"]),
+                                               "explanation": "Reads like a student answer."}
+                                              for response in responses]})
+            self.count("packed_responses", len(responses))
+        else:
+            content = f"Reads like a student answer.\nProbability: {probability(text)}"
+            self.count("responses")
+        # About four characters per token, as tiktoken gives for English.
+        usage = {"prompt_tokens": len(prompt) // 4 + 1, "completion_tokens": len(content) // 4 + 1}
+        usage["total_tokens"] = usage["prompt_tokens"] + usage["completion_tokens"]
+        self.count("prompt_tokens", usage["prompt_tokens"])
+        return {"id": "chatcmpl-fake", "object": "chat.completion", "created": 0, "model": request.get("model", ""),
+                "choices": [{"index": 0, "finish_reason": "stop",
+                             "message": {"role": "assistant", "content": content}}],
+                "usage": usage}
+
+
+class OpenAIHandler(Handler):
+    def handle_request(self):
+        body = self.body()
+        if self.command != "POST" or not urlsplit(self.path).path.endswith("/chat/completions"):
+            return self.reply(404, {"error": {"message": "Not found", "type": "invalid_request_error"}})
+        if self.service.insufficient_quota:
+            self.service.count("insufficient_quota")
+            return self.reply(429, {"error": {"message": "You exceeded your current quota",
+                                              "type": "insufficient_quota", "code": "insufficient_quota"}})
+        if self.service.rate_limited():
+            return self.reply(429, {"error": {"message": "Rate limit reached", "type": "requests",
+                                              "code": "rate_limit_exceeded"}}, self.service.rate_limit_headers)
+        self.reply(200, self.service.complete(json.loads(body)))
+
+    def _dispatch(self):
+        # Count requests in flight across the delay, as the real API would see them.
+        if self.path == "/stats":
+            return super()._dispatch()
+        self.service.enter()
+        try:
+            super()._dispatch()
+        finally:
+            self.service.leave()
+
+    do_GET = do_POST = _dispatch
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Serve a fake OpenAI chat completions API")
+    parser.add_argument("--port", type=int, default=8780)
+    parser.add_argument("--latency", type=float, default=0.5, help="Seconds to delay every request")
+    parser.add_argument("--jitter", type=float, default=0.0, help="Up to this many more seconds, at random")
+    parser.add_argument("--rate-limit-every", type=int, default=0, help="Answer every Nth request with 429")
+    parser.add_argument("--insufficient-quota", action="store_true",
+                        help="Answer every request with 429 insufficient_quota")
+    args = parser.parse_args()
+
+    openai = FakeOpenAI(args.latency, args.jitter, args.rate_limit_every, insufficient_quota=args.insufficient_quota)
+    server = serve(openai, OpenAIHandler, args.port)
+    print(f"Fake OpenAI API on http://127.0.0.1:{args.port}/v1")
+    wait_forever(server)
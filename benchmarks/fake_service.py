@@ -0,0 +1,103 @@
+"""Shared plumbing for the local fakes of GitHub, OpenAI, MOSS and Drive."""
+
+import json
+import random
+import threading
+import time
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+def percentiles(values: list, points=(50, 95, 99)) -> dict:
+    """Nearest-rank percentiles and the maximum of values, in milliseconds."""
+    if not values:
+        return {}
+    ordered = sorted(values)
+    summary = {f"p{point}": round(1000 * ordered[min(len(ordered) - 1, int(len(ordered) * point / 100))], 3)
+               for point in points}
+    summary["max"] = round(1000 * ordered[-1], 3)
+    return summary
+
+
+class FakeService:
+    def __init__(self, latency: float = 0.0, jitter: float = 0.0, seed: int = 0):
+        self.latency = latency
+        self.jitter = jitter
+        self.random = random.Random(seed)
+        self.lock = threading.Lock()
+        self.stats = Counter()
+        self.durations = []
+
+    def delay(self):
+        if self.latency or self.jitter:
+            with self.lock:
+                extra = self.random.uniform(0, self.jitter)
+            time.sleep(self.latency + extra)
+
+    def record(self, started: float, kind: str = "requests"):
+        with self.lock:
+            self.stats[kind] += 1
+            self.durations.append(time.perf_counter() - started)
+
+    def count(self, kind: str, amount: int = 1):
+        with self.lock:
+            self.stats[kind] += amount
+
+    def snapshot(self) -> dict:
+        with self.lock:
+            return dict(self.stats, latency_ms=percentiles(self.durations))
+
+
+class Handler(BaseHTTPRequestHandler):
+    """Times every request for its service; subclasses implement handle_request()."""
+
+    protocol_version = "HTTP/1.1"
+    service = None
+
+    def log_message(self, *args):
+        pass
+
+    def reply(self, status: int, body=None, headers: dict = None, content_type: str = "application/json"):
+        data = body if isinstance(body, bytes) else (b"" if body is None else json.dumps(body).encode())
+        self.send_response(status)
+        if data or status not in (204, 304):
+            self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(data)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def body(self) -> bytes:
+        return self.rfile.read(int(self.headers.get("Content-Length") or 0))
+
+    def _dispatch(self):
+        started = time.perf_counter()
+        if self.path == "/stats":
+            self.body()
+            return self.reply(200, self.service.snapshot())
+        self.service.delay()
+        try:
+            self.handle_request()
+        finally:
+            self.service.record(started)
+
+    do_GET = do_POST = do_PUT = do_PATCH = do_DELETE = _dispatch
+
+    def handle_request(self):
+        raise NotImplementedError
+
+
+def serve(service: FakeService, handler: type, port: int = 0) -> ThreadingHTTPServer:
+    """Serve service with a subclass of Handler in a background thread; its port is server.server_port."""
+    server = ThreadingHTTPServer(("127.0.0.1", port), type(handler.__name__, (handler,), {"service": service}))
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def wait_forever(server: ThreadingHTTPServer):
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
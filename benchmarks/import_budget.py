@@ -0,0 +1,92 @@
+#!/usr/bin/env python3
+
+"""Check that every teach subcommand's --help stays within its import-time budget."""
+
+import argparse
+import json
+import os
+import re
+import subprocess
+import sys
+import time
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.insert(0, ROOT)
+from teaching_utilities.cli import COMMANDS  # noqa: E402
+
+BUDGET_MS = 100.0
+RUNS = 5
+HEAVY = {"pandas", "numpy", "pyarrow", "openai", "github", "git", "mosspy", "requests", "google"}
+IMPORT_LINE = re.compile(r"import time:\s+(\d+) \|\s+(\d+) \|( +)(\S+)")
+
+
+def import_times(argv: list) -> tuple:
+    """({top-level module: cumulative microseconds}, every module imported, wall seconds) for one run of argv."""
+    start = time.perf_counter()
+    process = subprocess.run([sys.executable, "-X", "importtime"] + argv, cwd=ROOT, capture_output=True, text=True)
+    seconds = time.perf_counter() - start
+    if process.returncode != 0:
+        raise RuntimeError(f"{' '.join(argv)} exited with status {process.returncode}: {process.stderr[-500:]}")
+    top, modules = {}, set()
+    for line in process.stderr.splitlines():
+        match = IMPORT_LINE.match(line)
+        if not match:
+            continue
+        modules.add(match.group(4))
+        # Nested imports are indented by two spaces per level below the one that triggered them.
+        if len(match.group(3)) == 1:
+            top[match.group(4)] = top.get(match.group(4), 0) + int(match.group(2))
+    return top, modules, seconds
+
+
+def measure(command: str, startup: set, runs: int) -> dict:
+    best = None
+    for _ in range(runs):
+        top, modules, seconds = import_times(["-m", "teaching_utilities.cli", command, "--help"])
+        milliseconds = sum(microseconds for name, microseconds in top.items() if name not in startup) / 1000
+        if best is None or milliseconds < best["import_ms"]:
+            heavy = sorted({name.split(".")[0] for name in modules} & HEAVY)
+            best = {"import_ms": round(milliseconds, 1), "wall_ms": round(seconds * 1000, 1),
+                    "modules": len(modules - startup), "heavy": heavy,
+                    "slowest": sorted(((name, round(microseconds / 1000, 1)) for name, microseconds in top.items()
+                                       if name not in startup), key=lambda pair: -pair[1])[:3]}
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Check the import time of every teach subcommand against a budget")
+    parser.add_argument("--budget", type=float, default=BUDGET_MS,
+                        help=f"Milliseconds of imports allowed per command (default: {BUDGET_MS:.0f})")
+    parser.add_argument("--runs", type=int, default=RUNS, help=f"Runs per command; the best is kept (default: {RUNS})")
+    parser.add_argument("--only", action="append", choices=list(COMMANDS), help="Check only this command; repeatable")
+    parser.add_argument("--json", type=str, help="Also write the results to this JSON file")
+    args = parser.parse_args()
+
+    _, startup, _ = import_times(["-c", "pass"])
+    results = {command: measure(command, startup, max(1, args.runs)) for command in args.only or COMMANDS}
+
+    print(f"{'command':<22}{'imports ms':>12}{'wall ms':>10}{'modules':>9}  status")
+    failed = []
+    for command, result in results.items():
+        problems = []
+        if result["import_ms"] > args.budget:
+            problems.append(f"over {args.budget:.0f} ms")
+        if result["heavy"]:
+            problems.append("loads " + ", ".join(result["heavy"]))
+        result["ok"] = not problems
+        if problems:
+            failed.append(command)
+        slowest = ", ".join(f"{name} {milliseconds:.0f}" for name, milliseconds in result["slowest"])
+        print(f"{command:<22}{result['import_ms']:>12.1f}{result['wall_ms']:>10.0f}{result['modules']:>9}  "
+              f"{'; '.join(problems) or 'ok'}  ({slowest})")
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({"budget_ms": args.budget, "runs": args.runs, "results": results}, f, indent=2)
+    if failed:
+        print(f"Error: {len(failed)} of {len(results)} commands over budget: {', '.join(failed)}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,364 @@
+#!/usr/bin/env python3
+
+"""Run every script in the repo against synthetic data and local fake services, and record the results as JSON."""
+
+import argparse
+import configparser
+import json
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+from fake_drive import DriveHandler, FakeDrive
+from fake_github import FakeGitHub, GitHubHandler
+from fake_moss import FakeMoss, serve_moss
+from fake_openai import FakeOpenAI, OpenAIHandler
+from fake_service import serve
+from synthetic import write_evaluations, write_submission_metadata
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+ORG = "course"
+
+
+def script(path: str) -> list:
+    return [sys.executable, os.path.join(REPO_DIR, path)]
+
+
+def write_config(path: str, section: str, values: dict):
+    config = configparser.ConfigParser()
+    config[section] = values
+    with open(path, "w") as f:
+        config.write(f)
+
+
+class Scenario:
+    """One script run: setup() writes its inputs and starts its fakes, command() is what gets timed."""
+
+    name = None
+    unit = None
+    services = ()
+
+    def __init__(self, args, directory: str):
+        self.args = args
+        self.directory = directory
+        self.servers = []
+
+    def path(self, *parts) -> str:
+        return os.path.join(self.directory, *parts)
+
+    def setup(self):
+        pass
+
+    def command(self) -> list:
+        raise NotImplementedError
+
+    def units(self) -> int:
+        raise NotImplementedError
+
+    def stop(self):
+        for server in self.servers:
+            server.shutdown()
+            server.server_close()
+
+    def export(self) -> str:
+        """A synthetic submission_metadata.csv export, shared by the scenarios of one run."""
+        sizes = f"{self.args.students}x{self.args.items}x{self.args.words}"
+        export = os.path.join(os.path.dirname(self.directory), f"export-{sizes}")
+        if not os.path.exists(os.path.join(export, "submission_metadata.csv")):
+            os.makedirs(export, exist_ok=True)
+            write_submission_metadata(os.path.join(export, "submission_metadata.csv"), self.args.students,
+                                      self.args.items, self.args.words)
+        return export
+
+
+class MossFiles(Scenario):
+    name, unit = "moss-files", "students"
+
+    def command(self):
+        return script("plagiarism/gradescope-to-moss.py") + [self.export(), self.path("moss")]
+
+    def units(self):
+        return self.args.students
+
+
+class ChatGPT(Scenario):
+    name, unit = "chatgpt", "responses"
+    services = ("openai",)
+    options = []
+
+    def setup(self):
+        self.export()
+        self.service = FakeOpenAI(self.args.openai_latency, self.args.openai_latency / 2, self.args.rate_limit_every)
+        self.servers.append(serve(self.service, OpenAIHandler))
+        write_config(self.path("plagiarism.cfg"), "chatgpt", {"organization": "org", "project": "key"})
+
+    def command(self):
+        return script("plagiarism/gradescope-to-chatgpt.py") + [
+            self.export(), self.path("chatgpt.csv"), "--no-cache", "--concurrency", str(self.args.concurrency),
+            "--base-url", f"http://127.0.0.1:{self.servers[0].server_port}/v1"] + self.options
+
+    def units(self):
+        # gradescope-to-chatgpt.py scores the responses to items 4 through 7 only.
+        return self.args.students * min(4, max(0, self.args.items - 3))
+
+
+class ChatGPTPacked(ChatGPT):
+    name = "chatgpt-packed"
+    options = ["--pack-tokens", "2000"]
+
+
+class SubmitMoss(Scenario):
+    name, unit = "submit-moss", "files"
+    services = ("moss",)
+
+    def setup(self):
+        subprocess.run(script("plagiarism/gradescope-to-moss.py")
+                       + [self.export(), self.path("moss"), "--per-item", "--no-progress"],
+                       check=True, stdout=subprocess.DEVNULL)
+        self.service = FakeMoss(self.args.moss_delay)
+        self.servers.extend(serve_moss(self.service))
+        write_config(self.path("plagiarism.cfg"), "moss", {"userid": "1"})
+
+    def command(self):
+        return script("plagiarism/submit-to-moss.py") + [
+            "--submissions", self.path("moss"), "--language", "ascii", "--split", "--outdir", self.path("results"),
+            "--server", f"127.0.0.1:{self.servers[0].server_address[1]}", "--download-diffs", "10"]
+
+    def units(self):
+        return self.args.students * self.args.items
+
+
+class LocalSimilarity(Scenario):
+    name, unit = "local-similarity", "students"
+
+    def setup(self):
+        subprocess.run(script("plagiarism/gradescope-to-moss.py") + [self.export(), self.path("moss"), "--no-progress"],
+                       check=True, stdout=subprocess.DEVNULL)
+
+    def command(self):
+        return script("plagiarism/local-similarity.py") + [self.path("moss"), "--outdir", self.path("similarity")]
+
+    def units(self):
+        return self.args.students
+
+
+class ItemAnalysis(Scenario):
+    name, unit = "item-analysis", "students"
+
+    def setup(self):
+        write_evaluations(self.path("evaluations"), self.args.students, self.args.items)
+
+    def command(self):
+        return script("gradescope-exam/item-analysis.py") + [self.path("evaluations"), "--outdir", self.path("report")]
+
+    def units(self):
+        return self.args.students
+
+
+class GitHubScenario(Scenario):
+    unit = "repos"
+    services = ("github",)
+    git = False
+
+    def setup(self):
+        self.service = FakeGitHub(ORG, self.args.repos, self.args.repos, teams=max(1, self.args.repos // 10),
+                                  git_dir=self.path("remote") if self.git else None,
+                                  mutation_gap=self.args.mutation_gap, retry_after=1,
+                                  latency=self.args.github_latency)
+        self.servers.append(serve(self.service, GitHubHandler))
+        write_config(self.path("config.cfg"), "github", {"organization": ORG, "token": "ghp_benchmark"})
+
+    def end_term(self, *options) -> list:
+        return script("github/end-term.py") + [
+            "--config", self.path("config.cfg"), "--api-url", f"http://127.0.0.1:{self.servers[0].server_port}",
+            "--journal", self.path("journal.sqlite"), "--inventory", self.path("inventory.json")] + list(options)
+
+    def units(self):
+        return self.args.repos
+
+
+class Inventory(GitHubScenario):
+    name = "end-term-inventory"
+
+    def command(self):
+        return self.end_term("--plan", "--refresh-inventory")
+
+
+class Clone(GitHubScenario):
+    name = "end-term-clone"
+    git = True
+
+    def command(self):
+        return self.end_term("--clone-only")
+
+
+class DeleteRepos(GitHubScenario):
+    name = "end-term-delete"
+
+    def setup(self):
+        super().setup()
+        with open(self.path("repos.txt"), "w") as f:
+            f.write("\n".join(self.service.repos) + "\n")
+
+    def command(self):
+        return self.end_term("--delete-repos-only", "--repo-file", self.path("repos.txt"), "--ignore-owner-check",
+                             "--mutation-interval", str(self.args.mutation_gap))
+
+
+class CheckTokens(Scenario):
+    name, unit = "check-token", "tokens"
+    services = ("github",)
+
+    def setup(self):
+        self.service = FakeGitHub(ORG, 0, 0, teams=0, latency=self.args.github_latency)
+        self.servers.append(serve(self.service, GitHubHandler))
+        with open(self.path("tokens.txt"), "w") as f:
+            f.writelines(f"ta{i} ghp_{i:036d}\n" for i in range(self.args.tokens))
+
+    def command(self):
+        return script("github/check-token.py") + [
+            "--bulk", self.path("tokens.txt"), "-f", "csv", "-o", self.path("tokens.csv"),
+            "--api-url", f"http://127.0.0.1:{self.servers[0].server_port}"]
+
+    def units(self):
+        return self.args.tokens
+
+
+class RevokeAccess(Scenario):
+    name, unit = "revoke-access", "permissions"
+    services = ("drive",)
+
+    def setup(self):
+        self.service = FakeDrive(self.args.drive_depth, 4, 20, 3, latency=self.args.github_latency)
+        self.shares = self.service.remaining()
+        self.servers.append(serve(self.service, DriveHandler))
+
+    def command(self):
+        return script("drive/revoke-access.py") + [
+            "root", "--token", "benchmark", "--mime-type", "*", "--folders", "--all-sharing",
+            "--checkpoint", self.path("checkpoint.json"),
+            "--api-url", f"http://127.0.0.1:{self.servers[0].server_port}"]
+
+    def units(self):
+        return self.shares
+
+
+SCENARIOS = {scenario.name: scenario for scenario in (
+    MossFiles, ChatGPT, ChatGPTPacked, SubmitMoss, LocalSimilarity, ItemAnalysis, Inventory, Clone, DeleteRepos,
+    CheckTokens, RevokeAccess)}
+
+
+def run_child(command: list, cwd: str, log: str) -> tuple:
+    """Run command to completion; (seconds, exit status, peak RSS in MB)."""
+    with open(log, "w") as output:
+        start = time.perf_counter()
+        process = subprocess.Popen(command, cwd=cwd, stdout=output, stderr=subprocess.STDOUT)
+        # wait4 gives the resource usage of this child alone, not of every child so far.
+        _, status, usage = os.wait4(process.pid, 0)
+        seconds = time.perf_counter() - start
+    process.returncode = os.waitstatus_to_exitcode(status)
+    # ru_maxrss is in kilobytes on Linux and bytes on macOS.
+    scale = 1024 * 1024 if sys.platform == "darwin" else 1024
+    return seconds, process.returncode, usage.ru_maxrss / scale
+
+
+def run_scenario(cls, args, root: str) -> dict:
+    runs = []
+    for attempt in range(args.repeat):
+        directory = os.path.join(root, cls.name)
+        shutil.rmtree(directory, ignore_errors=True)
+        os.makedirs(directory)
+        scenario = cls(args, directory)
+        try:
+            scenario.setup()
+            seconds, status, peak = run_child(scenario.command(), directory, os.path.join(directory, "log.txt"))
+            result = {"seconds": round(seconds, 3), "status": status, "peak_rss_mb": round(peak, 1),
+                      "units": scenario.units(), "unit": scenario.unit,
+                      "per_second": round(scenario.units() / seconds, 2) if seconds else None}
+            if scenario.services:
+                result["service"] = scenario.service.snapshot()
+        finally:
+            scenario.stop()
+        runs.append(result)
+    result = min(runs, key=lambda run: (run["status"] != 0, run["seconds"]))
+    if args.repeat > 1:
+        result["all_seconds"] = [run["seconds"] for run in runs]
+    return result
+
+
+def git_commit() -> str:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=REPO_DIR, capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(old: dict, new: dict):
+    print(f"{'scenario':<20}{'before':>10}{'after':>10}{'change':>9}{'rss before':>12}{'rss after':>11}")
+    for name, result in new["scenarios"].items():
+        previous = old.get("scenarios", {}).get(name)
+        if previous is None:
+            continue
+        change = (result["seconds"] - previous["seconds"]) / previous["seconds"] * 100 if previous["seconds"] else 0
+        print(f"{name:<20}{previous['seconds']:>10.2f}{result['seconds']:>10.2f}{change:>+8.0f}%"
+              f"{previous['peak_rss_mb']:>12.1f}{result['peak_rss_mb']:>11.1f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the scripts against synthetic data and fake services")
+    parser.add_argument("-o", "--output", type=str, default="benchmark.json", help="JSON results file (default: benchmark.json)")
+    parser.add_argument("--compare", type=str, help="Earlier results file to print the changes against")
+    parser.add_argument("--only", type=str, action="append", choices=sorted(SCENARIOS),
+                        help="Run only this scenario; repeatable")
+    parser.add_argument("--repeat", type=int, default=1, help="Runs per scenario; the fastest is kept (default: 1)")
+    parser.add_argument("--workdir", type=str, help="Keep inputs and outputs here instead of a temporary directory")
+    parser.add_argument("--students", type=int, default=200)
+    parser.add_argument("--items", type=int, default=8)
+    parser.add_argument("--words", type=int, default=25, help="Mean words per response (default: 25)")
+    parser.add_argument("--repos", type=int, default=100, help="Repositories (and members) in the fake organization")
+    parser.add_argument("--tokens", type=int, default=50, help="Tokens for check-token.py --bulk")
+    parser.add_argument("--drive-depth", type=int, default=2, help="Subfolder levels in the fake Drive tree")
+    parser.add_argument("--concurrency", type=int, default=8, help="gradescope-to-chatgpt.py --concurrency")
+    parser.add_argument("--openai-latency", type=float, default=0.2,
+                        help="Seconds per fake ChatGPT request, plus up to half again at random (default: 0.2)")
+    parser.add_argument("--rate-limit-every", type=int, default=20, help="Fake OpenAI answers every Nth request with 429")
+    parser.add_argument("--github-latency", type=float, default=0.05,
+                        help="Seconds per fake GitHub and Drive request (default: 0.05)")
+    parser.add_argument("--mutation-gap", type=float, default=0.05,
+                        help="Seconds the fake GitHub requires between deletes (default: 0.05)")
+    parser.add_argument("--moss-delay", type=float, default=0.5, help="Seconds the fake MOSS takes per job")
+    args = parser.parse_args()
+
+    root = args.workdir or tempfile.mkdtemp(prefix="teaching-utilities-bench-")
+    os.makedirs(root, exist_ok=True)
+    results = {"commit": git_commit(), "python": platform.python_version(), "platform": platform.platform(),
+               "cpus": os.cpu_count(), "started": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+               "sizes": {key: getattr(args, key) for key in ("students", "items", "words", "repos", "tokens")},
+               "scenarios": {}}
+    try:
+        for name in args.only or SCENARIOS:
+            print(f"Running {name}...", flush=True)
+            result = run_scenario(SCENARIOS[name], args, root)
+            results["scenarios"][name] = result
+            failed = f" (exit status {result['status']}, see {name}/log.txt under --workdir)" if result["status"] else ""
+            print(f"  {result['seconds']:.2f}s, {result['per_second']} {result['unit']}/s, "
+                  f"{result['peak_rss_mb']} MB peak{failed}")
+    finally:
+        if not args.workdir:
+            shutil.rmtree(root, ignore_errors=True)
+
+    with open(args.output, "w") as f:
+        json.dump(results, f, indent=2)
+    print(f"Wrote {args.output}")
+    if args.compare:
+        with open(args.compare) as f:
+            compare(json.load(f), results)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,79 @@
+"""Generators for synthetic Gradescope exports used by the benchmarks."""
+
+import csv
+import math
+import os
+import random
+
+LEADING_COLUMNS = ["First Name", "Last Name", "Student ID", "Email", "Sections",
+                   "Submission ID", "Total Score", "Max Points", "Submission Time"]
+ITEM_FIELDS = ["Score", "Weight", "Graded?", "Response", "Submitted At"]
+
+WORDS = ("the function returns a list of values because each loop iteration appends the "
+         "result so that time complexity is linear in the input size and memory grows with n "
+         "we use a dictionary to count occurrences then sort by frequency").split()
+
+
+def response_text(rng: random.Random, mean_words: int) -> str:
+    length = max(1, int(rng.expovariate(1 / mean_words)))
+    return " ".join(rng.choice(WORDS) for _ in range(length))
+
+
+def write_submission_metadata(path: str, students: int, items: int, mean_words: int = 25, seed: int = 0):
+    """Write a submission_metadata.csv with the Gradescope web-assignment layout:
+    nine leading columns, then Score/Weight/Graded?/Response/Submitted At for each item."""
+    rng = random.Random(seed)
+    header = list(LEADING_COLUMNS)
+    for item in range(1, items + 1):
+        header += [f"{item}: Question {item} (1.0 pts) {field}" for field in ITEM_FIELDS]
+    with open(path, "w", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(header)
+        for student in range(students):
+            row = [f"First{student}", f"Last{student}", str(100000000 + student), f"student{student}@example.edu",
+                   "Lecture 1", str(200000000 + student), str(rng.randint(0, items)), str(items),
+                   "2024-03-15 10:00:00 -0700"]
+            for _ in range(items):
+                row += [str(rng.choice((0.0, 0.5, 1.0))), "1.0", "true", response_text(rng, mean_words),
+                        "2024-03-15 09:59:00 -0700"]
+            writer.writerow(row)
+
+
+EVALUATION_COLUMNS = ["Assignment ID", "Submission ID", "Question Submission ID", "First Name", "Last Name", "SID",
+                      "Email", "Sections", "Score", "Submission Time"]
+EVALUATION_TRAILING = ["Adjustment", "Comments", "Grader", "Tags"]
+TAGS = ["normal", "regression", "probability", "sampling"]
+
+
+def write_evaluations(directory: str, students: int, items: int, seed: int = 0):
+    """Write a Gradescope Export Evaluations directory: one CSV per item with Correct, Partial credit,
+    Incorrect and No Response rubric items, driven by a per-student ability so items correlate."""
+    rng = random.Random(seed)
+    ability = [rng.gauss(0, 1) for _ in range(students)]
+    os.makedirs(directory, exist_ok=True)
+    for item in range(1, items + 1):
+        points = rng.choice((1.0, 2.0, 4.0))
+        difficulty = rng.gauss(0, 1)
+        tags = ", ".join([TAGS[item % len(TAGS)], f"p:{('recall', 'apply', 'analyze')[item % 3]}",
+                          f"type:{('mc', 'free')[item % 2]}"])
+        with open(os.path.join(directory, f"{item}_Question_{item}.csv"), "w", newline="") as f:
+            writer = csv.writer(f)
+            writer.writerow(EVALUATION_COLUMNS + ["Correct", "Partial credit", "Incorrect", "No Response"]
+                            + EVALUATION_TRAILING)
+            for student in range(students):
+                chance = 1 / (1 + math.exp(difficulty - ability[student]))
+                draw = rng.random()
+                rubric = [False, False, False, False]
+                if draw < 0.03:
+                    rubric[3], score = True, 0.0
+                elif draw < chance:
+                    rubric[0], score = True, points
+                elif draw < chance + (1 - chance) / 3:
+                    rubric[1], score = True, points / 2
+                else:
+                    rubric[2], score = True, 0.0
+                writer.writerow([1, 200000000 + student, 300000000 + student * items + item, f"First{student}",
+                                 f"Last{student}", 100000000 + student, f"student{student}@example.edu", "Lecture 1",
+                                 score, "2024-03-15 10:00:00 -0700"] + rubric + ["", "", "Grader", tags])
+            writer.writerow(["Point Values"] + [""] * 9 + [points, points / 2, 0, 0])
+            writer.writerow(["Rubric Type", "positive"])
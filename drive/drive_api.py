@@ -0,0 +1,241 @@
+"""A small Google Drive v3 client for walking folders and deleting permissions in batches."""
+
+from __future__ import annotations
+
+import json
+import random
+import re
+import threading
+import uuid
+from typing import TYPE_CHECKING
+from urllib.parse import urlencode
+
+if TYPE_CHECKING:
+    import requests
+
+from teaching_utilities import instrumentation
+
+API_URL = "https://www.googleapis.com"
+SCOPES = ["https://www.googleapis.com/auth/drive"]
+FOLDER_MIME_TYPE = "application/vnd.google-apps.folder"
+BATCH_SIZE = 100  # The most calls Drive accepts in one batch request.
+PAGE_SIZE = 1000
+MAX_RETRIES = 6
+BASE_BACKOFF = 1.0
+PERMISSION_FIELDS = "id,type,role,emailAddress,domain,permissionDetails(inherited)"
+CHILD_FIELDS = f"nextPageToken,files(id,name,mimeType,permissions({PERMISSION_FIELDS}))"
+RATE_LIMIT_REASONS = {"rateLimitExceeded", "userRateLimitExceeded", "sharingRateLimitExceeded"}
+
+
+class DriveError(Exception):
+    def __init__(self, status: int, message: str):
+        super().__init__(f"{status}: {message}")
+        self.status = status
+
+
+def error_reason(body) -> str:
+    """The reason of a Drive error response ("userRateLimitExceeded", "notFound", ...), if any."""
+    try:
+        error = (json.loads(body) if isinstance(body, (str, bytes)) else body)["error"]
+        return (error.get("errors") or [{}])[0].get("reason") or error.get("status", "")
+    except (ValueError, KeyError, TypeError, AttributeError):
+        return ""
+
+
+def is_rate_limited(status: int, body) -> bool:
+    return status == 429 or (status == 403 and error_reason(body) in RATE_LIMIT_REASONS)
+
+
+def backoff(attempt: int, retry_after: str = None) -> float:
+    if retry_after:
+        try:
+            return float(retry_after)
+        except ValueError:
+            pass
+    # Google's recommended truncated exponential backoff, with jitter so threads do not retry together.
+    return min(64.0, BASE_BACKOFF * 2 ** attempt) + random.random()
+
+
+def operation_name(method: str, path: str) -> str:
+    """The Drive API method a request calls, e.g. files.list, as labelled in the instrumentation."""
+    if path.startswith("/batch/"):
+        return "batch"
+    if re.match(r"/drive/v3/files/[^/?]+/permissions", path):
+        return "permissions.delete" if method == "DELETE" else "permissions.list"
+    return "files.get" if re.match(r"/drive/v3/files/[^/?]+", path) else "files.list"
+
+
+def load_credentials(path: str = None):
+    """Credentials from a service account or authorized user JSON file, or Application Default Credentials."""
+    # Only needed without an access token.
+    import google.auth
+    from google.oauth2 import credentials as user_credentials, service_account
+    if path is None:
+        credentials, _ = google.auth.default(scopes=SCOPES)
+        return credentials
+    with open(path) as f:
+        info = json.load(f)
+    if info.get("type") == "service_account":
+        return service_account.Credentials.from_service_account_info(info, scopes=SCOPES)
+    return user_credentials.Credentials.from_authorized_user_info(info, scopes=SCOPES)
+
+
+def encode_batch(calls: list, boundary: str) -> bytes:
+    """A multipart/mixed batch body of (method, path) calls, with Content-IDs 1..n."""
+    parts = []
+    for content_id, (method, path) in enumerate(calls, 1):
+        parts.append(f"--{boundary}\r\nContent-Type: application/http\r\nContent-ID: <{content_id}>\r\n\r\n"
+                     f"{method} {path} HTTP/1.1\r\n\r\n")
+    return ("".join(parts) + f"--{boundary}--\r\n").encode("utf-8")
+
+
+def decode_batch(content_type: str, body: bytes) -> dict:
+    """Map each Content-ID in a batch response to its (status, body)."""
+    match = re.search(r'boundary="?([^";]+)"?', content_type or "")
+    if not match:
+        raise DriveError(0, f"batch response is not multipart: {content_type}")
+    results = {}
+    for part in body.decode("utf-8", "replace").split("--" + match.group(1)):
+        headers, _, response = part.partition("\r\n\r\n")
+        content_id = re.search(r"Content-ID:\s*<(?:response-)?([^>]+)>", headers, re.I)
+        status = re.match(r"HTTP/[\d.]+ (\d{3})", response.lstrip())
+        if content_id and status:
+            results[content_id.group(1)] = (int(status.group(1)), response.partition("\r\n\r\n")[2].strip())
+    return results
+
+
+class DriveClient:
+    def __init__(self, token: str = None, credentials=None, api_url: str = None, workers: int = 8):
+        self.token = token
+        self.credentials = credentials
+        import requests
+        self.api_url = (api_url or API_URL).rstrip("/")
+        self.session = requests.Session()
+        adapter = requests.adapters.HTTPAdapter(pool_connections=1, pool_maxsize=max(10, workers))
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        self.lock = threading.Lock()
+        self.requests = 0
+        self.retries = 0
+
+    def _authorization(self) -> str:
+        if self.credentials is not None:
+            with self.lock:
+                if not self.credentials.valid:
+                    # Only needed with google.auth credentials.
+                    from google.auth.transport.requests import Request
+                    self.credentials.refresh(Request())
+                return f"Bearer {self.credentials.token}"
+        return f"Bearer {self.token}"
+
+    def _send(self, method: str, path: str, headers: dict = None, **kwargs) -> requests.Response:
+        operation = operation_name(method, path)
+        for attempt in range(MAX_RETRIES + 1):
+            with instrumentation.call("drive", operation):
+                response = self.session.request(method, self.api_url + path, timeout=120,
+                                                headers=dict(headers or {}, Authorization=self._authorization()),
+                                                **kwargs)
+            with self.lock:
+                self.requests += 1
+            limited = is_rate_limited(response.status_code, response.content)
+            if not (limited or response.status_code >= 500) or attempt == MAX_RETRIES:
+                break
+            with self.lock:
+                self.retries += 1
+            reason = "rate limited" if limited else "server error"
+            instrumentation.retry("drive", reason)
+            instrumentation.sleep("drive", backoff(attempt, response.headers.get("Retry-After")), reason)
+        if response.status_code >= 400:
+            raise DriveError(response.status_code, response.text[:500])
+        return response
+
+    def get_file(self, file_id: str) -> dict:
+        return self._send("GET", f"/drive/v3/files/{file_id}",
+                          params={"fields": f"id,name,mimeType,permissions({PERMISSION_FIELDS})",
+                                  "supportsAllDrives": "true"}).json()
+
+    def list_children(self, folder_id: str) -> list:
+        """Every file and folder in a folder, with permissions where files.list returns them."""
+        files, token = [], None
+        while True:
+            params = {"q": f"'{folder_id}' in parents and trashed = false", "fields": CHILD_FIELDS,
+                      "pageSize": PAGE_SIZE, "supportsAllDrives": "true", "includeItemsFromAllDrives": "true"}
+            if token:
+                params["pageToken"] = token
+            page = self._send("GET", "/drive/v3/files", params=params).json()
+            files.extend(page.get("files", []))
+            token = page.get("nextPageToken")
+            if not token:
+                return files
+
+    def list_permissions(self, file_id: str) -> list:
+        permissions, token = [], None
+        while True:
+            params = {"fields": f"nextPageToken,permissions({PERMISSION_FIELDS})", "pageSize": 100,
+                      "supportsAllDrives": "true"}
+            if token:
+                params["pageToken"] = token
+            page = self._send("GET", f"/drive/v3/files/{file_id}/permissions", params=params).json()
+            permissions.extend(page.get("permissions", []))
+            token = page.get("nextPageToken")
+            if not token:
+                return permissions
+
+    def batch(self, calls: list) -> list:
+        """Send (method, path) calls BATCH_SIZE at a time through the batch endpoint; (status, body) for each."""
+        results = [(0, "")] * len(calls)
+        pending = list(range(len(calls)))
+        for attempt in range(MAX_RETRIES + 1):
+            retry = []
+            for start in range(0, len(pending), BATCH_SIZE):
+                chunk = pending[start:start + BATCH_SIZE]
+                boundary = "batch_" + uuid.uuid4().hex
+                response = self._send("POST", "/batch/drive/v3", data=encode_batch([calls[i] for i in chunk], boundary),
+                                      headers={"Content-Type": f"multipart/mixed; boundary={boundary}"})
+                parts = decode_batch(response.headers.get("Content-Type"), response.content)
+                for content_id, i in enumerate(chunk, 1):
+                    status, body = results[i] = parts.get(str(content_id), (0, ""))
+                    if status == 0 or is_rate_limited(status, body) or status >= 500:
+                        retry.append(i)
+            if not retry or attempt == MAX_RETRIES:
+                break
+            with self.lock:
+                self.retries += len(retry)
+            for _ in retry:
+                instrumentation.retry("drive", "rate limited in batch")
+            instrumentation.sleep("drive", backoff(attempt), "rate limited in batch")
+            pending = retry
+        return results
+
+    def file_permissions(self, file_ids: list) -> list:
+        """The permissions of each file, listed through batch requests."""
+        query = urlencode({"fields": f"nextPageToken,permissions({PERMISSION_FIELDS})", "pageSize": 100,
+                           "supportsAllDrives": "true"})
+        results = self.batch([("GET", f"/drive/v3/files/{file_id}/permissions?{query}") for file_id in file_ids])
+        permissions = []
+        for file_id, (status, body) in zip(file_ids, results):
+            page = json.loads(body) if status == 200 else {}
+            if status != 200 or page.get("nextPageToken"):
+                # Rare: a failed call or more than one page of permissions.
+                permissions.append(self.list_permissions(file_id))
+            else:
+                permissions.append(page.get("permissions", []))
+        return permissions
+
+    def delete_permissions(self, pairs: list) -> list:
+        """Delete (file ID, permission ID) pairs through batch requests; the HTTP status of each.
+
+        404 means the permission was already gone.
+        """
+        calls = [("DELETE", f"/drive/v3/files/{file_id}/permissions/{permission_id}?supportsAllDrives=true")
+                 for file_id, permission_id in pairs]
+        return [status for status, _ in self.batch(calls)]
+
+    def close(self):
+        self.session.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
@@ -0,0 +1,272 @@
+#!/usr/bin/env python3
+
+"""Revoke sharing on every matching file under a Google Drive folder.
+
+A Python replacement for revoke-access.gs that does not time out and resumes from a checkpoint.
+"""
+
+import argparse
+import fnmatch
+import json
+import os
+import sys
+import time
+from collections import Counter, deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+# Before drive_api, which imports teaching_utilities too.
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from teaching_utilities import instrumentation  # noqa: E402
+from drive_api import BATCH_SIZE, FOLDER_MIME_TYPE, DriveClient, DriveError, load_credentials  # noqa: E402
+
+# revoke-access.gs only touched PDF and LaTeX files.
+DEFAULT_MIME_TYPES = ["application/pdf", "application/tex", "application/x-tex", "text/x-tex"]
+# The editors and viewers revoke-access.gs removed; its viewers include commenters.
+REVOKED_TYPES = {"user", "group"}
+REVOKED_ROLES = {"reader", "commenter", "writer"}
+WORKERS = 8
+CHECKPOINT_INTERVAL = 10.0
+TOKEN_VARIABLE = "DRIVE_ACCESS_TOKEN"
+
+
+class Checkpoint:
+    """Folders finished and folders still queued under one root, saved as JSON."""
+
+    def __init__(self, path: str, root: str, restart: bool = False):
+        self.path = path
+        self.root = root
+        self.done = set()
+        self.queue = [root]
+        if path and os.path.exists(path) and not restart:
+            with open(path) as f:
+                state = json.load(f)
+            if state["root"] != root:
+                raise ValueError(f"{path} is a checkpoint for folder {state['root']}, not {root}")
+            self.done = set(state["done"])
+            self.queue = state["queue"]
+
+    @property
+    def complete(self) -> bool:
+        return not self.queue
+
+    def save(self, queue: list):
+        self.queue = [folder for folder in dict.fromkeys(queue) if folder not in self.done]
+        if not self.path:
+            return
+        temporary = self.path + ".tmp"
+        with open(temporary, "w") as f:
+            json.dump({"root": self.root, "queue": self.queue, "done": sorted(self.done)}, f)
+        os.replace(temporary, self.path)
+
+
+def matches(mime_type: str, patterns: list) -> bool:
+    return any(fnmatch.fnmatchcase(mime_type, pattern) for pattern in patterns)
+
+
+def inherited(permission: dict) -> bool:
+    return any(detail.get("inherited") for detail in permission.get("permissionDetails", []))
+
+
+def revocable(permissions: list, keep: set, all_sharing: bool = False) -> list:
+    """The permissions to delete: user and group shares, or with all_sharing every one but the owner's.
+
+    Inherited permissions and those of addresses to keep are left out.
+    """
+    return [permission for permission in permissions
+            if permission.get("role") != "owner" and not inherited(permission)
+            and (all_sharing or (permission.get("type") in REVOKED_TYPES and permission.get("role") in REVOKED_ROLES))
+            and (permission.get("emailAddress") or "").lower() not in keep]
+
+
+def scan_folder(client: DriveClient, folder_id: str, patterns: list, folders: bool) -> tuple:
+    """A folder's subfolders, and (file, permissions) for each of its files that should be unshared."""
+    subfolders, files = [], []
+    for child in client.list_children(folder_id):
+        is_folder = child["mimeType"] == FOLDER_MIME_TYPE
+        if is_folder:
+            subfolders.append(child["id"])
+        if (folders and is_folder) or (not is_folder and matches(child["mimeType"], patterns)):
+            files.append(child)
+    # Shared drives leave permissions out of files.list.
+    unlisted = [file["id"] for file in files if "permissions" not in file]
+    listed = dict(zip(unlisted, client.file_permissions(unlisted) if unlisted else []))
+    return subfolders, [(file, file["permissions"] if "permissions" in file else listed[file["id"]]) for file in files]
+
+
+def describe(permission: dict) -> str:
+    who = permission.get("emailAddress") or permission.get("domain") or permission.get("type")
+    return f"{who} ({permission.get('role')})"
+
+
+def revoke_tree(client: DriveClient, checkpoint: Checkpoint, patterns: list, keep: set = frozenset(),
+                folders: bool = False, workers: int = WORKERS, batch_size: int = BATCH_SIZE, dry_run: bool = False,
+                all_sharing: bool = False):
+    """Walk the folders in checkpoint.queue breadth-first and delete every revocable permission below them."""
+    counts = Counter()
+    queue = deque(folder for folder in checkpoint.queue if folder not in checkpoint.done)
+    listing = set()
+    scanned = set()  # Listed in this run; folders are queued again when a resumed run lists their parent.
+    outstanding = Counter()  # folder -> permissions not yet deleted
+    pending = []  # (folder, file, permission) waiting for a batch
+    futures = {}
+    last_save = time.monotonic()
+
+    def finish(folder: str):
+        if outstanding[folder] == 0 and folder not in listing:
+            outstanding.pop(folder, None)
+            checkpoint.done.add(folder)
+            counts["folders"] += 1
+            # The total grows as the walk finds more folders.
+            progress.total = counts["folders"] + len(queue) + len(listing) + len(outstanding)
+            progress.advance()
+
+    def save():
+        checkpoint.save(list(listing) + list(outstanding) + list(queue))
+
+    if folders and checkpoint.root in queue and checkpoint.root not in checkpoint.done:
+        root = client.get_file(checkpoint.root)
+        pending.extend((checkpoint.root, root, permission)
+                       for permission in revocable(root.get("permissions", []), keep, all_sharing))
+        outstanding[checkpoint.root] += len(pending)
+
+    with instrumentation.stage("revoke folders", total=len(queue)) as progress, \
+            ThreadPoolExecutor(max_workers=workers) as pool:
+        try:
+            while queue or futures or pending:
+                # Deletes go first so that finished folders reach the checkpoint while the walk continues;
+                # whole batches are filled while folders are still being listed, the remainder sent once they are not.
+                while pending and (len(pending) >= batch_size or not listing) and len(futures) < 2 * workers:
+                    batch, pending = pending[:batch_size], pending[batch_size:]
+                    if dry_run:
+                        for folder, file, permission in batch:
+                            instrumentation.echo(f"Would remove {describe(permission)} from {file['name']}")
+                            counts["would remove"] += 1
+                            outstanding[folder] -= 1
+                            finish(folder)
+                        continue
+                    pairs = [(file["id"], permission["id"]) for _, file, permission in batch]
+                    futures[pool.submit(client.delete_permissions, pairs)] = ("delete", batch)
+                while queue and len(listing) < workers and len(futures) < 2 * workers:
+                    folder = queue.popleft()
+                    if folder not in checkpoint.done and folder not in listing and folder not in scanned:
+                        listing.add(folder)
+                        futures[pool.submit(scan_folder, client, folder, patterns, folders)] = ("scan", folder)
+                if not futures:
+                    continue
+
+                finished, _ = wait(futures, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    task = futures.pop(future)
+                    if task[0] == "scan":
+                        folder = task[1]
+                        listing.discard(folder)
+                        scanned.add(folder)
+                        try:
+                            subfolders, files = future.result()
+                        except DriveError as e:
+                            instrumentation.echo(f"Failed to list folder {folder}: {e}")
+                            counts["failed folders"] += 1
+                            subfolders, files = [], []
+                        queue.extend(subfolders)
+                        for file, permissions in files:
+                            counts["files"] += 1
+                            for permission in revocable(permissions, keep, all_sharing):
+                                pending.append((folder, file, permission))
+                                outstanding[folder] += 1
+                        finish(folder)
+                    else:
+                        batch = task[1]
+                        try:
+                            statuses = future.result()
+                        except DriveError as e:
+                            statuses = [e.status] * len(batch)
+                        for (folder, file, permission), status in zip(batch, statuses):
+                            if 200 <= status < 300:
+                                counts["revoked"] += 1
+                            elif status == 404:
+                                counts["already gone"] += 1
+                            else:
+                                counts["failed"] += 1
+                                instrumentation.echo(f"Failed to remove {describe(permission)} from {file['name']}: "
+                                                     f"HTTP {status}")
+                            outstanding[folder] -= 1
+                            finish(folder)
+
+                if time.monotonic() - last_save >= CHECKPOINT_INTERVAL:
+                    save()
+                    last_save = time.monotonic()
+        finally:
+            save()
+    return counts
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Revoke sharing on matching files under a Google Drive folder")
+    parser.add_argument("folder", type=str, help="ID of the folder, the end of its Drive URL")
+    parser.add_argument("--mime-type", action="append", dest="mime_types",
+                        help="MIME types to unshare, with * wildcards; repeatable (default: PDF and TeX; '*' for all files)")
+    parser.add_argument("--folders", action="store_true", help="Also remove sharing from the folders themselves")
+    parser.add_argument("--keep", action="append", default=[], help="Email address whose access is kept; repeatable")
+    parser.add_argument("--all-sharing", action="store_true",
+                        help="Also remove anyone and domain link sharing, not only user and group readers, "
+                             "commenters and writers")
+    parser.add_argument("--checkpoint", type=str, help="Checkpoint file (default: revoke-FOLDER.json)")
+    parser.add_argument("--restart", action="store_true", help="Ignore an existing checkpoint and start over")
+    parser.add_argument("--workers", type=int, default=WORKERS, help=f"Concurrent requests (default: {WORKERS})")
+    parser.add_argument("--batch-size", type=int, default=BATCH_SIZE,
+                        help=f"Permission deletes per batch request (default and maximum: {BATCH_SIZE})")
+    parser.add_argument("--dry-run", action="store_true", help="List the permissions that would be removed")
+    parser.add_argument("--token", type=str, help=f"OAuth access token (default: ${TOKEN_VARIABLE})")
+    parser.add_argument("--credentials", type=str,
+                        help="Service account or authorized user JSON file (default: Application Default Credentials)")
+    parser.add_argument("--api-url", type=str, help="Drive API base URL, e.g. a local fake for testing")
+    instrumentation.add_arguments(parser)
+    args = parser.parse_args()
+    instrumentation.configure(args)
+
+    if not 1 <= args.batch_size <= BATCH_SIZE:
+        print(f"Error: --batch-size must be between 1 and {BATCH_SIZE}")
+        sys.exit(1)
+
+    token = args.token or os.environ.get(TOKEN_VARIABLE)
+    credentials = None
+    if not token:
+        try:
+            credentials = load_credentials(args.credentials)
+        except ImportError:
+            print(f"Error: pass --token or set {TOKEN_VARIABLE}, or install google-auth to use credentials")
+            sys.exit(1)
+
+    try:
+        # A dry run removes nothing, so it neither reads nor records progress.
+        path = None if args.dry_run else args.checkpoint or f"revoke-{args.folder}.json"
+        checkpoint = Checkpoint(path, args.folder, args.restart)
+    except ValueError as e:
+        print(f"Error: {e}")
+        sys.exit(1)
+    if checkpoint.complete:
+        print(f"{checkpoint.path} records a finished run; use --restart to run again")
+        sys.exit(0)
+
+    start = time.perf_counter()
+    with DriveClient(token, credentials, args.api_url, args.workers) as client:
+        try:
+            counts = revoke_tree(client, checkpoint, args.mime_types or DEFAULT_MIME_TYPES,
+                                 {address.lower() for address in args.keep}, args.folders, args.workers,
+                                 args.batch_size, args.dry_run, args.all_sharing)
+        except KeyboardInterrupt:
+            print(f"Interrupted; progress saved to {checkpoint.path}")
+            sys.exit(1)
+        except DriveError as e:
+            print(f"Error: {e}")
+            sys.exit(1)
+
+        if args.dry_run:
+            print(f"{counts['folders']} folders, {counts['files']} matching files: "
+                  f"{counts['would remove']} permissions would be removed")
+            sys.exit(0)
+        print(f"{counts['folders']} folders, {counts['files']} matching files: {counts['revoked']} permissions removed, "
+              f"{counts['already gone']} already gone, {counts['failed']} failed "
+              f"({client.requests} requests, {client.retries} retries, {time.perf_counter() - start:.1f}s)")
+    if counts["failed"] or counts["failed folders"]:
+        sys.exit(1)
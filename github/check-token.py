@@ -4,14 +4,33 @@
 This script can be run from the command line and supports
 both token input and environment variable usage.
 It also includes a verbose mode for additional details.
+
+With --bulk, every token in a file (or stdin) is checked concurrently over
+one pooled HTTP session, with a single GET /user per token. The login,
+scopes, rate limit and expiration all come from that response and its
+headers, and are written as JSON or CSV.
 """
 
 __author__      = "Ryan R. Rosario"
 
 import argparse
+import csv
+import json
 import sys
 import os
-from github import Github, GithubException
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from teaching_utilities import instrumentation  # noqa: E402
+
+API_URL = 'https://api.github.com'
+BULK_WORKERS = 16
+BULK_FIELDS = ['label', 'token', 'valid', 'status', 'login', 'token_type', 'scopes', 'rate_limit',
+               'rate_remaining', 'rate_reset', 'expires', 'error']
+# Prefixes GitHub gives each kind of token.
+TOKEN_TYPES = [('github_pat_', 'fine-grained'), ('ghp_', 'classic'), ('gho_', 'oauth'), ('ghu_', 'app user'),
+               ('ghs_', 'app installation')]
 
 def get_github_user_info(token):
     """
@@ -20,6 +39,7 @@ def get_github_user_info(token):
     :param token: GitHub Personal Access Token
     :return: Github user object or None if request fails
     """
+    from github import Github, GithubException
     try:
         # Create a Github instance with the token
         g = Github(token)
@@ -42,6 +62,139 @@ def get_github_user_info(token):
     
     return None
 
+def read_tokens(source):
+    """
+    Read tokens, one per line, from a file or from stdin when source is '-'.
+    A line may start with a label such as a TA's name: "alice ghp_...".
+    Blank lines and lines starting with # are skipped.
+
+    :param source: Path to the token file, or '-'
+    :return: List of (label, token) pairs
+    """
+    f = sys.stdin if source == '-' else open(source)
+    try:
+        tokens = []
+        for line in f:
+            fields = line.replace(',', ' ').split()
+            if not fields or fields[0].startswith('#'):
+                continue
+            tokens.append((' '.join(fields[:-1]), fields[-1]))
+        return tokens
+    finally:
+        if f is not sys.stdin:
+            f.close()
+
+
+def mask_token(token):
+    """Show just enough of a token to tell it apart from the others."""
+    return token[:4] + '...' + token[-4:] if len(token) > 12 else '***'
+
+
+def token_type(token):
+    return next((kind for prefix, kind in TOKEN_TYPES if token.startswith(prefix)), 'unknown')
+
+
+def check_token(session, label, token, api_url=API_URL):
+    """
+    Check one token with a single GET /user request.
+
+    :param session: Shared requests.Session
+    :param label: Name printed with the result
+    :param token: GitHub token
+    :param api_url: GitHub API URL
+    :return: Dict with the fields in BULK_FIELDS
+    """
+    import requests
+    result = dict.fromkeys(BULK_FIELDS, '')
+    result.update(label=label, token=mask_token(token), token_type=token_type(token), valid=False)
+    try:
+        with instrumentation.call('github', 'get_user'):
+            response = session.get(f'{api_url.rstrip("/")}/user', timeout=30,
+                                   headers={'Authorization': f'token {token}', 'Accept': 'application/vnd.github+json'})
+    except requests.RequestException as err:
+        result['error'] = str(err)
+        return result
+
+    headers = response.headers
+    result['status'] = response.status_code
+    if headers.get('X-RateLimit-Limit'):
+        result['rate_limit'] = int(headers['X-RateLimit-Limit'])
+        result['rate_remaining'] = int(headers['X-RateLimit-Remaining'])
+    if headers.get('X-RateLimit-Reset'):
+        result['rate_reset'] = datetime.fromtimestamp(int(headers['X-RateLimit-Reset']), timezone.utc).isoformat()
+    # Fine-grained tokens have no OAuth scopes; their permissions are not reported by the API.
+    result['scopes'] = headers.get('X-OAuth-Scopes', '')
+    # Only set for tokens with an expiration date.
+    result['expires'] = headers.get('GitHub-Authentication-Token-Expiration', '')
+    if response.ok:
+        result['valid'] = True
+        result['login'] = response.json().get('login', '')
+    else:
+        try:
+            result['error'] = response.json().get('message', response.reason)
+        except ValueError:
+            result['error'] = response.reason
+    return result
+
+
+def check_tokens(tokens, api_url=API_URL, workers=BULK_WORKERS):
+    """
+    Check many tokens concurrently over one pooled session.
+
+    :param tokens: List of (label, token) pairs
+    :param api_url: GitHub API URL
+    :param workers: Requests in flight at once
+    :return: List of result dicts, in the order of tokens
+    """
+    import requests
+    workers = max(1, min(workers, len(tokens)))
+    with requests.Session() as session:
+        adapter = requests.adapters.HTTPAdapter(pool_connections=1, pool_maxsize=workers)
+        session.mount('https://', adapter)
+        session.mount('http://', adapter)
+        with instrumentation.stage('check tokens', total=len(tokens)) as progress:
+            def check(pair):
+                result = check_token(session, pair[0], pair[1], api_url)
+                progress.advance(failed=not result['valid'])
+                return result
+
+            with ThreadPoolExecutor(max_workers=workers) as pool:
+                return list(pool.map(check, tokens))
+
+
+def write_results(results, output_format, output=None):
+    f = open(output, 'w', newline='') if output else sys.stdout
+    try:
+        if output_format == 'csv':
+            writer = csv.DictWriter(f, fieldnames=BULK_FIELDS)
+            writer.writeheader()
+            writer.writerows(results)
+        else:
+            json.dump(results, f, indent=2)
+            f.write('\n')
+    finally:
+        if output:
+            f.close()
+
+
+def bulk(args):
+    try:
+        tokens = read_tokens(args.bulk)
+    except OSError as err:
+        print(f"Error: cannot read {args.bulk}: {err}", file=sys.stderr)
+        sys.exit(1)
+    if not tokens:
+        print("Error: no tokens to check.", file=sys.stderr)
+        sys.exit(1)
+
+    results = check_tokens(tokens, args.api_url, args.workers)
+    write_results(results, args.format, args.output)
+    invalid = sum(not result['valid'] for result in results)
+    print(f"{len(results) - invalid} of {len(results)} tokens valid.", file=sys.stderr)
+    if invalid:
+        sys.exit(1)
+
+
 def main():
     # Set up argument parser
     parser = argparse.ArgumentParser(description='Retrieve GitHub user information using a Personal Access Token')
@@ -53,14 +206,38 @@ def main():
     token_group.add_argument('-e', '--env', 
                              action='store_true', 
                              help='Use GITHUB_TOKEN environment variable')
+    token_group.add_argument('-b', '--bulk',
+                             metavar='FILE',
+                             help='Check every token in FILE (- for stdin), one per line, optionally after a label')
+
+    # Options for --bulk
+    parser.add_argument('-f', '--format',
+                        choices=['json', 'csv'],
+                        default='json',
+                        help='Output format for --bulk (default: json)')
+    parser.add_argument('-o', '--output',
+                        help='Write --bulk results to this file instead of stdout')
+    parser.add_argument('--workers',
+                        type=int,
+                        default=BULK_WORKERS,
+                        help=f'Tokens checked at once with --bulk (default: {BULK_WORKERS})')
+    parser.add_argument('--api-url',
+                        default=API_URL,
+                        help=f'GitHub API URL for --bulk (default: {API_URL})')
 
     # Add optional verbosity flag
     parser.add_argument('-v', '--verbose', 
                         action='store_true', 
                         help='Display additional user details')
+    instrumentation.add_arguments(parser)
 
     # Parse arguments
     args = parser.parse_args()
+    instrumentation.configure(args)
+
+    if args.bulk:
+        bulk(args)
+        return
 
     # Determine token source
     if args.env:
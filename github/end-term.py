@@ -2,25 +2,38 @@
 
 """End of term procesing for a Github organization.
 
-(1) Clones all repositories for backup
+(1) Clones all repositories for backup, several at a time (--workers);
+    repositories already backed up are fetched instead (--mirror for bare mirrors).
+    With --dedupe, repositories of one assignment share an object store, and
+    --restore rebuilds a standalone copy of any backed-up repository
 (2) Deletes all repositories
 (3) Deletes all teams
 (4) Removes all non-owner users
 
+Every stage works from one inventory of the organization (owners, members,
+repositories with collaborators, teams with members), collected with GraphQL
+and saved to a snapshot file; --plan prints what the stages would do.
+Completed work is recorded in a journal, so an interrupted run resumes where
+it stopped; --status shows each stage's progress and time remaining.
+
 This script requires a personal access token, and the author
 recommends using a dummy account for this purpose.
 """
 
 __author__      = "Ryan R. Rosario"
 
-import datetime
-from github import Github
-import configparser
 import os
-import time
-import git
+import sys
 import argparse
 
+# Before ratelimit and repo_backup, which import teaching_utilities too.
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from teaching_utilities import config, instrumentation  # noqa: E402
+import org_inventory  # noqa: E402
+import progress_journal  # noqa: E402
+import ratelimit  # noqa: E402
+import repo_backup  # noqa: E402
+
 
 def load_from_file(filename):
     """Load items from a file, one per line."""
@@ -31,142 +44,186 @@ def load_from_file(filename):
         return [line.strip() for line in f if line.strip()]
 
 
-def clone_org_repos(org_name, token, dest_dir="repos"):
-    g = Github(token)
-    org = g.get_organization(org_name)
-    username = g.get_user().login
+def clone_org_repos(org_name, token, dest_dir="repos", workers=repo_backup.WORKERS, mirror=False,
+                    dedupe=False, prefixes=(), limiter=None, inventory=None, journal=None):
+    """Back up every unarchived repository; returns the names of those whose backup failed."""
+    limiter = limiter or ratelimit.RateLimiter(ratelimit.connect(token))
+    inventory = inventory or org_inventory.load_inventory(limiter, org_name)
+    journal = journal or progress_journal.ProgressJournal(":memory:")
+    username = limiter.call(limiter.github.get_user).login
     print("Hello, {}!".format(username))
     
     if not os.path.exists(dest_dir):
         os.makedirs(dest_dir)
     
-    # Get paginated list of repos and iterate
-    repos = org.get_repos(type='all')
-    for repo in repos:
-        print(f"Processing repository: {repo.name}")
-        if repo.archived:  # Skip archived repos
-            continue
-            
-        if g.get_rate_limit().core.remaining < 100:
-            reset_time = g.get_rate_limit().core.reset
-            sleep_time = (reset_time - datetime.datetime.now()).seconds + 60
-            time.sleep(sleep_time)
-        
-        repo_path = os.path.join(dest_dir, repo.name)
-        if not os.path.exists(repo_path):
-            git.Repo.clone_from(
-                repo.clone_url.replace("https://", f"https://{token}@"),
-                repo_path
-            )
-        time.sleep(2)
-
-
-def delete_org_repos(org_name, token, include_repos=None, ignore_owner_check=False):
-    g = Github(token)
-    org = g.get_organization(org_name)
-    
-    # Get list of owners
-    owners = set(org.get_members(role="admin"))
-    owner_logins = {owner.login for owner in owners}
-    
-    # Get all repos
-    repos = org.get_repos(type='all')
-    
-    for repo in repos:
-        print(f"\nProcessing: {repo.name}")
-        
-        # Only delete repos from include list, or all if include_repos is empty
-        if include_repos and repo.name not in include_repos:
-            print(f"Skipping repo not in include list: {repo.name}")
-            continue
-            
-        # Skip if no admin access
-        if not repo.permissions.admin:
-            print(f"Skipping {repo.name} - insufficient permissions")
+    # Repositories come from the inventory; clones and fetches do not use the API.
+    jobs = []
+    for repo in inventory["repos"]:
+        if repo["archived"]:  # Skip archived repos
             continue
-        
+        repo_path = os.path.join(dest_dir, repo["name"] + (".git" if mirror else ""))
+        jobs.append((repo["name"], repo["clone_url"].replace("https://", f"https://{token}@"), repo_path))
+    jobs = journal.pending("clone", org_name, jobs, key=lambda job: job[0])
+
+    failed = []
+
+    def report(result):
+        if result["error"]:
+            instrumentation.echo(f"Error backing up {result['name']}: {result['error']}")
+            failed.append(result["name"])
+        else:
+            journal.record("clone", org_name, result["name"])
+        progress.advance(failed=result["error"] is not None)
+
+    with instrumentation.stage("clone", total=len(jobs)) as progress:
+        if dedupe:
+            # Classroom names student repositories <assignment>-<login>; a repository named after
+            # the assignment itself is taken to be the starter code.
+            urls = {name: url for name, url, _ in jobs}
+            logins = set(inventory["owners"]) | set(inventory["members"])
+            logins.update(login for repo in inventory["repos"] for login in repo["collaborators"] or ())
+            assignments = {name: repo_backup.assignment_name(name, prefixes=prefixes, logins=logins) for name in urls}
+            seeds = {assignment: urls[assignment] for assignment in set(assignments.values()) if assignment in urls}
+            results = repo_backup.backup_deduplicated(jobs, dest_dir, assignments, seeds, workers, mirror, on_done=report)
+        else:
+            results = repo_backup.backup_repos(jobs, workers, mirror, on_done=report)
+    print(repo_backup.summarize(results, progress.elapsed()))
+    if not progress.failed:
+        journal.finish("clone", org_name)
+    return failed
+
+
+def mutate(limiter, description, path):
+    """Send one DELETE through the scheduler; an object that is already gone counts as done."""
+    from github import UnknownObjectException
+    try:
+        limiter.call(limiter.github.requester.requestJsonAndCheck, "DELETE", path, mutation=True)
+    except UnknownObjectException:
+        instrumentation.echo(f"Already gone: {description}")
+
+
+def delete_org_repos(org_name, token, include_repos=None, ignore_owner_check=False, limiter=None, inventory=None, journal=None,
+                     backup_failed=()):
+    limiter = limiter or ratelimit.RateLimiter(ratelimit.connect(token))
+    # An old snapshot could miss objects created and owners added since it was taken.
+    inventory = inventory or org_inventory.load_inventory(limiter, org_name, refresh=True)
+    journal = journal or progress_journal.ProgressJournal(":memory:")
+
+    # Owners and collaborators come from the inventory, so deciding what to delete costs no requests.
+    deletions = []
+    for repo, action, reason in org_inventory.plan_repos(inventory, include_repos, ignore_owner_check, backup_failed):
+        if action == "skip":
+            print(f"Skipping {repo['name']} - {reason}")
+        else:
+            deletions.append(repo)
+
+    deletions = journal.pending("repos", org_name, deletions, key=lambda repo: repo["name"])
+
+    def process(repo):
         try:
-            # Check if any owners are collaborators on this repo (unless ignore_owner_check is True)
-            if not ignore_owner_check:
-                collaborators = set(repo.get_collaborators())
-                collaborator_logins = {collab.login for collab in collaborators}
-                
-                if owner_logins.intersection(collaborator_logins):
-                    print(f"Skipping {repo.name} - contains organization owners as collaborators")
-                    continue
-                    
-            print(f"Deleting repository: {repo.name}")
-            repo.delete()
-            time.sleep(2)  # Be nice to the API
+            mutate(limiter, repo["name"], f"/repos/{org_name}/{repo['name']}")
+            journal.record("repos", org_name, repo["name"])
+            progress.advance()
         except Exception as e:
-            print(f"Error deleting {repo.name}: {e}")
+            instrumentation.echo(f"Error deleting {repo['name']}: {e}")
+            progress.advance(failed=True)
 
+    # Deletions are independent, so the scheduler runs several at once.
+    with instrumentation.stage("delete repos", total=len(deletions)) as progress:
+        limiter.run(process, deletions)
+    if not progress.failed:
+        journal.finish("repos", org_name)
 
-def remove_non_owners(org_name, token, delete_users=None):
-    # Authenticate with the provided token
-    g = Github(token)
-    org = g.get_organization(org_name)
 
-    print(f"Processing organization: {org.login}")
-    
-    # Get all members of the organization
-    members = org.get_members(role="member")
-    
-    for member in members:
+def remove_non_owners(org_name, token, delete_users=None, limiter=None, inventory=None, journal=None):
+    limiter = limiter or ratelimit.RateLimiter(ratelimit.connect(token))
+    # An old snapshot could miss objects created and owners added since it was taken.
+    inventory = inventory or org_inventory.load_inventory(limiter, org_name, refresh=True)
+    journal = journal or progress_journal.ProgressJournal(":memory:")
+
+    print(f"Processing organization: {org_name}")
+
+    removals = []
+    for login, action, reason in org_inventory.plan_members(inventory, delete_users):
+        if action == "skip":
+            print(f"Keeping user {reason}: {login}")
+        else:
+            removals.append(login)
+
+    removals = journal.pending("members", org_name, removals, key=lambda login: login)
+
+    def process(login):
         try:
-            # Only delete specified users, or remove all non-owners if delete_users is empty
-            if delete_users and member.login not in delete_users:
-                print(f"Keeping user not in delete list: {member.login}")
-                continue
-                
-            # Remove member
-            print(f"Removing member: {member.login}")
-            org.remove_from_membership(member)
-            time.sleep(2)  # Pause to respect rate limits
-            
+            mutate(limiter, login, f"/orgs/{org_name}/memberships/{login}")
+            journal.record("members", org_name, login)
+            progress.advance()
         except Exception as e:
-            print(f"Error processing {member.login}: {e}")
+            instrumentation.echo(f"Error processing {login}: {e}")
+            progress.advance(failed=True)
 
+    with instrumentation.stage("remove members", total=len(removals)) as progress:
+        limiter.run(process, removals)
+    if not progress.failed:
+        journal.finish("members", org_name)
 
-def delete_teams(org_name, token, include_teams=None, ignore_owner_check=False):
-    g = Github(token)
-    org = g.get_organization(org_name)
-   
-    print(f"Processing organization: {org.login}")
-   
-    # Get list of owners
-    owners = set(org.get_members(role="admin"))
-   
-    # Get all teams
-    teams = org.get_teams()
+
+def delete_teams(org_name, token, include_teams=None, ignore_owner_check=False, limiter=None, inventory=None, journal=None):
+    limiter = limiter or ratelimit.RateLimiter(ratelimit.connect(token))
+    # An old snapshot could miss objects created and owners added since it was taken.
+    inventory = inventory or org_inventory.load_inventory(limiter, org_name, refresh=True)
+    journal = journal or progress_journal.ProgressJournal(":memory:")
    
-    for team in teams:
-        # Only delete teams from include list, or all if include_teams is empty
-        if include_teams and team.name not in include_teams:
-            print(f"Keeping team not in delete list: {team.name}")
-            continue
-            
+    print(f"Processing organization: {org_name}")
+
+    deletions = []
+    for team, action, reason in org_inventory.plan_teams(inventory, include_teams, ignore_owner_check):
+        if action == "skip":
+            print(f"Keeping team '{team['name']}' - {reason}")
+        else:
+            deletions.append(team)
+
+    deletions = journal.pending("teams", org_name, deletions, key=lambda team: team["id"])
+
+    def process(team):
         try:
-            # Check if any owners are in this team (unless ignore_owner_check is True)
-            if not ignore_owner_check:
-                team_members = set(team.get_members())
-                
-                if team_members.intersection(owners):
-                    print(f"Skipping team '{team.name}' as it contains owners")
-                    continue
-               
-            print(f"Deleting team: {team.name}")
-            team.delete()
-            time.sleep(1)
-           
+            mutate(limiter, team["name"], f"/orgs/{org_name}/teams/{team['slug']}")
+            journal.record("teams", org_name, team["id"])
+            progress.advance()
         except Exception as e:
-            print(f"Error processing team {team.name}: {e}")
+            instrumentation.echo(f"Error processing team {team['name']}: {e}")
+            progress.advance(failed=True)
+
+    with instrumentation.stage("delete teams", total=len(deletions)) as progress:
+        limiter.run(process, deletions)
+    if not progress.failed:
+        journal.finish("teams", org_name)
+
+
+def print_plan(inventory, include_repos=None, include_teams=None, delete_users=None, ignore_owner_check=False,
+               stages=("clone", "repos", "teams", "members")):
+    """Print what each stage would do, without making any changes."""
+    print(f"Plan for {inventory['organization']} (inventory from {inventory['collected_at']}):")
+    sections = {
+        "clone": ("Back up", [(repo["name"], "skip" if repo["archived"] else "clone", "archived" if repo["archived"] else "")
+                              for repo in inventory["repos"]]),
+        "repos": ("Delete repositories", [(repo["name"], action, reason) for repo, action, reason
+                                          in org_inventory.plan_repos(inventory, include_repos, ignore_owner_check)]),
+        "teams": ("Delete teams", [(team["name"], action, reason) for team, action, reason
+                                   in org_inventory.plan_teams(inventory, include_teams, ignore_owner_check)]),
+        "members": ("Remove members", org_inventory.plan_members(inventory, delete_users)),
+    }
+    for stage in stages:
+        title, plan = sections[stage]
+        acting = [name for name, action, _ in plan if action != "skip"]
+        print(f"\n{title}: {len(acting)} of {len(plan)}")
+        for name, action, reason in plan:
+            print(f"  {action:<7} {name}" + (f"  ({reason})" if reason else ""))
 
 
 def main():
     # Set up command line arguments
     parser = argparse.ArgumentParser(description='Clone and clean up GitHub organization repositories')
-    parser.add_argument('--config', default='config.cfg', help='Path to configuration file')
+    parser.add_argument('--config', default=config.GITHUB_CONFIG, help=f'Path to configuration file (default: {config.GITHUB_CONFIG})')
     parser.add_argument('--user-file', help='File containing usernames to DELETE (one per line)')
     parser.add_argument('--team-file', help='File containing team names to DELETE (one per line)')
     parser.add_argument('--repo-file', help='File containing repository names to DELETE (one per line)')
@@ -177,20 +234,60 @@ def main():
     parser.add_argument('--remove-users-only', action='store_true', help='Only remove non-owner users')
     parser.add_argument('--delete-teams-only', action='store_true', help='Only delete teams')
     
+    # Backup options
+    parser.add_argument('--workers', type=int, default=repo_backup.WORKERS,
+                        help=f'Number of repositories cloned or fetched at once (default: {repo_backup.WORKERS})')
+    parser.add_argument('--mirror', action='store_true', help='Back up repositories as bare mirror clones')
+    parser.add_argument('--dedupe', action='store_true',
+                        help=f'Share one object store per assignment (in repos/{repo_backup.OBJECT_STORE}) between student repositories')
+    parser.add_argument('--assignment-file', help='File of assignment name prefixes used to group repositories for --dedupe (one per line)')
+    parser.add_argument('--restore', metavar='REPO', help='Rebuild a standalone copy of a backed-up repository and exit')
+    parser.add_argument('--restore-to', metavar='DIR', help='Destination for --restore (default: REPO-restored)')
+    
+    # API options
+    parser.add_argument('--api-url', default=ratelimit.API_URL, help=f'GitHub API URL (default: {ratelimit.API_URL})')
+    parser.add_argument('--api-workers', type=int, default=ratelimit.MUTATION_WORKERS,
+                        help=f'Deletions and removals in flight at once (default: {ratelimit.MUTATION_WORKERS})')
+    parser.add_argument('--mutation-interval', type=float, default=ratelimit.MUTATION_INTERVAL,
+                        help=f'Minimum seconds between starting mutating API calls (default: {ratelimit.MUTATION_INTERVAL})')
+
+    # Inventory options
+    parser.add_argument('--inventory', help='Inventory snapshot file (default: ORGANIZATION-inventory.json)')
+    parser.add_argument('--refresh-inventory', action='store_true', help='Collect the inventory again instead of reusing the snapshot')
+    parser.add_argument('--reuse-inventory', action='store_true',
+                        help='Use the saved snapshot whatever its age, even for stages that delete '
+                             f'(by default they collect a fresh one, and others reuse one up to {org_inventory.MAX_AGE // 60} minutes old)')
+    parser.add_argument('--plan', action='store_true', help='Print what the selected stages would do, then exit without changes')
+
+    # Progress options
+    parser.add_argument('--journal', default=progress_journal.JOURNAL_FILE,
+                        help=f'Progress journal used to resume interrupted runs (default: {progress_journal.JOURNAL_FILE})')
+    parser.add_argument('--reset-journal', action='store_true', help='Forget recorded progress for the organization and start over')
+    parser.add_argument('--status', action='store_true', help='Print per-stage progress and estimated time remaining, then exit')
+    instrumentation.add_arguments(parser)
+
     # Add owner check override flag
     parser.add_argument('--ignore-owner-check', action='store_true', 
                         help='Ignore the owner check when deleting repositories or teams')
     
     args = parser.parse_args()
+    instrumentation.configure(args)
+
+    if args.restore:
+        # Restoring reads only the local backup, so it needs no configuration or token.
+        name = args.restore[:-4] if args.restore.endswith(".git") else args.restore
+        bare = os.path.exists(os.path.join("repos", name + ".git"))
+        source = os.path.join("repos", name + (".git" if bare else ""))
+        if not os.path.exists(source):
+            print(f"Error: no backup of {name} in repos")
+            return
+        dest = args.restore_to or f"{name}-restored" + (".git" if bare else "")
+        repo_backup.restore_repo(source, dest, bare)
+        print(f"Restored {name} to {dest}")
+        return
     
     # Load configuration
-    config = configparser.ConfigParser()
-    config.read(args.config)
-    
-    # Get basic configuration
-    config['github'].get('userid', 'Not specified')
-    org = config['github'].get('organization', 'Not specified')
-    token = config['github'].get('token', 'Not specified')
+    org, token = config.github_credentials(args.config)
     
     # Load inclusions/exclusions from files (if provided)
     delete_users = load_from_file(args.user_file)
@@ -201,22 +298,54 @@ def main():
     stage_flags = [args.clone_only, args.delete_repos_only, args.remove_users_only, args.delete_teams_only]
     run_all_stages = not any(stage_flags)
     
+    journal = progress_journal.ProgressJournal(args.journal)
+    if args.status:
+        progress_journal.print_status(journal, org)
+        return
+    if args.reset_journal:
+        journal.reset(org)
+
+    # One client and scheduler for every stage, so they share the quota they observe.
+    limiter = ratelimit.RateLimiter(ratelimit.connect(token, args.api_url, args.api_workers),
+                                    args.api_workers, args.mutation_interval)
+    deleting = not args.plan and (run_all_stages or args.delete_repos_only or args.remove_users_only
+                                  or args.delete_teams_only)
+    refresh = args.refresh_inventory or (deleting and not args.reuse_inventory)
+    if deleting and refresh and not args.refresh_inventory:
+        print("Collecting a fresh inventory because this run deletes; --reuse-inventory to use the saved snapshot")
+    with instrumentation.stage("inventory"):
+        inventory = org_inventory.load_inventory(limiter, org, args.inventory, refresh,
+                                                 None if args.reuse_inventory else org_inventory.MAX_AGE)
+
+    if args.plan:
+        stages = [stage for stage, flag in (("clone", args.clone_only), ("repos", args.delete_repos_only),
+                                            ("teams", args.delete_teams_only), ("members", args.remove_users_only))
+                  if flag or run_all_stages]
+        print_plan(inventory, include_repos, include_teams, delete_users, args.ignore_owner_check, stages)
+        return
+
     # Execute the functions based on flags
+    backup_failed = []
     if run_all_stages or args.clone_only:
         print("=== CLONING REPOSITORIES ===")
-        clone_org_repos(org, token, "repos")
+        backup_failed = clone_org_repos(org, token, "repos", args.workers, args.mirror, args.dedupe,
+                        load_from_file(args.assignment_file), limiter, inventory, journal)
         
     if run_all_stages or args.delete_repos_only:
         print("=== DELETING REPOSITORIES ===")
-        delete_org_repos(org, token, include_repos, args.ignore_owner_check)
+        # A repository whose backup failed is kept, so its only copy is not lost.
+        delete_org_repos(org, token, include_repos, args.ignore_owner_check, limiter, inventory, journal, backup_failed)
 
     if run_all_stages or args.delete_teams_only:
         print("=== DELETING TEAMS ===")
-        delete_teams(org, token, include_teams, args.ignore_owner_check)
+        delete_teams(org, token, include_teams, args.ignore_owner_check, limiter, inventory, journal)
         
     if run_all_stages or args.remove_users_only:
         print("=== REMOVING NON-OWNER USERS ===")
-        remove_non_owners(org, token, delete_users)
+        remove_non_owners(org, token, delete_users, limiter, inventory, journal)
+
+    print(limiter.summary())
+    journal.close()
 
 
 if __name__ == "__main__":
@@ -0,0 +1,211 @@
+"""A snapshot of everything end-term.py acts on, collected once per run with a few GraphQL queries."""
+
+import datetime
+import json
+import os
+
+PAGE_SIZE = 100
+NESTED_PAGE_SIZE = 50
+# Repositories created and owners added after a snapshot are invisible to its plans, so it is only reused briefly.
+MAX_AGE = 15 * 60
+
+MEMBERS_QUERY = """
+query($org: String!, $after: String) {
+  organization(login: $org) {
+    membersWithRole(first: %d, after: $after) {
+      edges { role node { login } }
+      pageInfo { hasNextPage endCursor }
+    }
+  }
+}
+""" % PAGE_SIZE
+
+REPOS_QUERY = """
+query($org: String!, $after: String) {
+  organization(login: $org) {
+    repositories(first: %d, after: $after) {
+      nodes {
+        name isArchived url viewerCanAdminister
+        collaborators(first: %d, affiliation: ALL) {
+          nodes { login }
+          pageInfo { hasNextPage }
+        }
+      }
+      pageInfo { hasNextPage endCursor }
+    }
+  }
+}
+""" % (PAGE_SIZE, NESTED_PAGE_SIZE)
+
+TEAMS_QUERY = """
+query($org: String!, $after: String) {
+  organization(login: $org) {
+    teams(first: %d, after: $after) {
+      nodes {
+        name slug databaseId
+        members(first: %d, membership: ALL) {
+          nodes { login }
+          pageInfo { hasNextPage }
+        }
+      }
+      pageInfo { hasNextPage endCursor }
+    }
+  }
+}
+""" % (PAGE_SIZE, NESTED_PAGE_SIZE)
+
+
+def snapshot_path(org_name: str) -> str:
+    return f"{org_name}-inventory.json"
+
+
+def graphql(limiter, query: str, variables: dict) -> dict:
+    """The data of a GraphQL response, raising only if errors left none for the organization."""
+    from github import GithubException
+    requester = limiter.github.requester
+    # Not graphql_query, which raises on any error: repositories the token cannot administer add one each.
+    headers, response = limiter.call(requester.requestJsonAndCheck, "POST", requester.graphql_url,
+                                     input={"query": query, "variables": variables})
+    data = response.get("data") or {}
+    if response.get("errors") and not data.get("organization"):
+        raise GithubException(400, response, headers)
+    return data
+
+
+def paginate(limiter, query: str, org_name: str, field: str):
+    """Yield every node (or edge, for members) of an organization connection."""
+    after = None
+    while True:
+        data = graphql(limiter, query, {"org": org_name, "after": after})
+        connection = data["organization"][field]
+        yield from connection.get("edges") or connection.get("nodes") or []
+        if not connection["pageInfo"]["hasNextPage"]:
+            return
+        after = connection["pageInfo"]["endCursor"]
+
+
+def rest_logins(limiter, url: str) -> list:
+    """Every login in a paginated REST listing, for the few lists longer than one GraphQL page."""
+    logins, page = [], 1
+    while True:
+        _, data = limiter.call(limiter.github.requester.requestJsonAndCheck, "GET", url,
+                               parameters={"per_page": PAGE_SIZE, "page": page})
+        logins.extend(user["login"] for user in data)
+        if len(data) < PAGE_SIZE:
+            return logins
+        page += 1
+
+
+def collect_inventory(limiter, org_name: str) -> dict:
+    owners, members = [], []
+    for edge in paginate(limiter, MEMBERS_QUERY, org_name, "membersWithRole"):
+        (owners if edge["role"] == "ADMIN" else members).append(edge["node"]["login"])
+
+    repos = []
+    for node in paginate(limiter, REPOS_QUERY, org_name, "repositories"):
+        # collaborators is null for repositories the token cannot administer.
+        collaborators = node.get("collaborators") or {"nodes": [], "pageInfo": {"hasNextPage": False}}
+        logins = [user["login"] for user in collaborators["nodes"]]
+        if collaborators["pageInfo"]["hasNextPage"]:
+            logins = rest_logins(limiter, f"/repos/{org_name}/{node['name']}/collaborators")
+        repos.append({
+            "name": node["name"],
+            "archived": node["isArchived"],
+            "admin": node["viewerCanAdminister"],
+            "clone_url": node["url"] + ".git",
+            "collaborators": logins,
+        })
+
+    teams = []
+    for node in paginate(limiter, TEAMS_QUERY, org_name, "teams"):
+        logins = [user["login"] for user in node["members"]["nodes"]]
+        if node["members"]["pageInfo"]["hasNextPage"]:
+            logins = rest_logins(limiter, f"/orgs/{org_name}/teams/{node['slug']}/members")
+        teams.append({"name": node["name"], "slug": node["slug"], "id": node["databaseId"], "members": logins})
+
+    return {
+        "organization": org_name,
+        "collected_at": datetime.datetime.now(datetime.timezone.utc).isoformat(timespec="seconds"),
+        "owners": owners,
+        "members": members,
+        "repos": repos,
+        "teams": teams,
+    }
+
+
+def save_inventory(inventory: dict, path: str):
+    temporary = path + ".tmp"
+    with open(temporary, "w") as f:
+        json.dump(inventory, f, indent=1)
+    os.replace(temporary, path)
+
+
+def snapshot_age(inventory: dict) -> float:
+    """Seconds since the snapshot was collected."""
+    collected = datetime.datetime.fromisoformat(inventory["collected_at"])
+    return (datetime.datetime.now(datetime.timezone.utc) - collected).total_seconds()
+
+
+def load_inventory(limiter, org_name: str, path: str = None, refresh: bool = False, max_age: float = MAX_AGE) -> dict:
+    """Read the saved snapshot if it is at most max_age seconds old (any age if max_age is None).
+
+    A new one is collected and saved if it is missing, older, or refresh is set.
+    """
+    path = path or snapshot_path(org_name)
+    if not refresh and os.path.exists(path):
+        with open(path) as f:
+            inventory = json.load(f)
+        if inventory.get("organization") == org_name:
+            age = snapshot_age(inventory)
+            if max_age is None or age <= max_age:
+                print(f"Using inventory of {org_name} collected {age / 60:.0f} minutes ago, at "
+                      f"{inventory['collected_at']} ({path}); --refresh-inventory to collect it again")
+                return inventory
+            print(f"Inventory in {path} is {age / 60:.0f} minutes old, more than {max_age / 60:.0f}")
+    print(f"Collecting inventory of {org_name}...")
+    inventory = collect_inventory(limiter, org_name)
+    save_inventory(inventory, path)
+    print(f"Saved {len(inventory['repos'])} repositories, {len(inventory['teams'])} teams, "
+          f"{len(inventory['members'])} members and {len(inventory['owners'])} owners to {path}")
+    return inventory
+
+
+def plan_repos(inventory: dict, include_repos=None, ignore_owner_check=False, backup_failed=()) -> list:
+    """(repo, action, reason) for every repository; action is "delete" or "skip"."""
+    owners = set(inventory["owners"])
+    plan = []
+    for repo in inventory["repos"]:
+        if include_repos and repo["name"] not in include_repos:
+            plan.append((repo, "skip", "not in include list"))
+        elif repo["name"] in backup_failed:
+            plan.append((repo, "skip", "backup failed"))
+        elif not repo["admin"]:
+            plan.append((repo, "skip", "insufficient permissions"))
+        elif not ignore_owner_check and owners.intersection(repo["collaborators"]):
+            plan.append((repo, "skip", "contains organization owners as collaborators"))
+        else:
+            plan.append((repo, "delete", ""))
+    return plan
+
+
+def plan_teams(inventory: dict, include_teams=None, ignore_owner_check=False) -> list:
+    owners = set(inventory["owners"])
+    plan = []
+    for team in inventory["teams"]:
+        if include_teams and team["name"] not in include_teams:
+            plan.append((team, "skip", "not in delete list"))
+        elif not ignore_owner_check and owners.intersection(team["members"]):
+            plan.append((team, "skip", "contains owners"))
+        else:
+            plan.append((team, "delete", ""))
+    return plan
+
+
+def plan_members(inventory: dict, delete_users=None) -> list:
+    plan = []
+    for login in inventory["members"]:
+        if delete_users and login not in delete_users:
+            plan.append((login, "skip", "not in delete list"))
+        else:
+            plan.append((login, "remove", ""))
+    return plan
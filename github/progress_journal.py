@@ -0,0 +1,141 @@
+"""Durable record of the work end-term.py has finished, so a rerun can resume."""
+
+import sqlite3
+import threading
+import time
+
+JOURNAL_FILE = "end-term-journal.sqlite"
+STAGES = ("clone", "repos", "teams", "members")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS progress (
+    stage TEXT NOT NULL,
+    org TEXT NOT NULL,
+    object_id TEXT NOT NULL,
+    completed_at REAL NOT NULL,
+    PRIMARY KEY (stage, org, object_id)
+);
+CREATE TABLE IF NOT EXISTS stages (
+    stage TEXT NOT NULL,
+    org TEXT NOT NULL,
+    total INTEGER NOT NULL,
+    started_at REAL NOT NULL,
+    completed_at REAL,
+    PRIMARY KEY (stage, org)
+);
+"""
+
+
+def format_seconds(seconds: float) -> str:
+    seconds = int(round(seconds))
+    if seconds < 60:
+        return f"{seconds}s"
+    if seconds < 3600:
+        return f"{seconds // 60}m{seconds % 60:02d}s"
+    return f"{seconds // 3600}h{seconds % 3600 // 60:02d}m"
+
+
+class ProgressJournal:
+    def __init__(self, path: str = JOURNAL_FILE):
+        # Stages record from worker threads; one connection guarded by a lock keeps writes ordered.
+        self.connection = sqlite3.connect(path, check_same_thread=False)
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.executescript(SCHEMA)
+        columns = [row[1] for row in self.connection.execute("PRAGMA table_info(stages)")]
+        if "completed_at" not in columns:
+            # Journals written before stages were marked completed.
+            self.connection.execute("ALTER TABLE stages ADD COLUMN completed_at REAL")
+        self.lock = threading.Lock()
+
+    def completed(self, stage: str, org: str) -> set:
+        with self.lock:
+            rows = self.connection.execute("SELECT object_id FROM progress WHERE stage = ? AND org = ?", (stage, org))
+            return {row[0] for row in rows}
+
+    def start(self, stage: str, org: str, total: int):
+        """Note how many objects a stage covers; the first start time is kept across restarts of an unfinished stage."""
+        with self.lock, self.connection:
+            self.connection.execute(
+                "INSERT INTO stages VALUES (?, ?, ?, ?, NULL) ON CONFLICT (stage, org) DO UPDATE SET "
+                "total = excluded.total, completed_at = NULL, "
+                "started_at = CASE WHEN completed_at IS NULL THEN started_at ELSE excluded.started_at END",
+                (stage, org, total, time.time()))
+
+    def pending(self, stage: str, org: str, items: list, key) -> list:
+        """Start a stage over items and return those not yet recorded as done, by key(item)."""
+        finished = self.completed(stage, org)
+        self.start(stage, org, len(items))
+        remaining = [item for item in items if str(key(item)) not in finished]
+        if len(remaining) < len(items):
+            print(f"Resuming {stage}: {len(items) - len(remaining)} of {len(items)} already done")
+        return remaining
+
+    def record(self, stage: str, org: str, object_id: str):
+        with self.lock, self.connection:
+            self.connection.execute("INSERT OR REPLACE INTO progress VALUES (?, ?, ?, ?)",
+                                    (stage, org, str(object_id), time.time()))
+
+    def finish(self, stage: str, org: str):
+        """Mark a stage completed and clear its objects, so the next run starts it over instead of skipping them."""
+        with self.lock, self.connection:
+            self.connection.execute("DELETE FROM progress WHERE stage = ? AND org = ?", (stage, org))
+            self.connection.execute("UPDATE stages SET completed_at = ? WHERE stage = ? AND org = ?",
+                                    (time.time(), stage, org))
+
+    def reset(self, org: str):
+        with self.lock, self.connection:
+            self.connection.execute("DELETE FROM progress WHERE org = ?", (org,))
+            self.connection.execute("DELETE FROM stages WHERE org = ?", (org,))
+
+    def status(self, org: str) -> list:
+        """Per-stage progress, with the observed rate and the estimated time remaining."""
+        rows = []
+        with self.lock:
+            stages = {row[0]: row[1:] for row in self.connection.execute(
+                "SELECT stage, total, started_at, completed_at FROM stages WHERE org = ?", (org,))}
+            for stage in STAGES:
+                total, started, completed = stages.get(stage, (None, None, None))
+                if completed is not None:
+                    # The objects of a completed stage are cleared; its start and end times give the rate.
+                    rows.append({"stage": stage, "done": total, "total": total, "eta": 0.0, "last": completed,
+                                 "rate": total / (completed - started) if total and completed > started else None,
+                                 "completed": completed})
+                    continue
+                done, first, last = self.connection.execute(
+                    "SELECT COUNT(*), MIN(completed_at), MAX(completed_at) FROM progress WHERE stage = ? AND org = ?",
+                    (stage, org)).fetchone()
+                rate = (done - 1) / (last - first) if done > 1 and last > first else None
+                remaining = max(0, total - done) if total is not None else None
+                rows.append({
+                    "stage": stage,
+                    "done": done,
+                    "total": total,
+                    "rate": rate,
+                    "eta": remaining / rate if rate and remaining else (0.0 if remaining == 0 else None),
+                    "last": last,
+                    "completed": None,
+                })
+        return rows
+
+    def close(self):
+        self.connection.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def print_status(journal: ProgressJournal, org: str):
+    print(f"Progress for {org}:")
+    for row in journal.status(org):
+        total = "?" if row["total"] is None else row["total"]
+        rate = f"{row['rate'] * 60:.1f}/min" if row["rate"] else "-"
+        if row["completed"] is not None:
+            eta = "completed " + time.strftime("%Y-%m-%d %H:%M", time.localtime(row["completed"]))
+        elif row["eta"] is None:
+            eta = "not started" if not row["done"] and row["total"] is None else "unknown"
+        else:
+            eta = "done" if row["eta"] == 0 else format_seconds(row["eta"])
+        print(f"  {row['stage']:<8}{row['done']:>6} / {total:<6}  {rate:>10}  remaining: {eta}")
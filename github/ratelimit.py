@@ -0,0 +1,146 @@
+"""One GitHub API scheduler shared by every end-term.py stage."""
+
+from __future__ import annotations
+
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from github import Github, GithubException
+
+from teaching_utilities import instrumentation
+
+API_URL = "https://api.github.com"
+MUTATION_WORKERS = 4
+MUTATION_INTERVAL = 1.0
+MAX_INTERVAL = 10.0
+RESERVE = 100
+MAX_RETRIES = 6
+BASE_BACKOFF = 60.0
+
+
+def connect(token: str, api_url: str = None, workers: int = MUTATION_WORKERS) -> Github:
+    """A client whose pacing and retries are left to RateLimiter rather than PyGithub."""
+    from github import Auth, Github
+    return Github(auth=Auth.Token(token), base_url=api_url or API_URL, retry=None, pool_size=max(10, workers),
+                  seconds_between_requests=None, seconds_between_writes=None)
+
+
+def retry_delay(headers: dict, attempt: int, now: float = None) -> float:
+    """Seconds to wait before retrying a rate-limited request.
+
+    Retry-After wins; an exhausted primary limit waits for X-RateLimit-Reset; otherwise
+    (a secondary limit without a hint) back off exponentially from BASE_BACKOFF.
+    """
+    now = time.time() if now is None else now
+    headers = {name.lower(): value for name, value in (headers or {}).items()}
+    if headers.get("retry-after"):
+        try:
+            return max(0.0, float(headers["retry-after"]))
+        except ValueError:
+            pass
+    if headers.get("x-ratelimit-remaining") == "0" and headers.get("x-ratelimit-reset"):
+        return max(0.0, float(headers["x-ratelimit-reset"]) - now) + 1
+    return BASE_BACKOFF * 2 ** attempt
+
+
+def is_rate_limited(e: GithubException) -> bool:
+    if e.status == 429:
+        return True
+    if e.status != 403:
+        return False
+    headers = {name.lower(): value for name, value in (e.headers or {}).items()}
+    message = str((e.data or {}).get("message", "")) if isinstance(e.data, dict) else ""
+    return ("retry-after" in headers or headers.get("x-ratelimit-remaining") == "0"
+            or "rate limit" in message.lower())
+
+
+def operation_name(function, args: tuple) -> str:
+    """How a call is labelled in the instrumentation: the HTTP verb of a raw request, GraphQL, or the method name."""
+    name = getattr(function, "__name__", "call")
+    if name.startswith("requestJson") and args:
+        return "graphql" if len(args) > 1 and str(args[1]).endswith("/graphql") else str(args[0])
+    return "graphql" if name.startswith("graphql") else name
+
+
+class RateLimiter:
+    def __init__(self, g: Github, workers: int = MUTATION_WORKERS, interval: float = MUTATION_INTERVAL,
+                 reserve: int = RESERVE):
+        self.github = g
+        self.workers = max(1, workers)
+        self.interval = interval
+        self.reserve = reserve
+        self.lock = threading.Lock()
+        self.mutations = threading.BoundedSemaphore(self.workers)
+        self.next_mutation = 0.0
+        self.resume_at = 0.0
+        self.retries = 0
+        self.waited = 0.0
+
+    def _sleep_until(self, deadline: float, reason: str):
+        delay = deadline - time.time()
+        if delay > 0:
+            if delay > 5:
+                instrumentation.echo(f"{reason}; sleeping {delay:.0f}s")
+            instrumentation.sleep("github", delay, reason.lower())
+
+    def wait(self):
+        """Block while a retry pause is in effect or the primary quota is nearly exhausted."""
+        self._sleep_until(self.resume_at, "Rate limited")
+        # The requester's copy is updated from response headers; g.rate_limiting would
+        # fetch /rate_limit whenever no header has been seen yet.
+        remaining, _ = self.github.requester.rate_limiting
+        if 0 <= remaining < self.reserve:
+            self._sleep_until(self.github.requester.rate_limiting_resettime + 1, "Rate limit nearly exhausted")
+
+    def _pace_mutation(self):
+        with self.lock:
+            start = max(time.time(), self.next_mutation)
+            self.next_mutation = start + self.interval
+        self._sleep_until(start, "Pacing mutations")
+
+    def call(self, function, *args, mutation: bool = False, **kwargs):
+        """Call a PyGithub method, waiting and retrying as the rate-limit headers direct."""
+        from github import GithubException
+        operation = operation_name(function, args)
+        for attempt in range(MAX_RETRIES + 1):
+            self.wait()
+            try:
+                if not mutation:
+                    with instrumentation.call("github", operation):
+                        return function(*args, **kwargs)
+                with self.mutations:
+                    self._pace_mutation()
+                    with instrumentation.call("github", operation):
+                        return function(*args, **kwargs)
+            except GithubException as e:
+                if not is_rate_limited(e) or attempt == MAX_RETRIES:
+                    raise
+                instrumentation.retry("github", "secondary rate limit" if mutation else "rate limited")
+                resume_at = time.time() + retry_delay(e.headers, attempt)
+                with self.lock:
+                    self.retries += 1
+                    # Every caller pauses, so count only the wall-clock time this adds.
+                    self.waited += max(0.0, resume_at - max(self.resume_at, time.time()))
+                    self.resume_at = max(self.resume_at, resume_at)
+                    if mutation:
+                        # Mutations were coming too fast: slow down, and restart them one interval apart.
+                        self.interval = min(MAX_INTERVAL, max(self.interval * 2, 0.1))
+                        self.next_mutation = max(self.next_mutation, self.resume_at)
+
+    def run(self, function, items) -> list:
+        """Apply function to each item concurrently, at most self.workers at a time.
+
+        function does its own error reporting; results are returned in order.
+        """
+        items = list(items)
+        if self.workers == 1 or len(items) < 2:
+            return [function(item) for item in items]
+        with ThreadPoolExecutor(max_workers=self.workers) as pool:
+            return list(pool.map(function, items))
+
+    def summary(self) -> str:
+        remaining, limit = self.github.requester.rate_limiting
+        return f"API quota {remaining}/{limit} remaining; {self.retries} rate-limit retries, {self.waited:.0f}s waiting"
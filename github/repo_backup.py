@@ -0,0 +1,146 @@
+"""Concurrent, incremental git backups used by end-term.py."""
+
+import os
+import re
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from teaching_utilities import instrumentation
+
+WORKERS = 8
+OBJECT_STORE = ".objects"
+CREDENTIALS = re.compile(r"(https?://)[^/@\s]+@")
+
+
+def directory_size(path: str) -> int:
+    total = 0
+    for root, _, files in os.walk(path):
+        for name in files:
+            try:
+                total += os.path.getsize(os.path.join(root, name))
+            except OSError:
+                pass
+    return total
+
+
+def backup_repo(name: str, url: str, path: str, mirror: bool = False, reference: str = None) -> dict:
+    """Clone url into path, or fetch into it if it already exists.
+
+    With reference, the clone borrows objects from that repository instead of copying them.
+
+    Returns a summary with the action taken, the bytes added on disk and any error.
+    """
+    import git  # GitPython is only loaded once there is something to back up.
+    start = time.perf_counter()
+    before = directory_size(path) if os.path.exists(path) else 0
+    result = {"name": name, "path": path, "action": None, "bytes": 0, "seconds": 0.0, "error": None}
+    try:
+        if os.path.exists(path):
+            repo = git.Repo(path)
+            # The token embedded in the remote URL may have changed since the first clone.
+            repo.remote("origin").set_url(url)
+            with instrumentation.call("git", "fetch"):
+                repo.git.fetch("--all", "--prune", "--tags")
+            result["action"] = "fetched"
+        else:
+            options = {"reference": reference} if reference else {}
+            with instrumentation.call("git", "clone"):
+                git.Repo.clone_from(url, path, mirror=mirror, **options)
+            result["action"] = "cloned"
+    except (git.GitCommandError, git.InvalidGitRepositoryError, git.NoSuchPathError, ValueError) as e:
+        # Git echoes the command line, which includes the token in the URL.
+        result["error"] = CREDENTIALS.sub(r"\1***@", str(e))
+    result["bytes"] = max(0, directory_size(path) - before) if os.path.exists(path) else 0
+    result["seconds"] = time.perf_counter() - start
+    return result
+
+
+def backup_repos(jobs: list, workers: int = WORKERS, mirror: bool = False, on_done=None) -> list:
+    """Back up (name, url, path) or (name, url, path, reference) jobs with at most workers transfers in flight.
+
+    on_done, if given, is called with each result as it completes.
+    """
+    results = []
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        futures = [pool.submit(backup_repo, *job[:3], mirror, *job[3:]) for job in jobs]
+        for future in as_completed(futures):
+            result = future.result()
+            if on_done:
+                on_done(result)
+            results.append(result)
+    return results
+
+
+def assignment_name(repo_name: str, template: str = None, prefixes: list = (), logins=()) -> str:
+    """The assignment a Classroom repository belongs to: its template if known, else a matching
+    prefix, else the name less a -<login> suffix (Classroom names repos <assignment>-<login>).
+
+    None if there is none of these; such a repository is cloned on its own.
+    """
+    if template:
+        return template
+    for prefix in sorted(prefixes, key=len, reverse=True):
+        if repo_name.startswith(prefix):
+            return prefix.rstrip("-")
+    # Logins can contain '-' themselves, so the suffix is matched against known logins, longest first.
+    lowered = repo_name.lower()
+    for login in sorted(logins, key=len, reverse=True):
+        if lowered.endswith("-" + login.lower()) and len(repo_name) > len(login) + 1:
+            return repo_name[:-len(login) - 1]
+    return None
+
+
+def store_path(dest_dir: str, assignment: str) -> str:
+    return os.path.join(dest_dir, OBJECT_STORE, assignment + ".git")
+
+
+def backup_deduplicated(jobs: list, dest_dir: str, assignments: dict, seeds: dict = None,
+                        workers: int = WORKERS, mirror: bool = False, on_done=None) -> list:
+    """Back up (name, url, path) jobs, with repositories of one assignment sharing an object store.
+
+    assignments maps repository names to assignments; seeds optionally maps an assignment to the
+    URL of its starter code. Otherwise the store is seeded from the assignment's first repository.
+    A repository without a store (an assignment of one, or a failed seed) is cloned on its own.
+    """
+    import git
+    groups = {}
+    for job in jobs:
+        groups.setdefault(assignments.get(job[0]), []).append(job)
+    seeds = seeds or {}
+    store_jobs = [(assignment, seeds.get(assignment, members[0][1]), store_path(dest_dir, assignment))
+                  for assignment, members in groups.items()
+                  if assignment is not None and (len(members) > 1 or assignment in seeds)]
+
+    stores = {}
+    for result in backup_repos(store_jobs, workers, mirror=True):
+        if result["error"]:
+            print(f"Error seeding object store for {result['name']}: {result['error']}")
+            continue
+        # Student clones depend on these objects, so the store must never prune any.
+        with git.Repo(result["path"]).config_writer() as config:
+            config.set_value("gc", "auto", 0)
+            config.set_value("gc", "pruneExpire", "never")
+        stores[result["name"]] = os.path.abspath(result["path"])
+
+    jobs = [job + (stores[assignments[job[0]]],) if assignments.get(job[0]) in stores else job for job in jobs]
+    return backup_repos(jobs, workers, mirror, on_done)
+
+
+def restore_repo(path: str, dest: str, bare: bool = False):
+    """Copy a backup into dest as a standalone repository with all of its objects.
+
+    --no-local makes git transfer objects over its pack protocol, which reads through
+    alternates, instead of hard-linking the object directory and keeping the borrowing.
+    """
+    import git
+    git.Repo.clone_from(os.path.abspath(path), dest, no_local=True, mirror=bare)
+
+
+def summarize(results: list, seconds: float) -> str:
+    cloned = sum(result["action"] == "cloned" for result in results)
+    fetched = sum(result["action"] == "fetched" for result in results)
+    failed = sum(result["error"] is not None for result in results)
+    transferred = sum(result["bytes"] for result in results)
+    rate = len(results) / (seconds / 60) if seconds else 0
+    return (f"Backed up {len(results)} repositories ({cloned} cloned, {fetched} fetched, {failed} failed) "
+            f"in {seconds:.0f}s: {rate:.1f} repos/minute, {transferred / 2 ** 20:.1f} MB written")
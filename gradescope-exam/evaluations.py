@@ -0,0 +1,177 @@
+"""Load a Gradescope "Export Evaluations" directory into one students x items score matrix."""
+
+import csv
+import glob
+import json
+import os
+import re
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+# An item's CSV has IDs and student details, the item score, submission time, one true/false column per rubric
+# item and TRAILING_COLUMNS; summary rows ("Point Values", ...) follow the students.
+SUBMISSION_ID = 1
+ITEM_SCORE = 8
+FIRST_RUBRIC = 10
+TRAILING_COLUMNS = 4  # score adjustment, comments, grader name, tags
+NO_RESPONSE = "no response"
+SUMMARY_ROWS = {"point values", "rubric numbers", "rubric type", "scoring method"}
+CACHE_KIND = "evaluation-item-1"
+STUDENT_FIELDS = ["first_name", "last_name", "sid", "email"]
+PART = re.compile(r"^\s*(?:q(?:uestion)?\s*)?(\d+(?:\.\d+)*\s*(?:\(\s*[a-z0-9]+\s*\)|[a-z](?![a-z]))?)", re.I)
+
+
+def normalize_part(part: str) -> str:
+    """1(a), 1a and "1 (A)" all name the same problem part."""
+    return re.sub(r"[\s()]", "", part).lower()
+
+
+def split_tags(value: str) -> list:
+    return [tag.strip() for tag in re.split(r"[,;]", value or "") if tag.strip()]
+
+
+def item_part(name: str, tags: list) -> str:
+    """The problem part an item belongs to: its link: tag, else the ID its name starts with, else the name."""
+    for tag in tags:
+        if tag.lower().startswith("link:"):
+            return normalize_part(tag[5:])
+    match = PART.match(name.replace("_", " "))
+    return normalize_part(match.group(1)) if match else name
+
+
+def is_true(value: str) -> bool:
+    return value.strip().lower() in ("true", "1", "yes", "x")
+
+
+def to_float(value: str) -> float:
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return 0.0
+
+
+def read_item(path: str) -> dict:
+    """Parse one item's evaluation CSV into arrays keyed by submission."""
+    with open(path, newline="", encoding="utf-8-sig") as f:
+        # An empty file is read as an item with no header and no students.
+        rows = list(csv.reader(f)) or [[]]
+    header, rows = rows[0], [row for row in rows[1:] if row and any(cell.strip() for cell in row)]
+    rubric = header[FIRST_RUBRIC:len(header) - TRAILING_COLUMNS]
+    omit_column = next((FIRST_RUBRIC + i for i, title in enumerate(rubric) if title.strip().lower() == NO_RESPONSE), None)
+
+    students = [row for row in rows if row[0].strip().lower() not in SUMMARY_ROWS]
+    summary = {row[0].strip().lower(): row for row in rows if row[0].strip().lower() in SUMMARY_ROWS}
+    tags = next((split_tags(row[-1]) for row in students if len(row) == len(header) and row[-1].strip()), [])
+
+    scores = np.array([to_float(row[ITEM_SCORE]) for row in students], dtype=np.float64)
+    omitted = np.array([omit_column is not None and is_true(row[omit_column]) for row in students], dtype=bool)
+    # The most an item is worth: its highest rubric value when Gradescope lists them, else the best observed score.
+    point_values = [to_float(value) for value in summary.get("point values", [])[FIRST_RUBRIC:len(header) - TRAILING_COLUMNS]]
+    max_points = max([scores.max(initial=0.0)] + point_values)
+
+    name = os.path.splitext(os.path.basename(path))[0]
+    return {
+        "name": name,
+        "tags": tags,
+        "part": item_part(name, tags),
+        "max_points": max_points,
+        "has_no_response": omit_column is not None,
+        "submissions": [row[SUBMISSION_ID] for row in students],
+        "students": [(row[3], row[4], row[5], row[6]) for row in students],
+        "scores": scores,
+        "omitted": omitted,
+    }
+
+
+def item_table(item: dict):
+    """An item as an Arrow table, with its name, tags, part and points in the schema metadata."""
+    import pyarrow as pa  # Only needed with a cache.
+    columns = {"submission": item["submissions"]}
+    for position, field in enumerate(STUDENT_FIELDS):
+        columns[field] = [student[position] for student in item["students"]]
+    columns["score"] = item["scores"]
+    columns["omitted"] = item["omitted"]
+    details = {key: item[key] for key in ("name", "tags", "part", "max_points", "has_no_response")}
+    return pa.table(columns).replace_schema_metadata({"item": json.dumps(details)})
+
+
+def table_item(table) -> dict:
+    item = json.loads(table.schema.metadata[b"item"])
+    item["submissions"] = table.column("submission").to_pylist()
+    # Student details are converted only if Exam needs them (see student_rows).
+    item["students"] = table.select(STUDENT_FIELDS)
+    item["scores"] = table.column("score").to_numpy()
+    item["omitted"] = table.column("omitted").to_numpy(zero_copy_only=False)
+    return item
+
+
+def student_rows(students) -> list:
+    """(first, last, SID, email) tuples from read_item()'s list or table_item()'s Arrow table."""
+    if isinstance(students, list):
+        return students
+    return list(zip(*(students.column(field).to_pylist() for field in STUDENT_FIELDS)))
+
+
+def item_files(export_dir: str) -> list:
+    def order(path):
+        # Natural order, so item 10 follows item 9.
+        return [int(piece) if piece.isdigit() else piece.lower() for piece in re.split(r"(\d+)", os.path.basename(path))]
+    return sorted(glob.glob(os.path.join(export_dir, "**", "*.csv"), recursive=True), key=order)
+
+
+class Exam:
+    """Scores of every student (rows) on every item (columns)."""
+
+    def __init__(self, items: list):
+        # Items usually list the same roster in the same order; then no merging is needed.
+        first = items[0]["submissions"]
+        if all(item["submissions"] == first for item in items):
+            self.submissions, self.students = list(first), student_rows(items[0]["students"])
+        else:
+            submissions = {}
+            for item in items:
+                for submission, student in zip(item["submissions"], student_rows(item["students"])):
+                    submissions.setdefault(submission, student)
+            self.submissions = list(submissions)
+            self.students = list(submissions.values())
+        self.items = [item["name"] for item in items]
+        self.tags = [item["tags"] for item in items]
+        self.parts = [item["part"] for item in items]
+        self.max_points = np.array([item["max_points"] for item in items], dtype=np.float64)
+        self.has_no_response = np.array([item["has_no_response"] for item in items], dtype=bool)
+
+        row_of = {submission: row for row, submission in enumerate(self.submissions)}
+        self.scores = np.zeros((len(self.submissions), len(items)), dtype=np.float64)
+        # A student missing from an item's file never answered it.
+        self.omitted = np.ones((len(self.submissions), len(items)), dtype=bool)
+        for column, item in enumerate(items):
+            if item["submissions"] == self.submissions:
+                rows = slice(None)
+            else:
+                rows = np.fromiter((row_of[submission] for submission in item["submissions"]), dtype=np.intp,
+                                   count=len(item["submissions"]))
+            self.scores[rows, column] = item["scores"]
+            self.omitted[rows, column] = item["omitted"]
+
+
+def read_items(paths: list, workers: int = None) -> list:
+    if workers == 1 or len(paths) < 2:
+        return [read_item(path) for path in paths]
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        return list(pool.map(read_item, paths))
+
+
+def load_exam(export_dir: str, workers: int = None, cache=None) -> Exam:
+    paths = item_files(export_dir)
+    if not paths:
+        raise ValueError(f"no item CSV files in {export_dir}")
+    if cache is None:
+        return Exam(read_items(paths, workers))
+
+    stale = cache.stale(paths, CACHE_KIND)
+    parsed = dict(zip(stale, read_items(stale, workers)))
+    for path, item in parsed.items():
+        cache.store(path, CACHE_KIND, item_table(item))
+    cache.save()
+    return Exam([parsed[path] if path in parsed else table_item(cache.load(path)) for path in paths])
@@ -0,0 +1,110 @@
+import argparse
+import csv
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from teaching_utilities import instrumentation  # noqa: E402
+
+ITEM_COLUMNS = ["mean", "difficulty", "discrimination", "point_biserial", "corrected_item_total", "omit_rate",
+                "alpha_if_deleted"]
+
+
+def rounded(value, digits: int = 4):
+    value = float(value)
+    return "" if value != value else round(value, digits)
+
+
+def write_csv(path: str, fieldnames: list, rows: list):
+    with open(path, "w", newline="") as f:
+        writer = csv.DictWriter(f, fieldnames=fieldnames)
+        writer.writeheader()
+        writer.writerows(rows)
+
+
+def main(export_dir: str, outdir: str, by_part: bool = False, workers: int = None, export_cache: bool = False):
+    import numpy as np
+    from evaluations import load_exam
+    from item_analysis import cluster_statistics, combine_parts, item_statistics, subscores, tag_index, test_statistics
+
+    start = time.perf_counter()
+    cache = None
+    if export_cache:
+        from teaching_utilities.export_cache import ExportCache, default_cache_dir
+        cache = ExportCache(default_cache_dir(export_dir))
+    try:
+        with instrumentation.stage("load exam"):
+            exam = load_exam(export_dir, workers, cache)
+    except ValueError as e:
+        print(f"Error: {e}")
+        sys.exit(1)
+    if cache:
+        print(cache.summary())
+    print(f"Loaded {len(exam.items)} items for {len(exam.submissions)} students in {time.perf_counter() - start:.1f}s")
+    missing = [name for name, present in zip(exam.items, exam.has_no_response) if not present]
+    if missing:
+        print(f"Warning: {len(missing)} items have no \"No Response\" rubric item; their omit rate only counts missing students")
+
+    names, scores, max_points, omitted = exam.items, exam.scores, exam.max_points, exam.omitted
+    tags = exam.tags
+    if by_part:
+        names, scores, max_points, omitted = combine_parts(scores, max_points, omitted, exam.parts)
+        # A part carries every tag of its items.
+        part_tags = {name: [] for name in names}
+        for part, item_tags in zip(exam.parts, exam.tags):
+            part_tags[part].extend(tag for tag in item_tags if tag not in part_tags[part])
+        tags = [part_tags[name] for name in names]
+
+    with instrumentation.stage("item statistics"):
+        statistics = item_statistics(scores, max_points, omitted)
+    index = tag_index(tags)
+    os.makedirs(outdir, exist_ok=True)
+
+    write_csv(os.path.join(outdir, "items.csv"), ["item", "part", "tags", "max_points"] + ITEM_COLUMNS, [
+        dict({"item": name, "part": name if by_part else exam.parts[column], "tags": ", ".join(tags[column]),
+              "max_points": rounded(max_points[column])},
+             **{key: rounded(statistics[key][column]) for key in ITEM_COLUMNS})
+        for column, name in enumerate(names)])
+
+    clusters = cluster_statistics(scores, max_points, index)
+    write_csv(os.path.join(outdir, "clusters.csv"), ["tag", "kind", "items", "max_points", "mean", "mean_percent", "alpha"],
+              [{key: rounded(value) if isinstance(value, float) else value for key, value in row.items()} for row in clusters])
+
+    totals = scores.sum(axis=1)
+    clusters_by_student = subscores(scores, index)
+    write_csv(os.path.join(outdir, "students.csv"),
+              ["submission_id", "first_name", "last_name", "sid", "email", "total"] + list(index), [
+        dict({"submission_id": submission, "first_name": student[0], "last_name": student[1], "sid": student[2],
+              "email": student[3], "total": rounded(totals[row])},
+             **{tag: rounded(clusters_by_student[row, cluster]) for cluster, tag in enumerate(index)})
+        for row, (submission, student) in enumerate(zip(exam.submissions, exam.students))])
+
+    summary = test_statistics(scores, max_points)
+    print(f"{summary['students']} students, {summary['items']} {'parts' if by_part else 'items'}, "
+          f"{summary['max_points']:g} points: mean {summary['mean']:.2f}, SD {summary['sd']:.2f}")
+    reliability = f"KR-20 {summary['kr20']:.3f}" if summary["kr20"] == summary["kr20"] else f"Cronbach's alpha {summary['alpha']:.3f}"
+    print(f"{reliability}, SEM {summary['sem']:.2f}")
+    flagged = np.flatnonzero(statistics["corrected_item_total"] < 0.1)
+    for column in flagged:
+        print(f"Review {names[column]}: corrected item-total r = {rounded(statistics['corrected_item_total'][column], 3)}")
+    print(f"Wrote items.csv, clusters.csv and students.csv to {outdir} in {time.perf_counter() - start:.1f}s")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Item analysis of a Gradescope Export Evaluations directory.")
+    parser.add_argument("export_dir", type=str, help="Path to the unzipped evaluations export")
+    parser.add_argument("--outdir", type=str, default="item-analysis", help="Directory for the CSV reports (default: item-analysis)")
+    parser.add_argument("--by-part", action="store_true", help="Analyze problem parts (items sharing a link: tag or ID) instead of items")
+    parser.add_argument("--workers", type=int, help="Processes parsing item files (default: number of CPUs)")
+    parser.add_argument("--export-cache", action="store_true",
+                        help="Keep parsed items as memory-mapped Arrow files in the export, reparsing only changed files")
+    instrumentation.add_arguments(parser)
+    args = parser.parse_args()
+    instrumentation.configure(args)
+
+    if not os.path.isdir(args.export_dir):
+        print(f"Error: {args.export_dir} does not exist")
+        sys.exit(1)
+
+    main(args.export_dir, args.outdir, args.by_part, args.workers, args.export_cache)
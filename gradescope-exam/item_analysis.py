@@ -0,0 +1,143 @@
+"""Classical test theory statistics for a students x items score matrix."""
+
+import numpy as np
+
+GROUP_FRACTION = 0.27
+LINK_PREFIX = "link"
+
+
+def correlations(x: np.ndarray, y: np.ndarray) -> np.ndarray:
+    """Pearson correlation of each column of x with the matching column of y (or with vector y)."""
+    if y.ndim == 1:
+        y = y[:, None]
+    dx = x - x.mean(axis=0)
+    dy = y - y.mean(axis=0)
+    denominator = np.sqrt((dx * dx).sum(axis=0) * (dy * dy).sum(axis=0))
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return np.where(denominator > 0, (dx * dy).sum(axis=0) / denominator, np.nan)
+
+
+def cronbach_alpha(scores: np.ndarray) -> float:
+    k = scores.shape[1]
+    if k < 2 or scores.shape[0] < 2:
+        return float("nan")
+    total_variance = scores.sum(axis=1).var(ddof=1)
+    if total_variance == 0:
+        return float("nan")
+    return k / (k - 1) * (1 - scores.var(axis=0, ddof=1).sum() / total_variance)
+
+
+def alpha_if_deleted(scores: np.ndarray) -> np.ndarray:
+    """Alpha of the remaining k - 1 items for each item, from var(T - X_j) = var T + var X_j - 2 cov(X_j, T)."""
+    n, k = scores.shape
+    if k < 3 or n < 2:
+        return np.full(k, np.nan)
+    totals = scores.sum(axis=1)
+    item_variance = scores.var(axis=0, ddof=1)
+    covariance = ((scores - scores.mean(axis=0)) * (totals - totals.mean())[:, None]).sum(axis=0) / (n - 1)
+    rest_variance = totals.var(ddof=1) + item_variance - 2 * covariance
+    with np.errstate(divide="ignore", invalid="ignore"):
+        alpha = (k - 1) / (k - 2) * (1 - (item_variance.sum() - item_variance) / rest_variance)
+    return np.where(rest_variance > 0, alpha, np.nan)
+
+
+def is_dichotomous(scores: np.ndarray, max_points: np.ndarray) -> bool:
+    return bool(np.all((scores == 0) | (scores == max_points)))
+
+
+def item_statistics(scores: np.ndarray, max_points: np.ndarray, omitted: np.ndarray = None) -> dict:
+    """Per-item statistics as arrays with one entry per column of scores."""
+    n, k = scores.shape
+    points = np.where(max_points > 0, max_points, 1.0)
+    proportions = scores / points
+    totals = scores.sum(axis=1)
+
+    # Upper and lower groups by total score; a stable sort keeps ties in roster order.
+    group = max(1, int(round(GROUP_FRACTION * n)))
+    order = np.argsort(totals, kind="stable")
+    lower, upper = order[:group], order[-group:]
+
+    return {
+        "mean": scores.mean(axis=0),
+        "difficulty": proportions.mean(axis=0),
+        "discrimination": proportions[upper].mean(axis=0) - proportions[lower].mean(axis=0),
+        "point_biserial": correlations(scores, totals),
+        "corrected_item_total": correlations(scores, totals[:, None] - scores),
+        "omit_rate": omitted.mean(axis=0) if omitted is not None else np.zeros(k),
+        "alpha_if_deleted": alpha_if_deleted(scores),
+    }
+
+
+def test_statistics(scores: np.ndarray, max_points: np.ndarray) -> dict:
+    totals = scores.sum(axis=1)
+    alpha = cronbach_alpha(scores)
+    deviation = totals.std(ddof=1) if len(totals) > 1 else float("nan")
+    return {
+        "students": scores.shape[0],
+        "items": scores.shape[1],
+        "max_points": float(max_points.sum()),
+        "mean": float(totals.mean()),
+        "sd": float(deviation),
+        "alpha": float(alpha),
+        # KR-20 is alpha for right/wrong items; it is undefined for partial credit.
+        "kr20": float(alpha) if is_dichotomous(scores, max_points) else float("nan"),
+        "sem": float(deviation * np.sqrt(1 - alpha)) if alpha == alpha and alpha <= 1 else float("nan"),
+    }
+
+
+def tag_kind(tag: str) -> str:
+    """content for plain tags, process for p:..., otherwise the prefix (type, bloom, ...)."""
+    if ":" not in tag:
+        return "content"
+    prefix = tag.split(":", 1)[0].strip().lower()
+    return "process" if prefix == "p" else prefix
+
+
+def tag_index(tags: list) -> dict:
+    """Map each tag to the array of item columns carrying it; link: tags group parts, not clusters."""
+    index = {}
+    for column, item_tags in enumerate(tags):
+        for tag in item_tags:
+            if tag_kind(tag) != LINK_PREFIX:
+                index.setdefault(tag, []).append(column)
+    return {tag: np.array(columns, dtype=np.intp) for tag, columns in sorted(index.items())}
+
+
+def cluster_statistics(scores: np.ndarray, max_points: np.ndarray, index: dict) -> list:
+    rows = []
+    for tag, columns in index.items():
+        subscores = scores[:, columns]
+        points = max_points[columns].sum()
+        rows.append({
+            "tag": tag,
+            "kind": tag_kind(tag),
+            "items": len(columns),
+            "max_points": float(points),
+            "mean": float(subscores.sum(axis=1).mean()),
+            "mean_percent": float(100 * subscores.sum(axis=1).mean() / points) if points else float("nan"),
+            "alpha": float(cronbach_alpha(subscores)),
+        })
+    return rows
+
+
+def subscores(scores: np.ndarray, index: dict) -> np.ndarray:
+    """Students x tags matrix of cluster subscores, in the order of index."""
+    membership = np.zeros((scores.shape[1], len(index)))
+    for cluster, columns in enumerate(index.values()):
+        membership[columns, cluster] = 1
+    return scores @ membership
+
+
+def combine_parts(scores: np.ndarray, max_points: np.ndarray, omitted: np.ndarray, parts: list) -> tuple:
+    """Sum items that grade one problem part (same link: tag or leading ID) into a single column.
+
+    Returns (part names, scores, max points, omitted), where a part counts as omitted
+    only if all of its items were.
+    """
+    names = list(dict.fromkeys(parts))
+    position = {name: i for i, name in enumerate(names)}
+    membership = np.zeros((len(parts), len(names)))
+    membership[np.arange(len(parts)), [position[part] for part in parts]] = 1
+    counts = membership.sum(axis=0)
+    return (names, scores @ membership, max_points @ membership,
+            (omitted.astype(np.float64) @ membership) == counts)
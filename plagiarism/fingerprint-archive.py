@@ -0,0 +1,102 @@
+import argparse
+import csv
+import os
+import sys
+import time
+
+from fingerprint_archive import FingerprintArchive, collect_documents
+from winnowing import K, LANGUAGES, WINDOW
+
+ARCHIVE_DIR = "fingerprint-archive"
+
+
+def ingest(archive: FingerprintArchive, term: str, source: str, language: str, k: int, window: int, workers: int):
+    start = time.perf_counter()
+    documents = collect_documents(source, language, k, window, workers)
+    number = archive.ingest(term, source, documents)
+    postings = archive.segments[number]["postings"]
+    print(f"Ingested {len(documents)} documents ({postings} fingerprints) from {source} as {term} "
+          f"in {time.perf_counter() - start:.1f}s")
+
+
+def query(archive: FingerprintArchive, source: str, outfile: str, language: str, k: int, window: int, workers: int,
+          top: int, exclude_terms: set, max_postings: int):
+    start = time.perf_counter()
+    documents = collect_documents(source, language, k, window, workers)
+    rows = []
+    for name, hashes in documents:
+        for match in archive.query(hashes, top, exclude_terms, max_postings):
+            rows.append({
+                "submission": name,
+                "archived_term": match["term"],
+                "archived_name": match["name"],
+                "archived_source": match["source"],
+                "shared_fingerprints": match["shared"],
+                "percent_submission": match["percent_submission"],
+                "percent_archived": match["percent_archived"],
+            })
+    rows.sort(key=lambda row: (row["percent_submission"], row["shared_fingerprints"]), reverse=True)
+
+    fieldnames = ["submission", "archived_term", "archived_name", "archived_source",
+                  "shared_fingerprints", "percent_submission", "percent_archived"]
+    out = open(outfile, "w", newline="") if outfile else sys.stdout
+    try:
+        writer = csv.DictWriter(out, fieldnames=fieldnames)
+        writer.writeheader()
+        writer.writerows(rows)
+    finally:
+        if outfile:
+            out.close()
+    print(f"Compared {len(documents)} submissions against {len(archive.documents)} archived documents "
+          f"in {time.perf_counter() - start:.1f}s", file=sys.stderr)
+
+
+def list_segments(archive: FingerprintArchive):
+    for segment in archive.segments:
+        print(f"{segment['number']:>5}  {segment['term']:<16}{segment['documents']:>8} documents"
+              f"{segment['postings']:>12} fingerprints  {segment['source']}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Keep fingerprints of past terms' submissions and look up new submissions against them.")
+    parser.add_argument("--archive", type=str, default=ARCHIVE_DIR, help=f"Archive directory (default: {ARCHIVE_DIR})")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    fingerprinting = argparse.ArgumentParser(add_help=False)
+    fingerprinting.add_argument("source", type=str,
+                                help="gradescope-to-moss output (one document per *.txt) or a directory of cloned repositories")
+    fingerprinting.add_argument("--language", type=str, default="text", choices=LANGUAGES,
+                                help="Language of *.txt files; repository files are detected by extension (default: text)")
+    fingerprinting.add_argument("-k", type=int, default=K, help=f"Tokens per k-gram (default: {K})")
+    fingerprinting.add_argument("--window", type=int, default=WINDOW, help=f"Winnowing window in k-grams (default: {WINDOW})")
+    fingerprinting.add_argument("--workers", type=int, help="Fingerprinting processes (default: number of CPUs)")
+
+    ingest_parser = subparsers.add_parser("ingest", parents=[fingerprinting], help="Append a term's submissions to the archive")
+    ingest_parser.add_argument("--term", type=str, required=True, help="Term label, e.g. 2024-fall")
+
+    query_parser = subparsers.add_parser("query", parents=[fingerprinting], help="Find archived submissions that share the most fingerprints")
+    query_parser.add_argument("--outfile", type=str, help="CSV file for the matches (default: stdout)")
+    query_parser.add_argument("--top", type=int, default=5, help="Matches to report per submission (default: 5)")
+    query_parser.add_argument("--exclude-term", type=str, action="append", default=[], help="Ignore archived documents from this term")
+    query_parser.add_argument("--max-postings", type=int, default=1000,
+                              help="Ignore fingerprints shared by more archived documents than this in one term (default: 1000)")
+
+    subparsers.add_parser("list", help="List the ingested terms")
+    args = parser.parse_args()
+
+    if args.command != "list" and not os.path.isdir(args.source):
+        print(f"Error: {args.source} does not exist")
+        sys.exit(1)
+
+    with FingerprintArchive(args.archive) as archive:
+        if args.command == "ingest":
+            try:
+                ingest(archive, args.term, args.source, args.language, args.k, args.window, args.workers)
+            except ValueError as e:
+                print(f"Error: {e}")
+                sys.exit(1)
+        elif args.command == "query":
+            query(archive, args.source, args.outfile, args.language, args.k, args.window, args.workers,
+                  args.top, set(args.exclude_term), args.max_postings)
+        else:
+            list_segments(archive)
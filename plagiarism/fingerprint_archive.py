@@ -0,0 +1,198 @@
+"""Append-only archive of winnowing fingerprints from past terms."""
+
+import array
+import bisect
+import json
+import mmap
+import os
+import struct
+import sys
+from concurrent.futures import ProcessPoolExecutor
+
+from winnowing import K, WINDOW, fingerprint_file
+
+# A segment is a header (magic, key count, posting count), the sorted uint64 hashes, uint64 offsets[keys + 1]
+# into the postings, and the uint32 document IDs of each hash's postings.
+MAGIC = b"TUFPIDX1"
+HEADER = struct.Struct("<8sQQ")
+
+# Source files fingerprinted when a backed-up repository is ingested.
+EXTENSIONS = {
+    ".py": "python", ".c": "c", ".h": "c", ".cc": "cc", ".cpp": "cc", ".hpp": "cc", ".java": "java",
+    ".js": "javascript", ".ts": "javascript", ".r": "r", ".sql": "sql", ".txt": "text", ".md": "text",
+}
+
+
+def repository_fingerprints(repo_path: str, k: int = K, window: int = WINDOW) -> set:
+    hashes = set()
+    for root, dirs, files in os.walk(repo_path):
+        dirs[:] = [name for name in dirs if not name.startswith(".")]
+        for name in files:
+            language = EXTENSIONS.get(os.path.splitext(name)[1].lower())
+            if language:
+                hashes.update(fingerprint[0] for fingerprint in fingerprint_file(os.path.join(root, name), language, k, window))
+    return hashes
+
+
+def document_fingerprints(job) -> set:
+    path, language, k, window = job
+    if os.path.isdir(path):
+        return repository_fingerprints(path, k, window)
+    return {fingerprint[0] for fingerprint in fingerprint_file(path, language, k, window)}
+
+
+def collect_documents(source: str, language: str = "text", k: int = K, window: int = WINDOW,
+                      workers: int = None) -> list:
+    """Fingerprint a gradescope-to-moss directory (one document per *.txt file) or a directory
+    of cloned repositories (one document per repository), as a list of (name, hash set)."""
+    names = [name for name in sorted(os.listdir(source)) if not name.startswith(".")
+             and (name.endswith(".txt") or os.path.isdir(os.path.join(source, name)))]
+    jobs = [(os.path.join(source, name), language, k, window) for name in names]
+    if workers == 1 or len(jobs) < 2:
+        hashes = [document_fingerprints(job) for job in jobs]
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            hashes = list(pool.map(document_fingerprints, jobs, chunksize=8))
+    return [(name, values) for name, values in zip(names, hashes) if values]
+
+
+class Segment:
+    def __init__(self, path: str):
+        self.file = open(path, "rb")
+        self.map = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, key_count, posting_count = HEADER.unpack_from(self.map, 0)
+        if magic != MAGIC:
+            raise ValueError(f"{path} is not a fingerprint segment")
+        view = memoryview(self.map)
+        start = HEADER.size
+        self.keys = view[start:start + 8 * key_count].cast("Q")
+        start += 8 * key_count
+        self.offsets = view[start:start + 8 * (key_count + 1)].cast("Q")
+        start += 8 * (key_count + 1)
+        self.postings = view[start:start + 4 * posting_count].cast("I")
+
+    def lookup(self, value: int):
+        position = bisect.bisect_left(self.keys, value)
+        if position < len(self.keys) and self.keys[position] == value:
+            return self.postings[self.offsets[position]:self.offsets[position + 1]]
+        return ()
+
+    def close(self):
+        for view in (self.keys, self.offsets, self.postings):
+            view.release()
+        self.map.close()
+        self.file.close()
+
+
+def write_segment(path: str, pairs: list):
+    """Write (hash, document) pairs as a segment; pairs must be sorted."""
+    keys = array.array("Q")
+    offsets = array.array("Q")
+    postings = array.array("I")
+    previous = None
+    for value, document in pairs:
+        if value != previous:
+            keys.append(value)
+            offsets.append(len(postings))
+            previous = value
+        postings.append(document)
+    offsets.append(len(postings))
+    if sys.byteorder != "little":
+        for values in (keys, offsets, postings):
+            values.byteswap()
+    temporary = path + ".tmp"
+    with open(temporary, "wb") as f:
+        f.write(HEADER.pack(MAGIC, len(keys), len(postings)))
+        keys.tofile(f)
+        offsets.tofile(f)
+        postings.tofile(f)
+    os.replace(temporary, path)
+
+
+class FingerprintArchive:
+    def __init__(self, path: str):
+        if sys.byteorder != "little":
+            raise RuntimeError("Fingerprint archives are read through little-endian memory maps")
+        self.path = path
+        os.makedirs(path, exist_ok=True)
+        self.documents = self._read_jsonl("documents.jsonl")
+        self.segments = self._read_jsonl("segments.jsonl")
+        self._open = None
+
+    def _read_jsonl(self, name: str) -> list:
+        path = os.path.join(self.path, name)
+        if not os.path.exists(path):
+            return []
+        with open(path) as f:
+            return [json.loads(line) for line in f if line.strip()]
+
+    def _append_jsonl(self, name: str, records: list):
+        with open(os.path.join(self.path, name), "a") as f:
+            for record in records:
+                f.write(json.dumps(record) + "\n")
+
+    def ingest(self, term: str, source: str, documents: list) -> int:
+        """Append one segment for documents, a list of (name, fingerprint hash set). Returns the segment number."""
+        source = os.path.abspath(source)
+        if any(segment["term"] == term and segment["source"] == source for segment in self.segments):
+            raise ValueError(f"{source} was already ingested for {term}")
+        first = len(self.documents)
+        records = [{"id": first + i, "term": term, "name": name, "source": source, "fingerprints": len(hashes)}
+                   for i, (name, hashes) in enumerate(documents)]
+        pairs = sorted((value, first + i) for i, (_, hashes) in enumerate(documents) for value in hashes)
+
+        number = len(self.segments)
+        filename = f"segment-{number:05d}.idx"
+        write_segment(os.path.join(self.path, filename), pairs)
+        # Documents first: a segment is only visible once listed in segments.jsonl.
+        self._append_jsonl("documents.jsonl", records)
+        segment = {"number": number, "file": filename, "term": term, "source": source,
+                   "documents": len(records), "postings": len(pairs)}
+        self._append_jsonl("segments.jsonl", [segment])
+        self.documents.extend(records)
+        self.segments.append(segment)
+        return number
+
+    def open_segments(self) -> list:
+        if self._open is None:
+            self._open = [Segment(os.path.join(self.path, segment["file"])) for segment in self.segments]
+        return self._open
+
+    def query(self, hashes: set, top: int = 10, exclude_terms: set = frozenset(), max_postings: int = 1000) -> list:
+        """Rank archived documents by the number of hashes they share with a submission.
+
+        Hashes with more than max_postings documents in a segment are treated as boilerplate.
+        """
+        counts = {}
+        for segment in self.open_segments():
+            for value in hashes:
+                postings = segment.lookup(value)
+                if len(postings) > max_postings:
+                    continue
+                for document in postings:
+                    counts[document] = counts.get(document, 0) + 1
+        # Ties go to the archived document that is most covered by the submission.
+        ranked = sorted(counts.items(), key=lambda item: (item[1], item[1] / self.documents[item[0]]["fingerprints"]),
+                        reverse=True)
+        matches = []
+        for document, shared in ranked:
+            record = self.documents[document]
+            if record["term"] in exclude_terms:
+                continue
+            matches.append(dict(record, shared=shared,
+                                percent_submission=round(100 * shared / len(hashes), 1),
+                                percent_archived=round(100 * shared / record["fingerprints"], 1)))
+            if len(matches) == top:
+                break
+        return matches
+
+    def close(self):
+        for segment in self._open or []:
+            segment.close()
+        self._open = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
@@ -1,64 +1,54 @@
+from __future__ import annotations
+
 import argparse
-import configparser
+import asyncio
+import contextlib
+import json
 import os
-import pdb
+import random
 import re
 import sys
+import time
+from typing import TYPE_CHECKING
 
-import pandas as pd  # 
+if TYPE_CHECKING:
+    import pandas as pd
 
-from openai import OpenAI
+from gradescope_metadata import METADATA_FILENAME, item_columns, parse_metadata
+from response_packing import (MIN_PACK_TOKENS, PACK_SYSTEM_PROMPT, build_pack_messages, format_narrative, pack_items,
+                              parse_pack_response, split_pack)
+from verdict_cache import VerdictCache, cache_key
 
-CONFIG_FILE = "plagiarism.cfg"
-METADATA_FILENAME = "submission_metadata.csv"
-PROBABILITY = r"Probability:\s*(([0-9]*\.?[0-9]+))"
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from teaching_utilities import config, instrumentation  # noqa: E402
 
+CACHE_FILE = "chatgpt-cache.sqlite"
+CHUNK_ROWS = 50
 
-def parse_config(config_file: str) -> str:
-    # Initialize the parser
-    config = configparser.ConfigParser()
-    
-    # Check if the configuration file exists
-    if not os.path.isfile(config_file):
-        print(f"Configuration file '{config_file}' not found.")
-        return
-    
-    # Read the configuration file
-    config.read(config_file)
-    
-    # Access values in specific sections
-    if 'chatgpt' in config:
-        oai_org = config['chatgpt'].get('organization', 'Not specified')
-        oai_token = config['chatgpt'].get('project', 'Not specified')
-    else:
-        print("Section 'chatgpt' not found in configuration.")
-        sys.exit(1)
-    return oai_org, oai_token
+# Batch API limits and polling.
+BATCH_MAX_REQUESTS = 50000
+BATCH_POLL_SECONDS = 60
+BATCH_TERMINAL = {"completed", "failed", "expired", "cancelled"}
+PROBABILITY = r"Probability:\s*(([0-9]*\.?[0-9]+))"
 
-def parse_metadata(metadata_file: str) -> pd.DataFrame:
-    metadata = pd.read_csv(metadata_file)
+MODEL = "gpt-4o"
+SYSTEM_PROMPT = ("What is the probability that the following text came from ChatGPT? At the end of your response, " +
+    "print a line that contains only the word 'Probability: ' followed by the probability score on a scale from 0 to 1.")
 
-    student_data = ["First Name", "Last Name", "Student ID", "Email", "Submission ID"]
+# Retry policy for HTTP 429 responses in the concurrent path.
+MAX_RETRIES = 8
+BASE_BACKOFF = 1.0
+MAX_BACKOFF = 60.0
+DURATION = re.compile(r"([0-9]*\.?[0-9]+)(ms|h|m|s)")
+# Seconds between attempts to take a request from a budget shared with other processes.
+BUDGET_POLL = 0.05
 
-    # Starting with column 9 (0-indexed):
-    # row i is the item score
-    # row i+1 is the item weight
-    # row i+2 is the item graded?
-    # row i+3 is the item response
-    # row i+4 is the item submitted at
-    # we are only interested in item response.
-    item_responses = [ metadata.columns[i] for i in range(12, len(metadata.columns), 5) ]
-    columns = student_data + item_responses
-    return metadata[columns]
 
-def chatgpt(cell, client):
-    completion = client.chat.completions.create(
-    model="gpt-4o",
-    messages=[
+def build_messages(cell):
+    return [
         {
             "role": "system",
-            "content": "What is the probability that the following text came from ChatGPT? At the end of your response, " +
-            "print a line that contains only the word 'Probability: ' followed by the probability score on a scale from 0 to 1."
+            "content": SYSTEM_PROMPT
         },
         {
             "role": "user",
@@ -66,59 +56,490 @@ def chatgpt(cell, client):
 {}
             """.format(cell)
         }
-    ])
+    ]
+
+def chatgpt(cell, client):
+    with instrumentation.call("openai", "chat.completions"):
+        completion = client.chat.completions.create(
+        model=MODEL,
+        messages=build_messages(cell))
     return completion
 
 
-def generate_chatgpt(client, submissions: pd.DataFrame):
-    results = []
-    narratives = []
-    for _, row in submissions.iterrows():
-        extracted_columns = row.iloc[6:]
-        subject = extracted_columns.iloc[2:6]
-        series_names_scores = [colname.replace('Response', 'ChatGPT Score') for colname in subject.index]
-        series_names_narratives = [colname.replace('Response', 'ChatGPT Response') for colname in subject.index]
-        response = [chatgpt(column, client) for column in subject]
-        messages = [response[i].choices[0].message.content for i in range(len(response))]
-        match = [re.search(PROBABILITY, el).group(1) for el in messages]
-        results.append(match)
-        narratives.append(messages)
-    scores = pd.DataFrame(results, columns=series_names_scores)
-    responses = pd.DataFrame(narratives, columns=series_names_narratives)
+def subject_columns(submissions: pd.DataFrame) -> list:
+    # The items sent to ChatGPT: the fourth through seventh item, as the script has always sent.
+    return item_columns(submissions)[3:7]
+
+def parse_probability(message: str):
+    match = re.search(PROBABILITY, message)
+    return match.group(1) if match else None
+
+def assemble_results(submissions: pd.DataFrame, subject: list, messages: list) -> pd.DataFrame:
+    import pandas as pd
+    # messages holds one list of narratives per row of submissions, in the same order.
+    series_names_scores = [colname.replace('Response', 'ChatGPT Score') for colname in subject]
+    series_names_narratives = [colname.replace('Response', 'ChatGPT Response') for colname in subject]
+    results = [[parse_probability(el) for el in row] for row in messages]
+    scores = pd.DataFrame(results, columns=series_names_scores, index=submissions.index)
+    responses = pd.DataFrame(messages, columns=series_names_narratives, index=submissions.index)
     return pd.concat([submissions, scores, responses], axis=1)
 
+def score_cells(cells: list, client) -> list:
+    return [chatgpt(cell, client).choices[0].message.content for cell in cells]
+
+def generate_chatgpt(client, submissions: pd.DataFrame):
+    subject = subject_columns(submissions)
+    narratives = [score_cells(list(row), client) for row in submissions[subject].itertuples(index=False)]
+    return assemble_results(submissions, subject, narratives)
+
+
+def parse_duration(value: str):
+    """Parse a rate limit header value such as '20ms', '1.5s' or '6m0s' into seconds."""
+    if value is None:
+        return None
+    try:
+        return float(value)
+    except ValueError:
+        pass
+    parts = DURATION.findall(value)
+    if not parts:
+        return None
+    scale = {"ms": 0.001, "s": 1, "m": 60, "h": 3600}
+    return sum(float(amount) * scale[unit] for amount, unit in parts)
+
+def retry_delay(headers, attempt: int) -> float:
+    """How long to wait after a 429, preferring what the server tells us over exponential backoff."""
+    if "retry-after-ms" in headers:
+        delay = parse_duration(headers["retry-after-ms"])
+        if delay is not None:
+            return delay / 1000
+    candidates = [parse_duration(headers.get(name)) for name in
+                  ("retry-after", "x-ratelimit-reset-requests", "x-ratelimit-reset-tokens")]
+    candidates = [c for c in candidates if c is not None]
+    if candidates:
+        return min(max(candidates), MAX_BACKOFF)
+    return min(BASE_BACKOFF * 2 ** attempt, MAX_BACKOFF) * random.uniform(0.5, 1.0)
+
+class RateLimiter:
+    """Bounds the number of requests in flight and pauses every worker when one of them hits a 429.
+
+    budget, a multiprocessing semaphore, additionally bounds the requests in flight across
+    processes scoring other assignments (plagiarism-batch.py).
+    """
+
+    def __init__(self, concurrency: int, budget=None):
+        self.semaphore = asyncio.Semaphore(concurrency)
+        self.budget = budget
+        self.resume_at = 0.0
+        self.retries = 0
+
+    @contextlib.asynccontextmanager
+    async def slot(self):
+        if self.budget is None:
+            yield
+            return
+        # A blocking acquire would need a thread, which would still take the slot after this task was
+        # cancelled, with nothing left to release it. Polling keeps the acquire on the event loop.
+        while not self.budget.acquire(block=False):
+            await asyncio.sleep(BUDGET_POLL)
+        try:
+            yield
+        finally:
+            self.budget.release()
+
+    async def wait(self):
+        delay = self.resume_at - time.monotonic()
+        while delay > 0:
+            await asyncio.sleep(delay)
+            delay = self.resume_at - time.monotonic()
+
+    def backoff(self, delay: float):
+        self.retries += 1
+        resume_at = time.monotonic() + delay
+        # Every request waits out the same pause, so only the time it adds is counted.
+        instrumentation.retry("openai")
+        instrumentation.wait("openai", resume_at - max(self.resume_at, time.monotonic()))
+        self.resume_at = max(self.resume_at, resume_at)
+
+async def arequest(client, limiter: RateLimiter, messages: list, **kwargs):
+    from openai import RateLimitError
+    async with limiter.semaphore:
+        for attempt in range(MAX_RETRIES + 1):
+            await limiter.wait()
+            try:
+                async with limiter.slot():
+                    with instrumentation.call("openai", "chat.completions packed" if kwargs else "chat.completions"):
+                        return await client.chat.completions.create(model=MODEL, messages=messages, **kwargs)
+            except RateLimitError as e:
+                # Running out of quota will not fix itself by waiting.
+                if attempt == MAX_RETRIES or getattr(e, "code", None) == "insufficient_quota":
+                    raise
+                limiter.backoff(retry_delay(e.response.headers, attempt))
+
+async def achatgpt(cell, client, limiter: RateLimiter):
+    return await arequest(client, limiter, build_messages(cell))
+
+async def achatgpt_pack(pack: list, client, limiter: RateLimiter) -> dict:
+    """Score a pack of (id, cell) pairs in one request, re-sending whatever comes back missing or malformed.
+
+    Maps each id to its narrative and the system prompt it was scored with.
+    """
+    if len(pack) == 1:
+        # A pack of one is no cheaper than the plain prompt, which does not depend on JSON output.
+        item_id, cell = pack[0]
+        completion = await achatgpt(cell, client, limiter)
+        return {item_id: (completion.choices[0].message.content, SYSTEM_PROMPT)}
+    completion = await arequest(client, limiter, build_pack_messages(pack), response_format={"type": "json_object"})
+    verdicts = parse_pack_response(completion.choices[0].message.content, [item_id for item_id, _ in pack])
+    narratives = {item_id: (format_narrative(*verdict), PACK_SYSTEM_PROMPT) for item_id, verdict in verdicts.items()}
+    missing = [item for item in pack if item[0] not in narratives]
+    if missing:
+        # Unparseable output loses the whole pack; halve it so a single bad response cannot keep failing the rest.
+        retries = split_pack(missing) if len(missing) == len(pack) else [missing]
+        for retried in await asyncio.gather(*[achatgpt_pack(part, client, limiter) for part in retries]):
+            narratives.update(retried)
+    return narratives
+
+async def ascore_packed(cells: list, client, limiter: RateLimiter, token_budget: int) -> list:
+    packs = pack_items([(f"r{i}", cell) for i, cell in enumerate(cells)], token_budget)
+    narratives = {}
+    for verdicts in await asyncio.gather(*[achatgpt_pack(pack, client, limiter) for pack in packs]):
+        narratives.update(verdicts)
+    return [narratives[f"r{i}"] for i in range(len(cells))]
+
+async def ascore_cells(cells: list, client, limiter: RateLimiter) -> list:
+    # gather() returns results in submission order regardless of completion order.
+    completions = await asyncio.gather(*[achatgpt(cell, client, limiter) for cell in cells])
+    return [completion.choices[0].message.content for completion in completions]
+
+@contextlib.contextmanager
+def chatgpt_scorer(org: str, project: str, concurrency: int = 1, base_url: str = None, pack_tokens: int = 0,
+                   budget=None):
+    """Yield a function that maps a list of cells to (narrative, system prompt) pairs, in order.
+
+    With pack_tokens, cells are packed into requests of about that many prompt tokens; a cell
+    sent on its own still gets the plain prompt. budget is a semaphore shared with other
+    processes; see RateLimiter.
+    """
+    from openai import AsyncOpenAI, OpenAI
+    if concurrency == 1 and not pack_tokens and budget is None:
+        client = OpenAI(organization=org, api_key=project, base_url=base_url)
+        yield lambda cells: [(narrative, SYSTEM_PROMPT) for narrative in score_cells(cells, client)]
+        return
+    limiter = RateLimiter(concurrency, budget)
+    with asyncio.Runner() as runner:
+        # Retries are handled by RateLimiter so that all workers back off together.
+        client = AsyncOpenAI(organization=org, api_key=project, base_url=base_url, max_retries=0)
+        try:
+            if pack_tokens:
+                yield lambda cells: runner.run(ascore_packed(cells, client, limiter, pack_tokens))
+            else:
+                yield lambda cells: [(narrative, SYSTEM_PROMPT)
+                                     for narrative in runner.run(ascore_cells(cells, client, limiter))]
+        finally:
+            runner.run(client.close())
+            if limiter.retries:
+                print(f"Retried {limiter.retries} rate limited requests")
+
+
+def score_with_cache(cells: list, score, cache: VerdictCache = None, prompt: str = SYSTEM_PROMPT) -> tuple:
+    """Score cells, sending only those not already cached, and each distinct text once.
+
+    Verdicts are cached under the system prompt each cell was actually sent with. With the pack
+    prompt, a verdict from the plain prompt is reused too, as packing sends some cells that way.
+    Returns the narratives in the order of cells and the number of cells sent to ChatGPT.
+    """
+    if cache is None:
+        return [narrative for narrative, _ in score(cells)], len(cells)
+    keys = [cache_key(MODEL, prompt, cell) for cell in cells]
+    plain = [cache_key(MODEL, SYSTEM_PROMPT, cell) for cell in cells] if prompt != SYSTEM_PROMPT else None
+    found = cache.get_many(keys, plain)
+    pending = {}
+    for key, cell in zip(keys, cells):
+        if key not in found:
+            pending.setdefault(key, cell)
+    if pending:
+        fresh = {}
+        for (key, cell), (narrative, sent) in zip(pending.items(), score(list(pending.values()))):
+            probability = parse_probability(narrative)
+            verdict = (narrative, float(probability) if probability is not None else None)
+            fresh[cache_key(MODEL, sent, cell)] = verdict
+            found[key] = verdict
+        cache.put_many(MODEL, fresh)
+    return [found[key][0] for key in keys], len(pending)
+
+def generate_chatgpt_incremental(score, submissions: pd.DataFrame, outfile: str, cache: VerdictCache = None,
+                                 chunk_rows: int = CHUNK_ROWS, prompt: str = SYSTEM_PROMPT, dedupe: float = 0) -> int:
+    """Score submissions chunk_rows students at a time, appending each chunk to outfile as it completes.
+
+    With dedupe, near-duplicate responses to each item are clustered first and every member
+    gets the verdict of its cluster's first response. Returns the number of cells sent to ChatGPT.
+    """
+    import pandas as pd
+    subject = subject_columns(submissions)
+    width = len(subject)
+    clusters = None
+    texts = submissions[subject]
+    if dedupe:
+        from near_duplicates import cluster_columns
+        clusters, texts = cluster_columns(submissions, subject, dedupe)
+    requests = 0
+    if not subject:
+        # Too few items for any to be scored (see subject_columns).
+        submissions.to_csv(outfile, index=False)
+        return 0
+    if submissions.empty:
+        assemble_results(submissions, subject, []).to_csv(outfile, index=False)
+    with instrumentation.stage("score students", total=len(submissions)) as progress:
+        for start in range(0, len(submissions), chunk_rows):
+            chunk = submissions.iloc[start:start + chunk_rows]
+            cells = [cell for row in texts.iloc[start:start + chunk_rows].to_numpy().tolist() for cell in row]
+            contents, sent = score_with_cache(cells, score, cache, prompt)
+            requests += sent
+            narratives = [contents[i:i + width] for i in range(0, len(contents), width)]
+            results = assemble_results(chunk, subject, narratives)
+            if clusters is not None:
+                results = pd.concat([results, clusters.iloc[start:start + chunk_rows]], axis=1)
+            results.to_csv(outfile, mode="w" if start == 0 else "a", header=start == 0, index=False)
+            progress.advance(len(chunk))
+    return requests
+
+
+def batch_paths(outfile: str) -> dict:
+    return {
+        "state": outfile + ".batch.json",
+        "input": outfile + ".batch-input-{}.jsonl",
+        "output": outfile + ".batch-output-{}.jsonl",
+        "errors": outfile + ".batch-errors-{}.jsonl",
+    }
+
+def batch_cells(submissions: pd.DataFrame):
+    """Yield (custom_id, cell) for every cell that generate_chatgpt would score."""
+    subject = subject_columns(submissions)
+    for submission_id, row in zip(submissions["Submission ID"], submissions[subject].itertuples(index=False)):
+        for column, cell in zip(subject, row):
+            yield f"{submission_id}/{column}", cell
+
+def batch_submit(client, submissions: pd.DataFrame, outfile: str, cache: VerdictCache):
+    """Write uncached cells to JSONL batch files, upload them and start the batches."""
+    paths = batch_paths(outfile)
+    pending = {}
+    cells = list(batch_cells(submissions))
+    keys = [cache_key(MODEL, SYSTEM_PROMPT, cell) for _, cell in cells]
+    found = cache.get_many(keys)
+    for (custom_id, cell), key in zip(cells, keys):
+        if key not in found and key not in pending:
+            pending[key] = (custom_id, cell)
+    # found has one entry per distinct text; count the cells it covers.
+    cached = sum(key in found for key in keys)
+    print(f"{len(cells)} cells, {cached} cached, {len(pending)} distinct responses to submit")
+
+    requests = list(pending.values())
+    batches = []
+    for number, start in enumerate(range(0, len(requests), BATCH_MAX_REQUESTS)):
+        input_path = paths["input"].format(number)
+        with open(input_path, "w") as f:
+            for custom_id, cell in requests[start:start + BATCH_MAX_REQUESTS]:
+                f.write(json.dumps({
+                    "custom_id": custom_id,
+                    "method": "POST",
+                    "url": "/v1/chat/completions",
+                    "body": {"model": MODEL, "messages": build_messages(cell)},
+                }) + "\n")
+        with open(input_path, "rb") as f:
+            uploaded = client.files.create(file=f, purpose="batch")
+        batch = client.batches.create(input_file_id=uploaded.id, endpoint="/v1/chat/completions",
+                                      completion_window="24h")
+        print(f"Submitted batch {batch.id} ({input_path})")
+        batches.append({"id": batch.id, "input_file_id": uploaded.id, "status": batch.status})
+
+    with open(paths["state"], "w") as f:
+        json.dump({"outfile": outfile, "created_at": time.time(), "batches": batches}, f, indent=2)
+    print(f"Batch state saved to {paths['state']}")
+
+def batch_poll(client, outfile: str, wait: bool = False, interval: float = BATCH_POLL_SECONDS) -> bool:
+    """Refresh the status of each batch and download finished results. Returns True once all are done."""
+    paths = batch_paths(outfile)
+    with open(paths["state"]) as f:
+        state = json.load(f)
+    while True:
+        for number, entry in enumerate(state["batches"]):
+            if entry["status"] in BATCH_TERMINAL:
+                continue
+            with instrumentation.call("openai", "batches.retrieve"):
+                batch = client.batches.retrieve(entry["id"])
+            entry["status"] = batch.status
+            counts = batch.request_counts
+            progress = f" ({counts.completed}/{counts.total} completed, {counts.failed} failed)" if counts else ""
+            print(f"Batch {batch.id}: {batch.status}{progress}")
+            for kind, file_id in (("output", batch.output_file_id), ("errors", batch.error_file_id)):
+                if batch.status in BATCH_TERMINAL and file_id:
+                    client.files.content(file_id).write_to_file(paths[kind].format(number))
+                    entry[kind] = paths[kind].format(number)
+        with open(paths["state"], "w") as f:
+            json.dump(state, f, indent=2)
+        done = all(entry["status"] in BATCH_TERMINAL for entry in state["batches"])
+        if done or not wait:
+            return done
+        instrumentation.sleep("openai", interval, "batch poll")
+
+def batch_merge(submissions: pd.DataFrame, outfile: str, cache: VerdictCache):
+    """Load downloaded batch results into the cache and write the same columns as generate_chatgpt."""
+    paths = batch_paths(outfile)
+    with open(paths["state"]) as f:
+        state = json.load(f)
+    if not all(entry["status"] in BATCH_TERMINAL for entry in state["batches"]):
+        print("Error: not all batches have finished; run with --batch poll first.")
+        sys.exit(1)
+
+    cells = dict(batch_cells(submissions))
+    fresh = {}
+    failed = 0
+    for entry in state["batches"]:
+        if "output" not in entry:
+            continue
+        with open(entry["output"]) as f:
+            for line in f:
+                result = json.loads(line)
+                response = result.get("response") or {}
+                if result.get("error") or response.get("status_code") != 200 or result["custom_id"] not in cells:
+                    failed += 1
+                    continue
+                narrative = response["body"]["choices"][0]["message"]["content"]
+                probability = parse_probability(narrative)
+                key = cache_key(MODEL, SYSTEM_PROMPT, cells[result["custom_id"]])
+                fresh[key] = (narrative, float(probability) if probability is not None else None)
+    cache.put_many(MODEL, fresh)
+
+    subject = subject_columns(submissions)
+    keys = [[cache_key(MODEL, SYSTEM_PROMPT, cell) for cell in row] for row in submissions[subject].itertuples(index=False)]
+    found = cache.get_many([key for row in keys for key in row])
+    narratives = [[found[key][0] if key in found else None for key in row] for row in keys]
+    assemble_results(submissions, subject, narratives).to_csv(outfile, index=False)
+    missing = sum(key not in found for row in keys for key in row)
+    print(f"Merged {len(fresh)} batch results into {outfile} ({failed} failed requests, {missing} cells without a verdict)")
+
+
+def load_metadata(metadata_file: str, export_cache: bool = False):
+    if not export_cache:
+        return parse_metadata(metadata_file)
+    from teaching_utilities.export_cache import ExportCache, default_cache_dir  # Needs pyarrow.
+    with ExportCache(default_cache_dir(metadata_file)) as cache:
+        metadata = parse_metadata(metadata_file, cache)
+    print(cache.summary())
+    return metadata
 
-def main(gradescope: str, outfile: str, org: str, project: str):
-    client = OpenAI(
-        organization=org,
-        api_key=project
-    )
+
+def main_batch(gradescope: str, outfile: str, org: str, project: str, command: str, base_url: str = None,
+               cache_file: str = CACHE_FILE, wait: bool = False, export_cache: bool = False):
+    from openai import OpenAI
+    client = OpenAI(organization=org, api_key=project, base_url=base_url)
+    if command == "poll":
+        batch_poll(client, outfile, wait)
+        return
+
+    metadata_file = os.path.join(gradescope, METADATA_FILENAME)
+    if not os.path.exists(metadata_file):
+        print(f"Error: {metadata_file} does not exist")
+        sys.exit(1)
+    metadata = load_metadata(metadata_file, export_cache)
+    # Without a cache file, results still pass through an in-memory cache during merge.
+    with VerdictCache(cache_file or ":memory:") as cache:
+        if command == "submit":
+            batch_submit(client, metadata, outfile, cache)
+        else:
+            batch_merge(metadata, outfile, cache)
+
+def score_submissions(metadata: pd.DataFrame, outfile: str, org: str, project: str, concurrency: int = 1,
+                      base_url: str = None, cache_file: str = CACHE_FILE, chunk_rows: int = CHUNK_ROWS,
+                      pack_tokens: int = 0, dedupe: float = 0, budget=None) -> tuple:
+    """Score parsed metadata into outfile; returns (responses sent, cache hits, cache misses)."""
+    # Without a cache file, verdicts are still shared across chunks for the length of the run.
+    with VerdictCache(cache_file or ":memory:") as cache:
+        # Packed verdicts come from a different prompt, so they are cached separately.
+        prompt = PACK_SYSTEM_PROMPT if pack_tokens else SYSTEM_PROMPT
+        with chatgpt_scorer(org, project, concurrency, base_url, pack_tokens, budget) as score:
+            sent = generate_chatgpt_incremental(score, metadata, outfile, cache, chunk_rows, prompt, dedupe)
+    return sent, cache.hits, cache.misses
+
+def option_error(pack_tokens: int, dedupe: float):
+    """What is wrong with --pack-tokens or --dedupe, or None; plagiarism-batch.py checks them the same way."""
+    if pack_tokens and pack_tokens < MIN_PACK_TOKENS:
+        return f"--pack-tokens must be 0 or at least {MIN_PACK_TOKENS}, enough for one response"
+    if dedupe and not 0 < dedupe <= 1:
+        return "--dedupe must be 0 (off) or a similarity above 0 and at most 1"
+    return None
+
+
+def main(gradescope: str, outfile: str, org: str, project: str, concurrency: int = 1, base_url: str = None,
+         cache_file: str = CACHE_FILE, chunk_rows: int = CHUNK_ROWS, pack_tokens: int = 0, dedupe: float = 0,
+         export_cache: bool = False):
     # Read the metadata file
     metadata_file = os.path.join(gradescope, METADATA_FILENAME)
     if not os.path.exists(metadata_file):
         print(f"Error: {metadata_file} does not exist")
         sys.exit(1)
 
-    metadata = parse_metadata(metadata_file)
-    results = generate_chatgpt(client, metadata)
-    results.to_csv(outfile, index=False)
+    with instrumentation.stage("load metadata"):
+        metadata = load_metadata(metadata_file, export_cache)
+    sent, hits, misses = score_submissions(metadata, outfile, org, project, concurrency, base_url, cache_file,
+                                           chunk_rows, pack_tokens, dedupe)
+    print(f"Cache: {hits} hits, {misses} misses, {sent} responses sent to ChatGPT")
 
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(description='Check a Gradescope web assignment with ChatGPT')
     parser.add_argument('gradescope_dir', type=str, help='Path to the directory containing the submissions')
     parser.add_argument('outfile', type=str, help='File where the results will be stored')
+    parser.add_argument('--concurrency', type=int, default=1, help='Maximum number of ChatGPT requests in flight (default: 1, sequential)')
+    parser.add_argument('--base-url', type=str, default=None, help='OpenAI API base URL, e.g. a local mock server (default: OPENAI_BASE_URL or api.openai.com)')
+    parser.add_argument('--cache', type=str, default=CACHE_FILE, help=f'SQLite file caching verdicts across runs (default: {CACHE_FILE})')
+    parser.add_argument('--no-cache', action='store_true', help='Do not read or write the verdict cache file')
+    parser.add_argument('--chunk-rows', type=int, default=CHUNK_ROWS, help=f'Students scored between checkpoints of the output file (default: {CHUNK_ROWS})')
+    parser.add_argument('--pack-tokens', type=int, default=0,
+                        help='Pack several responses into each request, up to about this many prompt tokens (default: 0, one response per request)')
+    parser.add_argument('--dedupe', type=float, default=0,
+                        help='Cluster responses to each item at this estimated Jaccard similarity (e.g. 0.8) and score one per cluster (default: 0, off)')
+    parser.add_argument('--batch', choices=['submit', 'poll', 'merge'],
+                        help='Use the OpenAI Batch API: submit the cells, poll the batch status, or merge the results into outfile; '
+                             'not with --concurrency, --chunk-rows, --pack-tokens or --dedupe')
+    parser.add_argument('--wait', action='store_true', help='With --batch poll, keep polling until the batches finish')
+    parser.add_argument('--export-cache', action='store_true',
+                        help='Keep the parsed metadata as a memory-mapped Arrow file next to it, reparsed only when the CSV changes')
+    parser.add_argument('--config', type=str, default=config.PLAGIARISM_CONFIG,
+                        help=f'Configuration file with the [chatgpt] credentials (default: {config.PLAGIARISM_CONFIG})')
+    instrumentation.add_arguments(parser)
     args = parser.parse_args()
+    instrumentation.configure(args)
+
+    if args.concurrency < 1 or args.chunk_rows < 1:
+        print("Error: --concurrency and --chunk-rows must be at least 1")
+        sys.exit(1)
+    error = option_error(args.pack_tokens, args.dedupe)
+    if error:
+        print(f"Error: {error}")
+        sys.exit(1)
+    # The Batch API sends one request per distinct cell and writes outfile once, at merge.
+    ignored = ["--" + name.replace("_", "-") for name in ("concurrency", "chunk_rows", "pack_tokens", "dedupe")
+               if getattr(args, name) != parser.get_default(name)]
+    if args.batch and ignored:
+        print(f"Error: --batch {args.batch} does not take {', '.join(ignored)}")
+        sys.exit(1)
+    if args.wait and args.batch != "poll":
+        print("Error: --wait only applies to --batch poll")
+        sys.exit(1)
 
     if not os.path.exists(args.gradescope_dir):
         print(f"Error: {args.gradescope_dir} does not exist")
         sys.exit(1)
 
-        # Check if the file exists in the current directory
-    org = None
-    project = None
-    if not os.path.isfile(CONFIG_FILE):
+    org, project = config.chatgpt_credentials(args.config)
+    if org is None:
         print("Error: OpenAI ChatGPT authentication credentials must be in config file.")
-    else: # File exists; read the configuration
-        org, project = parse_config(CONFIG_FILE)
     
-    main(args.gradescope_dir, args.outfile, org, project)
\ No newline at end of file
+    cache_file = None if args.no_cache else args.cache
+    if args.batch:
+        main_batch(args.gradescope_dir, args.outfile, org, project, args.batch, args.base_url, cache_file, args.wait,
+                   args.export_cache)
+    else:
+        main(args.gradescope_dir, args.outfile, org, project, args.concurrency, args.base_url,
+             cache_file, args.chunk_rows, args.pack_tokens, args.dedupe, args.export_cache)
\ No newline at end of file
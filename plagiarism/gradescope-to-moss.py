@@ -1,74 +1,167 @@
+from __future__ import annotations
+
 import argparse
+import contextlib
+import io
 import os
+import re
 import sys
+import tarfile
+import time
+import zipfile
+from concurrent.futures import ThreadPoolExecutor
+from typing import TYPE_CHECKING
 
-import pandas as pd 
-
-METADATA_FILENAME = "submission_metadata.csv"
+if TYPE_CHECKING:
+    import pandas as pd
 
-def parse_metadata(metadata_file: str) -> pd.DataFrame:
-    metadata = pd.read_csv(metadata_file)
+from gradescope_metadata import METADATA_FILENAME, count_rows, item_columns, iter_metadata, parse_metadata
 
-    student_data = ["First Name", "Last Name", "Student ID", "Email", "Submission ID"]
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from teaching_utilities import instrumentation  # noqa: E402
 
-    # Starting with column 9 (0-indexed):
-    # row i is the item score
-    # row i+1 is the item weight
-    # row i+2 is the item graded?
-    # row i+3 is the item response
-    # row i+4 is the item submitted at
-    # we are only interested in item response.
-    item_responses = [ metadata.columns[i] for i in range(12, len(metadata.columns), 5) ]
-    columns = student_data + item_responses
-    return metadata[columns]
+WORKERS = 8
+ARCHIVE_SUFFIXES = (".zip", ".tar", ".tar.gz", ".tgz")
 
-def generate_moss_file(moss_directory: str, row: pd.Series):
-    # You should write a script to remove student_id, name and email from this file
+def moss_files(submissions: pd.DataFrame, anonymize: bool = False):
+    """Yield (filename, contents) for each student's flat file transcript."""
+    # Without anonymize, the student_id, name and email should still be removed from these files
     # before sending to MOSS or any other tool.
-    student_id = row["Student ID"]
-    submission_id = row["Submission ID"]
-    first_name = row["First Name"]
-    last_name = row["Last Name"]
-    email = row["Email"]
-
-    # Create a file for the student
-    # The filename should be changed to remove ID and name before sending to MOSS.
-    filename = f"{student_id}-{first_name}-{last_name}.txt"
+    items = item_columns(submissions)
+    responses = submissions[items].to_numpy().tolist()
+
+    for filename, header, values in zip(*_students(submissions, anonymize), responses):
+        yield filename, header + "".join(f"{index}\n\n{value}\n\n\n\n" for index, value in zip(items, values))
+
+def _students(submissions: pd.DataFrame, anonymize: bool) -> tuple:
+    """Each student's filename and the header that starts their files."""
+    if anonymize:
+        return [f"{submission_id}.txt" for submission_id in submissions["Submission ID"]], [""] * len(submissions)
+    student_ids = submissions["Student ID"].tolist()
+    first_names = submissions["First Name"].tolist()
+    last_names = submissions["Last Name"].tolist()
+    emails = submissions["Email"].tolist()
+    return ([f"{student_ids[i]}-{first_names[i]}-{last_names[i]}.txt" for i in range(len(student_ids))],
+            [f"{first_names[i]}\n{last_names[i]}\n{student_ids[i]}\n{emails[i]}\n\n\n\n" for i in range(len(student_ids))])
+
+def item_directory(position: int, item: str) -> str:
+    """A directory name for an item column that is safe on any file system and unique by position."""
+    return f"{position + 1:03d}-{re.sub(r'[^A-Za-z0-9]+', '-', item).strip('-')[:60]}"
+
+def moss_item_files(submissions: pd.DataFrame, anonymize: bool = False):
+    """Yield (item directory/filename, contents) with one file per student and answered item, for one MOSS job per item."""
+    items = item_columns(submissions)
+    directories = [item_directory(position, item) for position, item in enumerate(items)]
+    for filename, header, values in zip(*_students(submissions, anonymize), submissions[items].to_numpy().tolist()):
+        for directory, value in zip(directories, values):
+            # Blank answers are left out: MOSS rejects empty files and they would only match each other.
+            if isinstance(value, str) and value.strip():
+                yield f"{directory}/{filename}", f"{header}{value}\n"
+
+def write_file(moss_directory: str, filename: str, contents: str):
     with open(os.path.join(moss_directory, filename), "w") as f:
-        f.write(f"{first_name}\n{last_name}\n{student_id}\n{email}\n\n\n\n")
-        extracted_columns = row.iloc[6:]
-        for index, value in extracted_columns.items():
-            f.write(f"{index}\n\n{value}\n\n\n\n")
-    print(f"Created Moss submission for {first_name} {last_name} ({student_id})")
+        f.write(contents)
+
+def generate_moss(moss_directory: str, submissions: pd.DataFrame, anonymize: bool = False, workers: int = WORKERS,
+                  per_item: bool = False) -> int:
+    # For each student generate one file at the root level, or one per item in each item's directory.
+    files = list(moss_item_files(submissions, anonymize) if per_item else moss_files(submissions, anonymize))
+    for directory in {os.path.dirname(filename) for filename, _ in files} - {""}:
+        os.makedirs(os.path.join(moss_directory, directory), exist_ok=True)
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        # list() surfaces the first write error, if any.
+        list(pool.map(lambda file: write_file(moss_directory, *file), files))
+    return len(files)
+
+def is_archive(path: str) -> bool:
+    return path.endswith(ARCHIVE_SUFFIXES)
+
+@contextlib.contextmanager
+def open_archive(path: str):
+    """Yield a function that adds (filename, contents) to a zip or tar archive at path."""
+    if path.endswith(".zip"):
+        with zipfile.ZipFile(path, "w", compression=zipfile.ZIP_DEFLATED) as archive:
+            yield lambda filename, contents: archive.writestr(filename, contents)
+        return
+    mode = "w" if path.endswith(".tar") else "w:gz"
+    with tarfile.open(path, mode) as archive:
+        def add(filename, contents):
+            data = contents.encode("utf-8")
+            info = tarfile.TarInfo(filename)
+            info.size = len(data)
+            info.mtime = time.time()
+            archive.addfile(info, io.BytesIO(data))
+        yield add
 
-def generate_moss(moss_directory: str, submissions: pd.DataFrame):
-     # For each student generate one file at the root level.
-    submissions.apply(lambda row: generate_moss_file(moss_directory, row), axis=1)
+def write_clusters(submissions: pd.DataFrame, outfile: str, threshold: float):
+    import pandas as pd
+    from near_duplicates import cluster_columns
+    # Near-duplicate answers to the same item are a plagiarism signal of their own.
+    responses = item_columns(submissions)
+    clusters, _ = cluster_columns(submissions, responses, threshold)
+    pd.concat([submissions[["Submission ID"]], clusters], axis=1).to_csv(outfile, index=False)
+    print(f"Wrote near-duplicate clusters to {outfile}")
 
-def main(gradescope: str, moss: str):
+def main(gradescope: str, moss: str, clusters: str = None, threshold: float = 0.8, anonymize: bool = False,
+         workers: int = WORKERS, export_cache: bool = False, per_item: bool = False):
     # Read the metadata file
     metadata_file = os.path.join(gradescope, METADATA_FILENAME)
     if not os.path.exists(metadata_file):
         print(f"Error: {metadata_file} does not exist")
         sys.exit(1)
+    cache = None
+    if export_cache:
+        from teaching_utilities.export_cache import ExportCache, default_cache_dir  # Needs pyarrow.
+        cache = ExportCache(default_cache_dir(metadata_file))
 
-    metadata = parse_metadata(metadata_file)
+    # Students are streamed in chunks; clustering needs every response to an item at once.
+    count = 0
+    with instrumentation.stage("write MOSS files", total=count_rows(metadata_file, cache)) as progress:
+        if is_archive(moss):
+            with open_archive(moss) as add:
+                for chunk in iter_metadata(metadata_file, cache=cache):
+                    for filename, contents in (moss_item_files if per_item else moss_files)(chunk, anonymize):
+                        add(filename, contents)
+                        count += 1
+                    progress.advance(len(chunk))
+        else:
+            # Create a directory to store the Moss submissions
+            os.makedirs(moss, exist_ok=True)
+            for chunk in iter_metadata(metadata_file, cache=cache):
+                count += generate_moss(moss, chunk, anonymize, workers, per_item)
+                progress.advance(len(chunk))
 
-    # Create a directory to store the Moss submissions
-    os.makedirs(moss, exist_ok=True)
+    print(f"All {count} Moss submissions created successfully")
 
-    generate_moss(moss, metadata)
+    if clusters:
+        with instrumentation.stage("cluster responses"):
+            write_clusters(parse_metadata(metadata_file, cache), clusters, threshold)
 
-    print("All Moss submissions created successfully")
+    if cache:
+        cache.close()
+        print(cache.summary())
 
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(description='Convert a Gradescope metadata file to a Moss submission')
     parser.add_argument('gradescope_dir', type=str, help='Path to the directory containing the submissions')
-    parser.add_argument('moss_dir', type=str, help='Path to the directory where the Moss submissions will be stored')
+    parser.add_argument('moss_dir', type=str, help='Path to the directory where the Moss submissions will be stored, '
+                        'or to a single .zip, .tar, .tar.gz or .tgz archive to write them to')
+    parser.add_argument('--anonymize', action='store_true',
+                        help='Name files by submission ID and leave out the name, student ID and email header')
+    parser.add_argument('--workers', type=int, default=WORKERS, help=f'Threads writing files (default: {WORKERS})')
+    parser.add_argument('--clusters', type=str, help='Also write near-duplicate cluster IDs and similarities per item to this CSV file')
+    parser.add_argument('--cluster-threshold', type=float, default=0.8, help='Estimated Jaccard similarity for two responses to share a cluster (default: 0.8)')
+    parser.add_argument('--export-cache', action='store_true',
+                        help='Keep the parsed metadata as a memory-mapped Arrow file next to it, reparsed only when the CSV changes')
+    parser.add_argument('--per-item', action='store_true',
+                        help='Write one directory per item with one file per student, for submit-to-moss.py --split')
+    instrumentation.add_arguments(parser)
     args = parser.parse_args()
+    instrumentation.configure(args)
 
     if not os.path.exists(args.gradescope_dir):
         print(f"Error: {args.gradescope_dir} does not exist")
         sys.exit(1)
     
-    main(args.gradescope_dir, args.moss_dir)
\ No newline at end of file
+    main(args.gradescope_dir, args.moss_dir, args.clusters, args.cluster_threshold, args.anonymize, args.workers,
+         args.export_cache, args.per_item)
\ No newline at end of file
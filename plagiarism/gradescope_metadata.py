@@ -0,0 +1,91 @@
+"""Load the columns the plagiarism scripts need from a Gradescope submission_metadata.csv."""
+
+from __future__ import annotations
+
+import csv
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    import pandas as pd
+
+METADATA_FILENAME = "submission_metadata.csv"
+STUDENT_DATA = ["First Name", "Last Name", "Student ID", "Email", "Submission ID"]
+
+# Starting with column 9 (0-indexed):
+# row i is the item score
+# row i+1 is the item weight
+# row i+2 is the item graded?
+# row i+3 is the item response
+# row i+4 is the item submitted at
+# we are only interested in item response.
+FIRST_RESPONSE = 12
+COLUMNS_PER_ITEM = 5
+
+# Names the cached table layout; bump it when the columns parse_metadata returns change.
+CACHE_KIND = "metadata-1"
+
+
+def read_header(metadata_file: str) -> list:
+    with open(metadata_file, newline="", encoding="utf-8-sig") as f:
+        return next(csv.reader(f), [])
+
+
+def metadata_columns(header: list) -> list:
+    """Positions of the student detail columns followed by the item response columns."""
+    missing = [name for name in STUDENT_DATA if name not in header]
+    if missing:
+        raise KeyError(f"Columns not found in metadata: {missing}")
+    student_data = [header.index(name) for name in STUDENT_DATA]
+    item_responses = list(range(FIRST_RESPONSE, len(header), COLUMNS_PER_ITEM))
+    return student_data + item_responses
+
+
+def item_columns(submissions: pd.DataFrame) -> list:
+    """The item response columns of a parsed export, which follow the student details."""
+    return list(submissions.columns[len(STUDENT_DATA):])
+
+
+def _read(metadata_file: str, **kwargs):
+    import pandas as pd
+    positions = metadata_columns(read_header(metadata_file))
+    # pandas returns usecols in file order, so remember where each position lands.
+    order = [sorted(positions).index(position) for position in positions]
+    frames = pd.read_csv(metadata_file, usecols=positions, dtype=str, encoding="utf-8-sig", **kwargs)
+    return frames, order
+
+
+def _parse(metadata_file: str) -> pd.DataFrame:
+    metadata, order = _read(metadata_file)
+    return metadata.iloc[:, order]
+
+
+def _cached_table(metadata_file: str, cache):
+    import pyarrow as pa  # Only needed with a cache.
+    return cache.table(metadata_file, CACHE_KIND,
+                       lambda path: pa.Table.from_pandas(_parse(path), preserve_index=False))
+
+
+def parse_metadata(metadata_file: str, cache=None) -> pd.DataFrame:
+    if cache is None:
+        return _parse(metadata_file)
+    return _cached_table(metadata_file, cache).to_pandas()
+
+
+def count_rows(metadata_file: str, cache=None):
+    """How many students iter_metadata() will yield, if known without reading the export: only with a cache."""
+    if cache is None:
+        return None
+    return _cached_table(metadata_file, cache).num_rows
+
+
+def iter_metadata(metadata_file: str, chunksize: int = 1000, cache=None):
+    """Yield parse_metadata()'s frame chunksize students at a time."""
+    if cache is not None:
+        # Batches are slices of the memory-mapped table, so only one chunk is materialized at a time.
+        for batch in _cached_table(metadata_file, cache).to_batches(max_chunksize=chunksize):
+            yield batch.to_pandas()
+        return
+    reader, order = _read(metadata_file, chunksize=chunksize)
+    with reader:
+        for chunk in reader:
+            yield chunk.iloc[:, order]
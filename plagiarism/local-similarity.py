@@ -0,0 +1,149 @@
+import argparse
+import csv
+import glob
+import html
+import json
+import os
+import sys
+import time
+
+from winnowing import (K, LANGUAGES, WINDOW, fingerprint_files, format_ranges, frequent_hashes, matched_lines,
+                       rank_pairs)
+
+TOP = 250
+
+PAGE = """<!DOCTYPE html>
+<html>
+<head>
+<meta charset="utf-8">
+<title>{title}</title>
+<style>
+body {{ font-family: sans-serif; margin: 1em; }}
+table {{ border-collapse: collapse; }}
+td, th {{ border: 1px solid #ccc; padding: 2px 8px; text-align: left; }}
+.side {{ display: flex; gap: 1em; }}
+.side > div {{ flex: 1; overflow-x: auto; }}
+pre {{ margin: 0; }}
+.match {{ background: #ffe08a; }}
+.line {{ color: #999; user-select: none; }}
+</style>
+</head>
+<body>
+{body}
+</body>
+</html>
+"""
+
+
+def find_submissions(submissions: str, pattern: str) -> list:
+    return sorted(glob.glob(os.path.join(submissions, pattern)))
+
+
+def base_hashes(base: str, pattern: str, language: str, k: int, window: int) -> set:
+    """Fingerprints of starter code, which should not count as a match."""
+    if not base:
+        return set()
+    paths = find_submissions(base, pattern) if os.path.isdir(base) else [base]
+    return {fingerprint[0] for prints in fingerprint_files(paths, language, k, window, workers=1) for fingerprint in prints}
+
+
+def render_source(path: str, ranges: list) -> str:
+    with open(path, encoding="utf-8", errors="replace") as f:
+        lines = f.read().splitlines()
+    highlighted = {line for first, last in ranges for line in range(first, last + 1)}
+    rows = []
+    for number, line in enumerate(lines, start=1):
+        css = ' class="match"' if number in highlighted else ""
+        rows.append(f'<span{css}><span class="line">{number:>5} </span>{html.escape(line)}</span>')
+    return "<pre>" + "\n".join(rows) + "</pre>"
+
+
+def write_report(report_dir: str, pairs: list, paths: list):
+    os.makedirs(report_dir, exist_ok=True)
+    rows = []
+    for number, pair in enumerate(pairs):
+        name_a, name_b = os.path.basename(paths[pair["a"]]), os.path.basename(paths[pair["b"]])
+        page = f"match{number}.html"
+        rows.append(f'<tr><td>{number + 1}</td>'
+                    f'<td><a href="{page}">{html.escape(name_a)} ({pair["percent_a"]}%)</a></td>'
+                    f'<td><a href="{page}">{html.escape(name_b)} ({pair["percent_b"]}%)</a></td>'
+                    f'<td>{pair["shared"]}</td></tr>')
+        body = (f'<p><a href="index.html">Back to all matches</a></p>'
+                f'<div class="side">'
+                f'<div><h3>{html.escape(name_a)} ({pair["percent_a"]}%)</h3>{render_source(paths[pair["a"]], pair["lines_a"])}</div>'
+                f'<div><h3>{html.escape(name_b)} ({pair["percent_b"]}%)</h3>{render_source(paths[pair["b"]], pair["lines_b"])}</div>'
+                f'</div>')
+        with open(os.path.join(report_dir, page), "w") as f:
+            f.write(PAGE.format(title=html.escape(f"{name_a} vs {name_b}"), body=body))
+
+    body = ("<h2>Local similarity report</h2>"
+            "<table><tr><th>#</th><th>File 1</th><th>File 2</th><th>Shared fingerprints</th></tr>"
+            + "\n".join(rows) + "</table>")
+    with open(os.path.join(report_dir, "index.html"), "w") as f:
+        f.write(PAGE.format(title="Local similarity report", body=body))
+
+
+def write_pairs(outdir: str, pairs: list, paths: list):
+    records = [{
+        "rank": number + 1,
+        "file_a": os.path.basename(paths[pair["a"]]),
+        "file_b": os.path.basename(paths[pair["b"]]),
+        "percent_a": pair["percent_a"],
+        "percent_b": pair["percent_b"],
+        "shared_fingerprints": pair["shared"],
+        "lines_a": format_ranges(pair["lines_a"]),
+        "lines_b": format_ranges(pair["lines_b"]),
+    } for number, pair in enumerate(pairs)]
+    with open(os.path.join(outdir, "pairs.json"), "w") as f:
+        json.dump(records, f, indent=2)
+    with open(os.path.join(outdir, "pairs.csv"), "w", newline="") as f:
+        writer = csv.DictWriter(f, fieldnames=list(records[0]) if records else ["rank"])
+        writer.writeheader()
+        writer.writerows(records)
+
+
+def main(submissions: str, outdir: str, language: str = "text", pattern: str = "*.txt", base: str = None,
+         k: int = K, window: int = WINDOW, max_df: float = 0.5, top: int = TOP, workers: int = None):
+    paths = find_submissions(submissions, pattern)
+    if len(paths) < 2:
+        print(f"Error: need at least two files matching {pattern} in {submissions}")
+        sys.exit(1)
+
+    start = time.perf_counter()
+    fingerprints = fingerprint_files(paths, language, k, window, workers)
+    ignore = base_hashes(base, pattern, language, k, window) | frequent_hashes(fingerprints, max_df)
+    print(f"Fingerprinted {len(paths)} files in {time.perf_counter() - start:.1f}s")
+
+    pairs = rank_pairs(fingerprints, ignore)
+    if top:
+        pairs = pairs[:top]
+    for pair in pairs:
+        pair["lines_a"], pair["lines_b"] = matched_lines(fingerprints[pair["a"]], fingerprints[pair["b"]], ignore)
+
+    os.makedirs(outdir, exist_ok=True)
+    write_pairs(outdir, pairs, paths)
+    write_report(os.path.join(outdir, "report"), pairs, paths)
+    print(f"Ranked {len(pairs)} pairs in {time.perf_counter() - start:.1f}s")
+    print(f"Report: {os.path.join(outdir, 'report', 'index.html')}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Find similar submissions locally with winnowing fingerprints, before sending to MOSS.")
+    parser.add_argument("submissions", type=str, help="Path to the submissions directory")
+    parser.add_argument("--outdir", type=str, default="similarity", help="Directory for pairs.csv, pairs.json and the HTML report (default: similarity)")
+    parser.add_argument("--language", type=str, default="text", choices=LANGUAGES, help="Language of the files (default: text)")
+    parser.add_argument("--pattern", type=str, default="*.txt", help="Glob of files to compare (default: *.txt)")
+    parser.add_argument("--base", type=str, help="Starter code file or directory whose matches are ignored")
+    parser.add_argument("-k", type=int, default=K, help=f"Tokens per k-gram (default: {K})")
+    parser.add_argument("--window", type=int, default=WINDOW, help=f"Winnowing window in k-grams (default: {WINDOW})")
+    parser.add_argument("--max-df", type=float, default=0.5, help="Ignore fingerprints found in more than this fraction of files (default: 0.5)")
+    parser.add_argument("--top", type=int, default=TOP, help=f"Number of pairs to report, 0 for all (default: {TOP})")
+    parser.add_argument("--workers", type=int, help="Fingerprinting processes (default: number of CPUs)")
+    args = parser.parse_args()
+
+    if not os.path.isdir(args.submissions):
+        print(f"Error: {args.submissions} does not exist")
+        sys.exit(1)
+
+    main(args.submissions, args.outdir, args.language, args.pattern, args.base, args.k, args.window,
+         args.max_df, args.top, args.workers)
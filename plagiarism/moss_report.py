@@ -0,0 +1,127 @@
+"""Read MOSS results from the report's match table instead of mirroring it."""
+
+import csv
+import os
+import re
+from concurrent.futures import ThreadPoolExecutor
+from html.parser import HTMLParser
+from urllib.parse import urljoin
+from urllib.request import urlopen
+
+from teaching_utilities import instrumentation
+
+MATCH_FIELDS = ["rank", "job", "file1", "percent1", "file2", "percent2", "lines", "url", "diff"]
+FRAMES = ["", "-top", "-0", "-1"]
+WORKERS = 8
+FILE_PERCENT = re.compile(r"^(.*?)\s*\((\d+)%\)\s*$")
+
+
+class MatchTableParser(HTMLParser):
+    def __init__(self):
+        super().__init__()
+        self.rows = []
+        self.row = None
+        self.link = None
+
+    def handle_starttag(self, tag, attrs):
+        if tag == "tr":
+            self._end_row()
+            self.row = {"links": [], "cells": []}
+        elif tag == "td" and self.row is not None:
+            self.row["cells"].append("")
+        elif tag == "a" and self.row is not None:
+            self.link = [dict(attrs).get("href", ""), ""]
+
+    def handle_endtag(self, tag):
+        if tag == "a" and self.link is not None:
+            self.row["links"].append(tuple(self.link))
+            self.link = None
+        elif tag in ("tr", "table"):
+            self._end_row()
+
+    def handle_data(self, data):
+        if self.link is not None:
+            self.link[1] += data
+        elif self.row is not None and self.row["cells"]:
+            self.row["cells"][-1] += data
+
+    def _end_row(self):
+        # Match rows are the ones with two file links and a line count; the header row has neither.
+        row, self.row = self.row, None
+        if row is None or len(row["links"]) < 2 or not row["cells"] or not row["cells"][-1].strip().isdigit():
+            return
+        (url, first), (_, second) = row["links"][:2]
+        first, second = FILE_PERCENT.match(first.strip()), FILE_PERCENT.match(second.strip())
+        if first and second:
+            self.rows.append({"file1": first.group(1), "percent1": int(first.group(2)),
+                              "file2": second.group(1), "percent2": int(second.group(2)),
+                              "lines": int(row["cells"][-1].strip()), "url": url})
+
+    def close(self):
+        super().close()
+        self._end_row()
+
+
+def parse_report(html: str, base_url: str = None) -> list:
+    """The matched pairs in a MOSS report page, in report order; relative links are resolved against base_url."""
+    parser = MatchTableParser()
+    parser.feed(html)
+    parser.close()
+    if base_url:
+        for row in parser.rows:
+            row["url"] = urljoin(base_url, row["url"])
+    return parser.rows
+
+
+def fetch(url: str) -> str:
+    with instrumentation.call("moss", "fetch page"), urlopen(url, timeout=120) as response:
+        return response.read().decode(response.headers.get_content_charset() or "utf-8", "replace")
+
+
+def read_report(source: str) -> tuple:
+    """(HTML, URL) of a report given as a URL or a saved file."""
+    if re.match(r"https?://", source):
+        return fetch(source), source
+    with open(source, encoding="utf-8", errors="replace") as f:
+        return f.read(), None
+
+
+def rank(rows: list) -> list:
+    """Most similar pairs first: by the larger percentage, then lines matched, then the smaller percentage."""
+    ranked = sorted(rows, key=lambda row: (-max(row["percent1"], row["percent2"]), -row["lines"],
+                                           -min(row["percent1"], row["percent2"])))
+    for position, row in enumerate(ranked, 1):
+        row["rank"] = position
+    return ranked
+
+
+def download_diffs(rows: list, directory: str, workers: int = WORKERS):
+    """Save the diff frames of each row's match under directory and record the local page in row["diff"]."""
+    pages = []
+    for row in rows:
+        match = re.search(r"(match\d+)\.html$", row["url"])
+        if not match:
+            continue
+        folder = os.path.join(directory, row.get("job") or "")
+        row["diff"] = os.path.join(folder, match.group(1) + ".html")
+        # The frameset links to its frames by relative URL, so the saved pages work offline.
+        pages.extend((row["url"][:match.start()] + match.group(1) + frame + ".html",
+                      os.path.join(folder, match.group(1) + frame + ".html")) for frame in FRAMES)
+
+    def save(page):
+        url, path = page
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(fetch(url))
+        progress.advance()
+
+    with instrumentation.stage("download diffs", total=len(pages)) as progress, \
+            ThreadPoolExecutor(max_workers=workers) as pool:
+        list(pool.map(save, pages))
+
+
+def write_matches(path: str, rows: list):
+    with open(path, "w", newline="") as f:
+        writer = csv.DictWriter(f, fieldnames=MATCH_FIELDS, extrasaction="ignore")
+        writer.writeheader()
+        writer.writerows(rows)
@@ -0,0 +1,127 @@
+"""Group near-identical free-text responses with MinHash and locality-sensitive hashing."""
+
+import zlib
+
+import numpy as np
+import pandas as pd
+
+from verdict_cache import normalize
+
+SHINGLE_SIZE = 5
+NUM_PERM = 64
+# Hashes are kept below 2**31 so that a * x + b fits in 64 bits before the modulus.
+PRIME = (1 << 31) - 1
+SEED = 1
+
+
+def shingles(text: str, size: int = SHINGLE_SIZE) -> np.ndarray:
+    """Hash the character shingles of already-normalized text into 31-bit integers."""
+    text = text.lower()
+    if len(text) <= size:
+        grams = {text}
+    else:
+        grams = {text[i:i + size] for i in range(len(text) - size + 1)}
+    return np.fromiter((zlib.crc32(gram.encode("utf-8")) & PRIME for gram in grams), dtype=np.uint64, count=len(grams))
+
+
+class MinHasher:
+    def __init__(self, num_perm: int = NUM_PERM, seed: int = SEED):
+        rng = np.random.default_rng(seed)
+        self.a = rng.integers(1, PRIME, size=(num_perm, 1), dtype=np.uint64)
+        self.b = rng.integers(0, PRIME, size=(num_perm, 1), dtype=np.uint64)
+
+    def signature(self, text: str) -> np.ndarray:
+        values = shingles(text)
+        return ((self.a * values + self.b) % PRIME).min(axis=1)
+
+
+def choose_bands(num_perm: int, threshold: float) -> tuple:
+    """Pick (bands, rows) whose LSH threshold (1/bands)**(1/rows) is closest to, without exceeding, threshold."""
+    best = (num_perm, 1)
+    for rows in range(1, num_perm + 1):
+        if num_perm % rows:
+            continue
+        bands = num_perm // rows
+        if (1 / bands) ** (1 / rows) <= threshold:
+            best = (bands, rows)
+    return best
+
+
+def _find(parent: list, i: int) -> int:
+    while parent[i] != i:
+        parent[i] = parent[parent[i]]
+        i = parent[i]
+    return i
+
+
+def cluster_responses(texts: list, threshold: float = 0.8, num_perm: int = NUM_PERM) -> tuple:
+    """Cluster texts whose estimated Jaccard similarity is at least threshold.
+
+    Returns three lists aligned with texts: a cluster ID (numbered in order of first
+    appearance), the position of the cluster's representative (its first member), and
+    the estimated similarity to that representative, which is at least threshold.
+    """
+    normalized = [normalize(text) for text in texts]
+    # Exact duplicates (after normalization) never need hashing.
+    distinct = list(dict.fromkeys(normalized))
+    position = {text: i for i, text in enumerate(distinct)}
+
+    hasher = MinHasher(num_perm)
+    signatures = np.stack([hasher.signature(text) for text in distinct]) if distinct else np.empty((0, num_perm))
+    bands, rows = choose_bands(num_perm, threshold)
+
+    # A cluster's root is its earliest response, the representative, and every member is within
+    # threshold of it: merging on any similar pair would chain A~B and B~C into a cluster holding A and C.
+    parent = list(range(len(distinct)))
+    members = {i: [i] for i in range(len(distinct))}
+    for band in range(bands):
+        buckets = {}
+        for i, key in enumerate(map(bytes, signatures[:, band * rows:(band + 1) * rows])):
+            buckets.setdefault(key, []).append(i)
+        for bucket in buckets.values():
+            head = bucket[0]
+            for other in bucket[1:]:
+                first, second = sorted((_find(parent, head), _find(parent, other)))
+                if first == second:
+                    continue
+                if all(np.mean(signatures[first] == signatures[member]) >= threshold for member in members[second]):
+                    parent[second] = first
+                    members[first].extend(members.pop(second))
+
+    labels = []
+    representatives = []
+    similarity = []
+    cluster_ids = {}
+    first_member = {}
+    for row, text in enumerate(normalized):
+        root = _find(parent, position[text])
+        if root not in cluster_ids:
+            cluster_ids[root] = len(cluster_ids)
+            first_member[root] = row
+        representative = first_member[root]
+        labels.append(cluster_ids[root])
+        representatives.append(representative)
+        if normalized[representative] == text:
+            similarity.append(1.0)
+        else:
+            rep_signature = signatures[position[normalized[representative]]]
+            similarity.append(round(float(np.mean(signatures[position[text]] == rep_signature)), 3))
+    return labels, representatives, similarity
+
+
+def cluster_columns(frame: pd.DataFrame, columns: list, threshold: float = 0.8) -> tuple:
+    """Cluster each response column of frame independently.
+
+    Returns a frame with a '<column> Cluster' and '<column> Similarity' pair per column,
+    and a copy of frame[columns] in which every response is replaced by its cluster
+    representative, so scoring the copy sends each cluster only once.
+    """
+    info = {}
+    representatives = frame[columns].copy()
+    for column in columns:
+        texts = frame[column].tolist()
+        labels, reps, similarity = cluster_responses(texts, threshold)
+        info[f"{column} Cluster"] = labels
+        info[f"{column} Similarity"] = similarity
+        representatives[column] = [texts[rep] for rep in reps]
+    return pd.DataFrame(info, index=frame.index), representatives
@@ -0,0 +1,205 @@
+"""Run the plagiarism pipeline on every Gradescope export under a directory."""
+
+import argparse
+import contextlib
+import csv
+import importlib.util
+import multiprocessing
+import os
+import sys
+import time
+import traceback
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from gradescope_metadata import METADATA_FILENAME, STUDENT_DATA, parse_metadata
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from teaching_utilities import config, instrumentation  # noqa: E402
+
+PLAGIARISM_DIR = os.path.dirname(os.path.abspath(__file__))
+CONCURRENCY = 4
+API_BUDGET = 16
+SUMMARY_FIELDS = ["assignment", "students", "items", "moss_files", "chatgpt_sent", "cache_hits", "seconds", "status",
+                  "error"]
+
+_scripts = {}
+_budget = None
+
+
+def load_script(name: str):
+    """Import a hyphenated script once per process."""
+    if name not in _scripts:
+        spec = importlib.util.spec_from_file_location(name.replace("-", "_"), os.path.join(PLAGIARISM_DIR, name))
+        module = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(module)
+        _scripts[name] = module
+    return _scripts[name]
+
+
+def find_exports(root: str) -> dict:
+    """Map an assignment name (its path below root) to each directory holding a submission_metadata.csv."""
+    exports = {}
+    for directory, subdirectories, files in os.walk(root):
+        subdirectories[:] = sorted(name for name in subdirectories if not name.startswith("."))
+        if METADATA_FILENAME in files:
+            name = os.path.relpath(directory, root)
+            exports[os.path.basename(os.path.abspath(root)) if name == "." else name.replace(os.sep, "__")] = directory
+    return exports
+
+
+def init_worker(budget, stages: set):
+    global _budget
+    _budget = budget
+    # Each assignment's timings go to its metrics.json; progress lines would interleave with the other workers'.
+    instrumentation.recorder.show_progress = False
+    # Import what every assignment needs before the first one starts; the scripts themselves load it lazily.
+    import pandas  # noqa: F401
+    if "moss" in stages:
+        load_script("gradescope-to-moss.py")
+    if "chatgpt" in stages:
+        load_script("gradescope-to-chatgpt.py")
+        import openai  # noqa: F401
+
+
+def run_assignment(name: str, export: str, outdir: str, options: dict) -> dict:
+    """Convert and score one assignment, logging to its log.txt; returns its summary row."""
+    start = time.perf_counter()
+    row = dict.fromkeys(SUMMARY_FIELDS, "")
+    row.update(assignment=name, status="ok")
+    directory = os.path.join(outdir, name)
+    os.makedirs(directory, exist_ok=True)
+    instrumentation.recorder.reset()
+    with open(os.path.join(directory, "log.txt"), "w") as log, contextlib.redirect_stdout(log):
+        try:
+            cache = None
+            if options["export_cache"]:
+                from teaching_utilities.export_cache import ExportCache, default_cache_dir
+                cache = ExportCache(default_cache_dir(export))
+            with instrumentation.stage("load metadata"):
+                metadata = parse_metadata(os.path.join(export, METADATA_FILENAME), cache)
+            if cache:
+                cache.close()
+                print(cache.summary())
+            row["students"], row["items"] = len(metadata), len(metadata.columns) - len(STUDENT_DATA)
+
+            if options["moss"]:
+                moss = load_script("gradescope-to-moss.py")
+                moss_dir = os.path.join(directory, "moss")
+                os.makedirs(moss_dir, exist_ok=True)
+                with instrumentation.stage("write MOSS files"):
+                    row["moss_files"] = moss.generate_moss(moss_dir, metadata, options["anonymize"], moss.WORKERS,
+                                                           options["per_item"])
+                print(f"Wrote {row['moss_files']} MOSS files to {moss_dir}")
+
+            if options["chatgpt"]:
+                chatgpt = load_script("gradescope-to-chatgpt.py")
+                sent, hits, misses = chatgpt.score_submissions(
+                    metadata, os.path.join(directory, "chatgpt.csv"), options["org"], options["project"],
+                    options["concurrency"], options["base_url"], options["cache_file"], chatgpt.CHUNK_ROWS,
+                    options["pack_tokens"], options["dedupe"], _budget)
+                row["chatgpt_sent"], row["cache_hits"] = sent, hits
+                print(f"Cache: {hits} hits, {misses} misses, {sent} responses sent to ChatGPT")
+        except (Exception, SystemExit) as e:
+            traceback.print_exc(file=log)
+            row["status"], row["error"] = "failed", str(e) or type(e).__name__
+    row["seconds"] = round(time.perf_counter() - start, 2)
+    instrumentation.recorder.write(os.path.join(directory, "metrics.json"))
+    return row
+
+
+def main(root: str, outdir: str, options: dict, processes: int = None, api_budget: int = API_BUDGET):
+    exports = find_exports(root)
+    if not exports:
+        print(f"Error: no {METADATA_FILENAME} under {root}")
+        sys.exit(1)
+    os.makedirs(outdir, exist_ok=True)
+    # The largest exports start first so that a big one does not run alone at the end.
+    order = sorted(exports, key=lambda name: -os.path.getsize(os.path.join(exports[name], METADATA_FILENAME)))
+    stages = {stage for stage in ("moss", "chatgpt") if options[stage]}
+    processes = min(processes or os.cpu_count() or 1, len(exports))
+    print(f"Processing {len(exports)} assignments with {processes} processes...")
+
+    start = time.perf_counter()
+    budget = multiprocessing.get_context().BoundedSemaphore(api_budget)
+    rows = []
+    with instrumentation.stage("assignments", total=len(exports)) as progress, \
+            ProcessPoolExecutor(max_workers=processes, initializer=init_worker, initargs=(budget, stages)) as pool:
+        futures = [pool.submit(run_assignment, name, exports[name], outdir, options) for name in order]
+        for future in as_completed(futures):
+            row = future.result()
+            rows.append(row)
+            progress.advance(failed=row["status"] != "ok")
+            if row["error"]:
+                instrumentation.echo(f"{row['assignment']} {row['status']} in {row['seconds']}s: {row['error']}")
+
+    rows.sort(key=lambda row: row["assignment"])
+    summary = os.path.join(outdir, "summary.csv")
+    with open(summary, "w", newline="") as f:
+        writer = csv.DictWriter(f, fieldnames=SUMMARY_FIELDS)
+        writer.writeheader()
+        writer.writerows(rows)
+    failed = sum(row["status"] != "ok" for row in rows)
+    print(f"Wrote {summary}: {len(rows) - failed} assignments done, {failed} failed, "
+          f"{time.perf_counter() - start:.1f}s in total")
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run gradescope-to-moss and gradescope-to-chatgpt on every export under a directory")
+    parser.add_argument("exports", type=str, help="Directory searched for submission_metadata.csv files")
+    parser.add_argument("outdir", type=str, help="Directory for the per-assignment outputs and summary.csv")
+    parser.add_argument("--processes", type=int, help="Assignments processed at once (default: number of CPUs)")
+    parser.add_argument("--no-moss", action="store_true", help="Do not write MOSS files")
+    parser.add_argument("--no-chatgpt", action="store_true", help="Do not score responses with ChatGPT")
+    parser.add_argument("--anonymize", action="store_true", help="As in gradescope-to-moss.py")
+    parser.add_argument("--per-item", action="store_true", help="As in gradescope-to-moss.py")
+    parser.add_argument("--concurrency", type=int, default=CONCURRENCY,
+                        help=f"ChatGPT requests in flight per assignment (default: {CONCURRENCY})")
+    parser.add_argument("--api-budget", type=int, default=API_BUDGET,
+                        help=f"ChatGPT requests in flight across all assignments (default: {API_BUDGET})")
+    parser.add_argument("--base-url", type=str, help="As in gradescope-to-chatgpt.py")
+    parser.add_argument("--cache", type=str, default="chatgpt-cache.sqlite",
+                        help="Verdict cache shared by every assignment (default: chatgpt-cache.sqlite)")
+    parser.add_argument("--no-cache", action="store_true", help="Do not read or write the verdict cache file")
+    parser.add_argument("--pack-tokens", type=int, default=0, help="As in gradescope-to-chatgpt.py")
+    parser.add_argument("--dedupe", type=float, default=0, help="As in gradescope-to-chatgpt.py")
+    parser.add_argument("--export-cache", action="store_true", help="As in gradescope-to-moss.py")
+    parser.add_argument("--config", type=str, default=config.PLAGIARISM_CONFIG, help="As in gradescope-to-chatgpt.py")
+    instrumentation.add_arguments(parser)
+    args = parser.parse_args()
+    instrumentation.configure(args)
+
+    if not os.path.isdir(args.exports):
+        print(f"Error: {args.exports} does not exist")
+        sys.exit(1)
+    if args.concurrency < 1 or args.api_budget < 1:
+        print("Error: --concurrency and --api-budget must be at least 1")
+        sys.exit(1)
+    error = load_script("gradescope-to-chatgpt.py").option_error(args.pack_tokens, args.dedupe)
+    if error:
+        print(f"Error: {error}")
+        sys.exit(1)
+
+    org = project = None
+    if not args.no_chatgpt:
+        org, project = config.chatgpt_credentials(args.config)
+        if org is None:
+            print("Error: OpenAI ChatGPT authentication credentials must be in config file.")
+            sys.exit(1)
+
+    options = {
+        "moss": not args.no_moss,
+        "chatgpt": not args.no_chatgpt,
+        "anonymize": args.anonymize,
+        "per_item": args.per_item,
+        "export_cache": args.export_cache,
+        "org": org,
+        "project": project,
+        "concurrency": args.concurrency,
+        "base_url": args.base_url,
+        "cache_file": None if args.no_cache else os.path.abspath(args.cache),
+        "pack_tokens": args.pack_tokens,
+        "dedupe": args.dedupe,
+    }
+    main(args.exports, args.outdir, options, args.processes, args.api_budget)
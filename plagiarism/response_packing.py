@@ -0,0 +1,98 @@
+"""Pack several short student responses into a single ChatGPT request."""
+
+import json
+
+PACK_SYSTEM_PROMPT = (
+    "You will be given a JSON object containing a list of student responses, each with an 'id' and a 'text'. "
+    "For each response, estimate the probability that the text came from ChatGPT or another LLM. "
+    "Reply with only a JSON object of the form "
+    '{"results": [{"id": "<id>", "probability": <number from 0 to 1>, "explanation": "<one or two sentences>"}]} '
+    "containing exactly one entry for every response id."
+)
+
+# Tokens added per response for its id and the JSON punctuation around it.
+ITEM_OVERHEAD_TOKENS = 8
+# The smallest useful pack budget: one token of response text besides its overhead.
+MIN_PACK_TOKENS = ITEM_OVERHEAD_TOKENS + 1
+PACK_MAX_ITEMS = 50
+
+_encoding = None
+
+
+def estimate_tokens(text) -> int:
+    """Count tokens with tiktoken when it is installed, otherwise use the ~4 characters per token rule."""
+    global _encoding
+    text = "" if text is None or text != text else str(text)
+    if _encoding is None:
+        try:
+            import tiktoken
+            _encoding = tiktoken.get_encoding("o200k_base")
+        except ImportError:
+            _encoding = False
+    if _encoding:
+        return len(_encoding.encode(text))
+    return len(text) // 4 + 1
+
+
+def pack_items(items: list, token_budget: int, max_items: int = PACK_MAX_ITEMS) -> list:
+    """Greedily group (id, text) pairs, in order, into packs whose estimated size fits token_budget.
+
+    A response larger than the budget on its own still gets a pack of its own.
+    """
+    packs = []
+    current = []
+    used = 0
+    for item_id, text in items:
+        cost = estimate_tokens(text) + ITEM_OVERHEAD_TOKENS
+        if current and (used + cost > token_budget or len(current) >= max_items):
+            packs.append(current)
+            current = []
+            used = 0
+        current.append((item_id, text))
+        used += cost
+    if current:
+        packs.append(current)
+    return packs
+
+
+def build_pack_messages(pack: list) -> list:
+    responses = [{"id": item_id, "text": "" if text is None or text != text else str(text)} for item_id, text in pack]
+    return [
+        {"role": "system", "content": PACK_SYSTEM_PROMPT},
+        {"role": "user", "content": json.dumps({"responses": responses}, ensure_ascii=False)},
+    ]
+
+
+def parse_pack_response(content: str, ids: list) -> dict:
+    """Return {id: (explanation, probability)} for every well-formed entry about one of ids.
+
+    Malformed output yields an empty dict; ids absent from the result are simply missing.
+    """
+    try:
+        results = json.loads(content)["results"]
+    except (TypeError, ValueError, KeyError):
+        return {}
+    if not isinstance(results, list):
+        return {}
+    wanted = set(ids)
+    verdicts = {}
+    for entry in results:
+        if not isinstance(entry, dict) or entry.get("id") not in wanted:
+            continue
+        try:
+            probability = float(entry["probability"])
+        except (KeyError, TypeError, ValueError):
+            continue
+        if 0 <= probability <= 1:
+            verdicts[entry["id"]] = (str(entry.get("explanation", "")), probability)
+    return verdicts
+
+
+def format_narrative(explanation: str, probability: float) -> str:
+    """Render a packed verdict like a single-response narrative, so PROBABILITY still parses it."""
+    return f"{explanation}\nProbability: {probability}"
+
+
+def split_pack(pack: list) -> list:
+    middle = len(pack) // 2
+    return [pack[:middle], pack[middle:]]
@@ -1,80 +1,169 @@
 import argparse
-import configparser
+import glob
 import os
 import sys
-import mosspy
+from concurrent.futures import ThreadPoolExecutor
 
-CONFIG_FILE = "plagiarism.cfg"
+# Before moss_report, which imports teaching_utilities too.
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from teaching_utilities import config, instrumentation  # noqa: E402
+from moss_report import download_diffs, parse_report, rank, read_report, write_matches  # noqa: E402
 
-def submit(user_id: str, submissions: str, outdir: str, lang: str):
+JOBS = 4
+MATCHES_FILE = "matches.csv"
+
+
+def log(message: str):
+    instrumentation.echo(message)
+
+
+def find_jobs(submissions: str, split: bool, separate_dirs: bool) -> dict:
+    """Map each job name to the files it compares.
+
+    Without split, everything under submissions is one job. With split, each subdirectory
+    (one per question, e.g. from gradescope-to-moss.py --per-item) is its own job.
+    In directory mode (separate_dirs), every directory below a job is one student's submission.
+    """
+    pattern = os.path.join("**", "*") if separate_dirs else "*.txt"
+    if not split:
+        roots = {os.path.basename(os.path.normpath(submissions)): submissions}
+    else:
+        roots = {name: os.path.join(submissions, name) for name in sorted(os.listdir(submissions))
+                 if os.path.isdir(os.path.join(submissions, name)) and not name.startswith(".")}
+    jobs = {}
+    for name, root in roots.items():
+        # MOSS rejects empty files.
+        files = [path for path in sorted(glob.glob(os.path.join(root, pattern), recursive=True))
+                 if os.path.isfile(path) and os.path.getsize(path) > 0]
+        if len(files) > 1:
+            jobs[name] = (root, files)
+    return jobs
+
+
+def submit(user_id: str, name: str, root: str, files: list, lang: str, separate_dirs: bool = False,
+           server: str = None) -> str:
+    """Send one job to MOSS and return its report URL."""
+    import mosspy  # Not needed to parse saved reports.
     m = mosspy.Moss(user_id, lang)
+    if server:
+        m.server, _, port = server.partition(":")
+        m.port = int(port or m.port)
+    if separate_dirs:
+        m.setDirectoryMode(1)
+    for path in files:
+        # Names relative to the job keep the report, and the CSV made from it, readable.
+        m.addFile(path, os.path.relpath(path, root).replace(" ", "_").replace("\\", "/"))
+
+    log(f"Sending {len(files)} files for {name} to MOSS...")
+    # One call covers the upload and the comparison, which MOSS runs before it answers.
+    with instrumentation.call("moss", "submit"):
+        url = m.send()
+    if not url.startswith("http"):
+        raise RuntimeError(f"MOSS did not return a report URL: {url!r}")
+    log(f"{name} report: {url}")
+    return url
 
-    print("Adding files...")
-    m.addFilesByWildcard(os.path.join(submissions, "*.txt"))
-
-    print("Sending to MOSS...")
-    url = m.send(lambda file_path, display_name: print('*', end='', flush=True))
-    print()
-
-    print ("Report Url: " + url)
-
-    report_file = "report.html" if not outdir else os.path.join(outdir, "report.html")
-    report_dir = "report" if not outdir else os.path.join(outdir, "report")
-    m.saveWebPage(url, report_file)
-
-    # Download whole report locally including code diff links
-    mosspy.download_report(url, report_dir, connections=8, log_level=10, on_read=lambda url: print('*', end='', flush=True))
-
-def parse_config(config_file: str) -> str:
-    # Initialize the parser
-    config = configparser.ConfigParser()
-    
-    # Check if the configuration file exists
-    if not os.path.isfile(config_file):
-        print(f"Configuration file '{config_file}' not found.")
-        return
-    
-    # Read the configuration file
-    config.read(config_file)
-    
-    # Access values in specific sections
-    if 'moss' in config:
-        moss_userid = config['moss'].get('userid', 'Not specified')
+
+def run_job(user_id: str, name: str, root: str, files: list, lang: str, outdir: str, separate_dirs: bool,
+            server: str) -> list:
+    url = submit(user_id, name, root, files, lang, separate_dirs, server)
+    html, _ = read_report(url)
+    job_dir = os.path.join(outdir, name)
+    os.makedirs(job_dir, exist_ok=True)
+    with open(os.path.join(job_dir, "report.html"), "w", encoding="utf-8") as f:
+        f.write(html)
+    rows = parse_report(html, url)
+    for row in rows:
+        row["job"] = name
+    return rows
+
+
+def report_rows(reports: list) -> list:
+    """Rows of saved report files or report URLs, named after the report's directory."""
+    rows = []
+    for source in reports:
+        html, url = read_report(source)
+        name = os.path.basename(os.path.dirname(os.path.abspath(source))) if url is None else url.rstrip("/").split("/")[-1]
+        for row in parse_report(html, url):
+            row["job"] = name
+            rows.append(row)
+    return rows
+
+
+def main(user_id=None, submissions=None, outdir=None, separate_dirs=False, lang=None, split=False, jobs=JOBS,
+         reports=None, diffs=None, server=None):
+    outdir = outdir or "."
+    os.makedirs(outdir, exist_ok=True)
+    if reports:
+        rows = report_rows(reports)
     else:
-        print("Section 'moss' not found in configuration.")
-        print("Please provide the 'userid' in the configuration file.")
-        print("userid = 0")
-        sys.exit(1)
-    return moss_userid
+        found = find_jobs(submissions, split, separate_dirs)
+        if not found:
+            print(f"Error: no job in {submissions} has two or more submissions to compare")
+            sys.exit(1)
+        rows, failed = [], []
+        # Jobs are independent, so MOSS compares each one while the others upload.
+        with instrumentation.stage("MOSS jobs", total=len(found)) as progress, \
+                ThreadPoolExecutor(max_workers=max(1, jobs)) as pool:
+            futures = {name: pool.submit(run_job, user_id, name, root, files, lang, outdir, separate_dirs, server)
+                       for name, (root, files) in found.items()}
+            for name, future in futures.items():
+                try:
+                    rows.extend(future.result())
+                    progress.advance()
+                except Exception as e:
+                    log(f"Error: MOSS job {name} failed: {e}")
+                    failed.append(name)
+                    progress.advance(failed=True)
+        if failed and len(failed) == len(found):
+            sys.exit(1)
 
-def main(user_id=None, submissions=None, outdir=None, separate_dirs=True, lang=None):
-    submit(user_id, submissions, outdir, lang)
+    rows = rank(rows)
+    if diffs is not None:
+        selected = rows if diffs < 0 else rows[:diffs]
+        print(f"Downloading the diffs of {len(selected)} pairs...")
+        download_diffs(selected, outdir)
+    matches = os.path.join(outdir, MATCHES_FILE)
+    write_matches(matches, rows)
+    print(f"Wrote {len(rows)} matched pairs to {matches}")
 
 if __name__ == '__main__':
     parser = argparse.ArgumentParser(description="Submit student to work MOSS.")
-    parser.add_argument("--user_id", type=str, help="User ID (required if file is moss.cfg missing)")
-    parser.add_argument("--submissions", type=str, required=True, help="Path to the submissions directory")
-    parser.add_argument("--separate_dirs", action="store_true", help="Flag to specify if each student's files are in separate directories (default: True)")
+    parser.add_argument("--user_id", type=str, help="User ID (required if the config file is missing)")
+    parser.add_argument("--submissions", type=str, help="Path to the submissions directory")
+    parser.add_argument("--separate_dirs", action="store_true", help="Flag to specify if each student's files are in separate directories (MOSS directory mode)")
     parser.add_argument("--language", type=str, help="Language of the files.")
     parser.add_argument("--outdir", type=str, help="Output directory to store the Moss analysis results")
+    parser.add_argument("--split", action="store_true",
+                        help="Send each subdirectory of the submissions (one per question) as its own MOSS job")
+    parser.add_argument("--jobs", type=int, default=JOBS, help=f"MOSS jobs to run at once with --split (default: {JOBS})")
+    parser.add_argument("--download-diffs", type=int, nargs="?", const=-1, metavar="N",
+                        help="Also save the diff pages of the N highest ranked pairs (all pairs without N)")
+    parser.add_argument("--report", type=str, action="append",
+                        help="Rank the matches in a saved report.html or report URL instead of submitting; repeatable")
+    parser.add_argument("--server", type=str, help="MOSS server as host:port (default: moss.stanford.edu:7690)")
+    parser.add_argument("--config", type=str, default=config.PLAGIARISM_CONFIG,
+                        help=f"Configuration file with the [moss] userid (default: {config.PLAGIARISM_CONFIG})")
+    instrumentation.add_arguments(parser)
 
     # Parse arguments
     args = parser.parse_args()
+    instrumentation.configure(args)
 
     # Check if the file exists in the current directory
-    config = None
-    user_id = None
-    if not os.path.isfile(CONFIG_FILE):
-        # File doesn't exist; user_id must be provided
-        if args.user_id is None:
+    user_id = args.user_id
+    if not args.report:
+        user_id = user_id or config.moss_userid(args.config)
+        if user_id is None:
+            # File doesn't exist; user_id must be provided
             print("Error: 'user_id' is required when the file is missing.")
             sys.exit(1)
-    else: # File exists; read the configuration
-        user_id = parse_config(CONFIG_FILE)
 
-    # Check if submissions path is provided
-    if not args.submissions:
-        print("Error: 'submissions' path is required.")
-        sys.exit(1)
+        # Check if submissions path is provided
+        if not args.submissions:
+            print("Error: 'submissions' path is required.")
+            sys.exit(1)
 
-    main(user_id=user_id, submissions=args.submissions, outdir=args.outdir, separate_dirs=args.separate_dirs, lang=args.language)
+    main(user_id=user_id, submissions=args.submissions, outdir=args.outdir, separate_dirs=args.separate_dirs,
+         lang=args.language, split=args.split, jobs=args.jobs, reports=args.report, diffs=args.download_diffs,
+         server=args.server)
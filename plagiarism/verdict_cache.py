@@ -0,0 +1,81 @@
+"""On-disk cache of ChatGPT verdicts shared by the plagiarism scripts."""
+
+import hashlib
+import re
+import sqlite3
+
+WHITESPACE = re.compile(r"\s+")
+
+
+def normalize(text) -> str:
+    """Collapse whitespace so trivially different copies share a cache entry."""
+    if text is None or text != text:  # None or NaN
+        return ""
+    return WHITESPACE.sub(" ", str(text)).strip()
+
+
+def cache_key(model: str, system_prompt: str, text) -> str:
+    digest = hashlib.sha256()
+    for part in (model, system_prompt, normalize(text)):
+        digest.update(part.encode("utf-8"))
+        digest.update(b"\0")
+    return digest.hexdigest()
+
+
+class VerdictCache:
+    """SQLite-backed map from cache_key() to (narrative, score)."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self.hits = 0
+        self.misses = 0
+        # Processes scoring other assignments may be writing to the same file.
+        self.connection = sqlite3.connect(path, timeout=60)
+        self.connection.execute(
+            "CREATE TABLE IF NOT EXISTS verdicts ("
+            " key TEXT PRIMARY KEY,"
+            " model TEXT NOT NULL,"
+            " narrative TEXT NOT NULL,"
+            " score REAL)"
+        )
+        self.connection.commit()
+
+    def get_many(self, keys: list, fallbacks: list = None) -> dict:
+        """Return {key: (narrative, score)} for the keys that are cached, counting hits and misses.
+
+        A key that is not cached takes the verdict of the fallback key at the same position, if any.
+        """
+        found = {}
+        unique = list(dict.fromkeys(keys + (fallbacks or [])))
+        # Stay well under SQLite's limit on bound parameters.
+        for start in range(0, len(unique), 500):
+            batch = unique[start:start + 500]
+            placeholders = ",".join("?" * len(batch))
+            rows = self.connection.execute(
+                f"SELECT key, narrative, score FROM verdicts WHERE key IN ({placeholders})", batch)
+            for key, narrative, score in rows:
+                found[key] = (narrative, score)
+        for key, fallback in zip(keys, fallbacks or keys):
+            if key not in found and fallback in found:
+                found[key] = found[fallback]
+            if key in found:
+                self.hits += 1
+            else:
+                self.misses += 1
+        return found
+
+    def put_many(self, model: str, entries: dict):
+        """Store {key: (narrative, score)} and commit, so the work survives a crash."""
+        self.connection.executemany(
+            "INSERT OR REPLACE INTO verdicts (key, model, narrative, score) VALUES (?, ?, ?, ?)",
+            [(key, model, narrative, score) for key, (narrative, score) in entries.items()])
+        self.connection.commit()
+
+    def close(self):
+        self.connection.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
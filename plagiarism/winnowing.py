@@ -0,0 +1,213 @@
+"""Local document fingerprinting with winnowing, the algorithm behind MOSS.
+
+Schleimer, Wilkerson and Aiken, "Winnowing: Local Algorithms for Document Fingerprinting", SIGMOD 2003.
+"""
+
+import hashlib
+import itertools
+import os
+import re
+from concurrent.futures import ProcessPoolExecutor
+
+K = 5
+WINDOW = 4
+
+KEYWORDS = {
+    "python": """False None True and as assert async await break class continue def del elif else except finally
+        for from global if import in is lambda nonlocal not or pass raise return try while with yield
+        print len range self""",
+    "c": """auto break case char const continue default do double else enum extern float for goto if inline int
+        long register return short signed sizeof static struct switch typedef union unsigned void volatile while
+        include define NULL printf malloc free""",
+    "java": """abstract assert boolean break byte case catch char class const continue default do double else enum
+        extends final finally float for if implements import instanceof int interface long native new package
+        private protected public return short static super switch synchronized this throw throws try void
+        volatile while null true false String System out println""",
+    "javascript": """async await break case catch class const continue debugger default delete do else export extends
+        finally for function if import in instanceof let new of return super switch this throw try typeof var void
+        while with yield null undefined true false console log""",
+    "r": """if else repeat while function for in next break TRUE FALSE NULL Inf NaN NA library return c list""",
+    "sql": """select from where group by order having join left right inner outer on as and or not in is null
+        insert into values update set delete create table distinct count sum avg min max limit union""",
+}
+KEYWORDS["cc"] = KEYWORDS["c"] + """ bool catch class delete friend namespace new operator private protected public
+    template this throw try using virtual std cout cin endl vector string"""
+KEYWORDS = {language: set(words.split()) for language, words in KEYWORDS.items()}
+
+# Comment syntax per language; text is compared as written.
+LINE_COMMENT = {"python": "#", "r": "#", "sql": "--", "c": "//", "cc": "//", "java": "//", "javascript": "//"}
+BLOCK_COMMENT = {"c", "cc", "java", "javascript", "sql"}
+CASE_INSENSITIVE = {"sql"}
+
+STRING = r""""(?:\\.|[^"\\\n])*"|'(?:\\.|[^'\\\n])*'"""
+CODE_TOKEN = re.compile(rf"""
+    (?P<string>{STRING})
+  | (?P<number>\b\d+(?:\.\d*)?(?:[eE][+-]?\d+)?\b)
+  | (?P<name>[A-Za-z_]\w*)
+  | (?P<op>==|!=|<=|>=|&&|\|\||<<|>>|\+\+|--|->|[-+*/%=<>!&|^~?:;,.()\[\]{{}}])
+""", re.VERBOSE)
+TEXT_TOKEN = re.compile(r"\w+")
+
+LANGUAGES = sorted(KEYWORDS) + ["text"]
+
+
+def _comment_pattern(language: str):
+    # Strings are matched as well, so that a comment marker inside one ("http://", "#1") is left alone.
+    strings = ([r'"""[\s\S]*?"""', r"'''[\s\S]*?'''"] if language == "python" else []) + [STRING]
+    comments = [re.escape(LINE_COMMENT[language]) + r"[^\n]*"]
+    if language in BLOCK_COMMENT:
+        comments.insert(0, r"/\*[\s\S]*?\*/")
+    return re.compile(f"(?P<string>{'|'.join(strings)})|(?P<comment>{'|'.join(comments)})")
+
+
+COMMENT = {language: _comment_pattern(language) for language in LINE_COMMENT}
+
+
+def strip_comments(source: str, language: str) -> str:
+    """Blank out comments outside string literals while keeping every newline, so token line numbers stay correct."""
+    def blank(match):
+        return match.group(0) if match.group("string") is not None else re.sub(r"[^\n]", " ", match.group(0))
+    return COMMENT[language].sub(blank, source) if language in COMMENT else source
+
+
+def tokenize(source: str, language: str = "text") -> list:
+    """Return (token, line) pairs, with line numbers starting at 1."""
+    tokens = []
+    if language not in KEYWORDS:
+        for line_number, line in enumerate(source.splitlines(), start=1):
+            tokens.extend((word.lower(), line_number) for word in TEXT_TOKEN.findall(line))
+        return tokens
+
+    keywords = KEYWORDS[language]
+    source = strip_comments(source, language)
+    for line_number, line in enumerate(source.splitlines(), start=1):
+        for match in CODE_TOKEN.finditer(line):
+            kind = match.lastgroup
+            token = match.group(kind)
+            if kind == "string":
+                token = "S"
+            elif kind == "number":
+                token = "N"
+            elif kind == "name":
+                word = token.lower() if language in CASE_INSENSITIVE else token
+                token = word if word in keywords else "V"
+            tokens.append((token, line_number))
+    return tokens
+
+
+def kgram_hash(tokens: list) -> int:
+    # Stable across processes and runs, unlike hash(); 63 bits so it fits a signed 64-bit field.
+    digest = hashlib.blake2b("\x1f".join(tokens).encode("utf-8"), digest_size=8).digest()
+    return int.from_bytes(digest, "big") >> 1
+
+
+def winnow(tokens: list, k: int = K, window: int = WINDOW) -> list:
+    """Select (hash, first_line, last_line) fingerprints from (token, line) pairs."""
+    if not tokens:
+        return []
+    words = [token for token, _ in tokens]
+    lines = [line for _, line in tokens]
+    if len(words) < k:
+        return [(kgram_hash(words), lines[0], lines[-1])]
+    hashes = [kgram_hash(words[i:i + k]) for i in range(len(words) - k + 1)]
+    window = min(window, len(hashes))
+
+    fingerprints = []
+    selected = -1
+    for start in range(len(hashes) - window + 1):
+        span = hashes[start:start + window]
+        smallest = min(span)
+        # The rightmost minimum, so a window sliding over a run of equal hashes keeps one fingerprint.
+        position = start + window - 1 - span[::-1].index(smallest)
+        if position != selected:
+            fingerprints.append((smallest, lines[position], lines[position + k - 1]))
+            selected = position
+    return fingerprints
+
+
+def fingerprint_file(path: str, language: str = "text", k: int = K, window: int = WINDOW) -> list:
+    with open(path, encoding="utf-8", errors="replace") as f:
+        return winnow(tokenize(f.read(), language), k, window)
+
+
+def _fingerprint_job(job):
+    return fingerprint_file(*job)
+
+
+def fingerprint_files(paths: list, language: str = "text", k: int = K, window: int = WINDOW,
+                      workers: int = None) -> list:
+    """Fingerprint every file across a process pool, returning one list of fingerprints per path."""
+    jobs = [(path, language, k, window) for path in paths]
+    if workers == 1 or len(paths) < 2:
+        return [_fingerprint_job(job) for job in jobs]
+    workers = workers or os.cpu_count()
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        return list(pool.map(_fingerprint_job, jobs, chunksize=max(1, len(jobs) // (workers * 4))))
+
+
+def build_index(fingerprints: list, ignore: set = frozenset()) -> dict:
+    """Map each fingerprint hash to the sorted documents containing it."""
+    index = {}
+    for document, prints in enumerate(fingerprints):
+        for fingerprint_hash in {fingerprint[0] for fingerprint in prints} - ignore:
+            index.setdefault(fingerprint_hash, []).append(document)
+    return index
+
+
+def frequent_hashes(fingerprints: list, max_df: float = 0.5) -> set:
+    """Hashes found in more than max_df of the documents: boilerplate rather than evidence of copying."""
+    limit = max(2, int(max_df * len(fingerprints)))
+    return {value for value, documents in build_index(fingerprints).items() if len(documents) > limit}
+
+
+def rank_pairs(fingerprints: list, ignore: set = frozenset(), min_shared: int = 1) -> list:
+    """Rank document pairs by shared fingerprints, not counting hashes in ignore.
+
+    Returns dicts sorted by descending similarity, where percent_a/percent_b is the
+    share of each document's counted fingerprints that are also in the other.
+    """
+    index = build_index(fingerprints, ignore)
+    shared = {}
+    for documents in index.values():
+        if len(documents) < 2:
+            continue
+        for pair in itertools.combinations(documents, 2):
+            shared[pair] = shared.get(pair, 0) + 1
+
+    sizes = [len({fingerprint[0] for fingerprint in prints} - ignore) for prints in fingerprints]
+    pairs = []
+    for (a, b), count in shared.items():
+        if count < min_shared:
+            continue
+        pairs.append({
+            "a": a,
+            "b": b,
+            "shared": count,
+            "percent_a": round(100 * count / sizes[a], 1),
+            "percent_b": round(100 * count / sizes[b], 1),
+        })
+    pairs.sort(key=lambda pair: (max(pair["percent_a"], pair["percent_b"]), pair["shared"]), reverse=True)
+    return pairs
+
+
+def merge_ranges(spans: list) -> list:
+    """Merge (first_line, last_line) spans into sorted, non-overlapping ranges."""
+    merged = []
+    for first, last in sorted(spans):
+        if merged and first <= merged[-1][1] + 1:
+            merged[-1][1] = max(merged[-1][1], last)
+        else:
+            merged.append([first, last])
+    return [tuple(span) for span in merged]
+
+
+def matched_lines(prints_a: list, prints_b: list, ignore: set = frozenset()) -> tuple:
+    """Line ranges of each document covered by fingerprints the two have in common."""
+    common = ({fingerprint[0] for fingerprint in prints_a} & {fingerprint[0] for fingerprint in prints_b}) - ignore
+    ranges_a = merge_ranges([(first, last) for value, first, last in prints_a if value in common])
+    ranges_b = merge_ranges([(first, last) for value, first, last in prints_b if value in common])
+    return ranges_a, ranges_b
+
+
+def format_ranges(ranges: list) -> str:
+    return ",".join(f"{first}-{last}" if first != last else str(first) for first, last in ranges)
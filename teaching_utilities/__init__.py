@@ -0,0 +1 @@
+"""Code shared by the scripts in github/, plagiarism/, drive/ and gradescope-exam/."""
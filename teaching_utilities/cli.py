@@ -0,0 +1,65 @@
+"""teach: the scripts in this repository as subcommands of one command.
+
+The scripts import pandas, openai, PyGithub, GitPython, mosspy and the like in the functions that use them, so
+--help and argument errors return at once; benchmarks/import_budget.py checks that each subcommand stays in budget.
+"""
+
+import os
+import runpy
+import sys
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+# Subcommand: (directory, script, summary).
+COMMANDS = {
+    "end-term": ("github", "end-term.py", "Back up and clean up a GitHub organization at the end of the term"),
+    "check-token": ("github", "check-token.py", "Check GitHub personal access tokens"),
+    "gs-to-moss": ("plagiarism", "gradescope-to-moss.py", "Convert a Gradescope export to MOSS submissions"),
+    "gs-to-chatgpt": ("plagiarism", "gradescope-to-chatgpt.py", "Score a Gradescope export with ChatGPT"),
+    "submit-moss": ("plagiarism", "submit-to-moss.py", "Submit files to MOSS and rank the matched pairs"),
+    "plagiarism-batch": ("plagiarism", "plagiarism-batch.py", "Run gs-to-moss and gs-to-chatgpt on many exports"),
+    "local-similarity": ("plagiarism", "local-similarity.py", "Rank similar submissions offline before MOSS"),
+    "fingerprint-archive": ("plagiarism", "fingerprint-archive.py", "Check submissions against past terms"),
+    "revoke-access": ("drive", "revoke-access.py", "Revoke Google Drive sharing at the end of the term"),
+    "item-analysis": ("gradescope-exam", "item-analysis.py", "Item analysis of a Gradescope exam"),
+}
+
+
+def script_path(command: str) -> str:
+    """The script behind command, in an installed package or in a checkout of the repository."""
+    directory, script, _ = COMMANDS[command]
+    for root in (os.path.join(HERE, directory.replace("-", "_")), os.path.join(HERE, "..", directory)):
+        path = os.path.join(root, script)
+        if os.path.isfile(path):
+            return os.path.abspath(path)
+    raise FileNotFoundError(f"{script} not found next to {HERE}")
+
+
+def usage() -> str:
+    width = max(len(command) for command in COMMANDS)
+    lines = ["usage: teach COMMAND [ARGS ...]", "", "commands:"]
+    lines += [f"  {command:<{width}}  {summary}" for command, (_, _, summary) in COMMANDS.items()]
+    lines += ["", "Run teach COMMAND --help for the options of a command."]
+    return "\n".join(lines)
+
+
+def run(command: str, args: list):
+    """Run command's script with args as its command line, as `python script args` would."""
+    path = script_path(command)
+    sys.argv = [path] + list(args)
+    sys.path.insert(0, os.path.dirname(path))
+    runpy.run_path(path, run_name="__main__")
+
+
+def main(argv: list = None):
+    argv = sys.argv[1:] if argv is None else argv
+    if not argv or argv[0] in ("-h", "--help"):
+        print(usage())
+        return
+    if argv[0] not in COMMANDS:
+        print(f"Error: unknown command '{argv[0]}'\n\n{usage()}", file=sys.stderr)
+        sys.exit(2)
+    run(argv[0], argv[1:])
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,46 @@
+"""Reading config.cfg (github/) and plagiarism.cfg (plagiarism/), shared by the scripts."""
+
+import configparser
+import os
+import sys
+
+GITHUB_CONFIG = "config.cfg"
+PLAGIARISM_CONFIG = "plagiarism.cfg"
+NOT_SPECIFIED = "Not specified"
+
+
+def read_section(config_file: str, section: str):
+    """The section of config_file, or None if the file does not exist. Exits if the file has no such section."""
+    if not os.path.isfile(config_file):
+        return None
+    config = configparser.ConfigParser()
+    config.read(config_file)
+    if section not in config:
+        print(f"Error: section '{section}' not found in {config_file}")
+        sys.exit(1)
+    return config[section]
+
+
+def github_credentials(config_file: str = GITHUB_CONFIG) -> tuple:
+    """(organization, token) from the [github] section."""
+    section = read_section(config_file, "github")
+    if section is None:
+        print(f"Error: configuration file '{config_file}' not found; copy config.cfg.template")
+        sys.exit(1)
+    return section.get("organization", NOT_SPECIFIED), section.get("token", NOT_SPECIFIED)
+
+
+def chatgpt_credentials(config_file: str = PLAGIARISM_CONFIG) -> tuple:
+    """(organization, project) from the [chatgpt] section, or (None, None) without a config file."""
+    section = read_section(config_file, "chatgpt")
+    if section is None:
+        return None, None
+    return section.get("organization", NOT_SPECIFIED), section.get("project", NOT_SPECIFIED)
+
+
+def moss_userid(config_file: str = PLAGIARISM_CONFIG) -> str:
+    """userid from the [moss] section, or None without a config file."""
+    section = read_section(config_file, "moss")
+    if section is None:
+        return None
+    return section.get("userid", NOT_SPECIFIED)
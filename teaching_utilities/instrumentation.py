@@ -0,0 +1,316 @@
+"""Stage timings, API call latencies, retries and rate-limit waits for every script."""
+
+import atexit
+import bisect
+import contextlib
+import json
+import os
+import sys
+import threading
+import time
+
+# Seconds; GitHub and Drive calls take tens of milliseconds, ChatGPT seconds and MOSS minutes.
+BUCKETS = (0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 300.0, 900.0)
+PROGRESS_INTERVAL = 30.0
+REDRAW_INTERVAL = 0.2
+METRIC_PREFIX = "teaching_utilities"
+
+
+def percentile(ordered: list, point: float) -> float:
+    return ordered[min(len(ordered) - 1, int(len(ordered) * point / 100))]
+
+
+def format_duration(seconds: float) -> str:
+    seconds = int(seconds)
+    hours, seconds = divmod(seconds, 3600)
+    minutes, seconds = divmod(seconds, 60)
+    return f"{hours}:{minutes:02d}:{seconds:02d}" if hours else f"{minutes}:{seconds:02d}"
+
+
+class Histogram:
+    def __init__(self):
+        self.counts = [0] * (len(BUCKETS) + 1)
+        self.values = []
+        self.errors = 0
+
+    def observe(self, seconds: float, error: bool = False):
+        self.counts[bisect.bisect_left(BUCKETS, seconds)] += 1
+        self.values.append(seconds)
+        self.errors += error
+
+    def summary(self) -> dict:
+        ordered = sorted(self.values)
+        summary = {"count": len(ordered), "errors": self.errors, "seconds": round(sum(ordered), 3)}
+        if ordered:
+            summary.update({f"p{point}": round(percentile(ordered, point), 4) for point in (50, 95, 99)},
+                           max=round(ordered[-1], 4))
+        summary["buckets"] = {str(bound): count for bound, count in zip(BUCKETS + ("+Inf",), self.cumulative())}
+        return summary
+
+    def cumulative(self) -> list:
+        total, counts = 0, []
+        for count in self.counts:
+            total += count
+            counts.append(total)
+        return counts
+
+
+class Stage:
+    """Wall time and items done for one stage, with its progress line."""
+
+    def __init__(self, recorder, name: str, total: int = None):
+        self.recorder = recorder
+        self.name = name
+        self.total = total
+        self.done = 0
+        self.failed = 0
+        self.started = time.perf_counter()
+        self.seconds = None
+        # The first line is drawn an interval after the start, not on the first advance().
+        self.drawn = self.started
+        self.printed = None  # The count on the last line printed to a log rather than a terminal.
+
+    def advance(self, count: int = 1, failed: bool = False):
+        with self.recorder.lock:
+            self.done += count
+            self.failed += count if failed else 0
+        self.recorder.progress(self)
+
+    def elapsed(self) -> float:
+        return self.seconds if self.seconds is not None else time.perf_counter() - self.started
+
+    def status(self) -> str:
+        elapsed = self.elapsed()
+        if self.total is None and not self.done:
+            return f"{self.name}: {format_duration(elapsed)} elapsed"
+        rate = self.done / elapsed if elapsed else 0
+        done = f"{self.done}/{self.total}" if self.total is not None else str(self.done)
+        line = f"{self.name}: {done}"
+        if self.total:
+            line += f" ({100 * self.done / self.total:.0f}%)"
+        line += f", {rate:.1f}/s, {format_duration(elapsed)} elapsed"
+        if self.total and rate and self.seconds is None:
+            line += f", ETA {format_duration((self.total - self.done) / rate)}"
+        if self.failed:
+            line += f", {self.failed} failed"
+        return line
+
+    def summary(self) -> dict:
+        elapsed = self.elapsed()
+        return {"seconds": round(elapsed, 3), "items": self.done, "failed": self.failed, "total": self.total,
+                "per_second": round(self.done / elapsed, 3) if elapsed else None}
+
+
+class Recorder:
+    def __init__(self, stream=None):
+        self.lock = threading.RLock()
+        self.stream = stream or sys.stderr
+        self.show_progress = True
+        self.line = ""
+        self.reset()
+
+    def reset(self):
+        """Forget everything recorded so far, e.g. between the jobs of a long-lived worker process."""
+        with self.lock:
+            self.started = time.time()
+            self.clock = time.perf_counter()
+            self.stages = {}
+            self.calls = {}
+            self.retries = {}
+            self.waits = {}
+
+    @contextlib.contextmanager
+    def stage(self, name: str, total: int = None):
+        """Time a stage of the script; advance() the Stage it yields once per item."""
+        stage = Stage(self, name, total)
+        with self.lock:
+            # A stage that runs more than once (one per assignment, say) keeps a single entry.
+            previous = self.stages.get(name)
+            if previous is not None:
+                stage.started -= previous.elapsed()
+                stage.done, stage.failed = previous.done, previous.failed
+                stage.total = None if total is None or previous.total is None else previous.total + total
+            self.stages[name] = stage
+        try:
+            yield stage
+        finally:
+            stage.seconds = time.perf_counter() - stage.started
+            self.progress(stage, final=True)
+
+    @contextlib.contextmanager
+    def call(self, service: str, operation: str):
+        """Time one request to service; an exception counts as an error and is re-raised."""
+        start = time.perf_counter()
+        error = False
+        try:
+            yield
+        except BaseException:
+            error = True
+            raise
+        finally:
+            self.observe(service, operation, time.perf_counter() - start, error)
+
+    def observe(self, service: str, operation: str, seconds: float, error: bool = False):
+        with self.lock:
+            self.calls.setdefault((service, operation), Histogram()).observe(seconds, error)
+
+    def retry(self, service: str, reason: str = "rate limited"):
+        with self.lock:
+            self.retries[(service, reason)] = self.retries.get((service, reason), 0) + 1
+
+    def wait(self, service: str, seconds: float, reason: str = "rate limited"):
+        """Record a pause that was taken some other way, e.g. asyncio.sleep."""
+        with self.lock:
+            count, total = self.waits.get((service, reason), (0, 0.0))
+            self.waits[(service, reason)] = (count + 1, total + max(0.0, seconds))
+
+    def sleep(self, service: str, seconds: float, reason: str = "rate limited"):
+        if seconds > 0:
+            self.wait(service, seconds, reason)
+            time.sleep(seconds)
+
+    def echo(self, message: str):
+        """Print a line to stdout without garbling the progress line."""
+        with self.lock:
+            self._clear()
+            print(message, flush=True)
+            self._draw()
+
+    def progress(self, stage: Stage, final: bool = False):
+        if not self.show_progress:
+            return
+        now = time.perf_counter()
+        interactive = self.stream.isatty()
+        if not final and now - stage.drawn < (REDRAW_INTERVAL if interactive else PROGRESS_INTERVAL):
+            return
+        with self.lock:
+            stage.drawn = now
+            if interactive and not final:
+                self._clear()
+                self.line = stage.status()
+                self._draw()
+            else:
+                self._clear()
+                self.line = ""
+                # A stage with nothing to count only reports its time when it ends, and a log that
+                # already has a stage's last count does not get it again when the stage ends.
+                if final and not interactive and stage.printed == stage.done:
+                    return
+                if stage.done or stage.total or final:
+                    print(stage.status(), file=self.stream, flush=True)
+                    stage.printed = stage.done
+
+    def _clear(self):
+        if self.line and self.stream.isatty():
+            self.stream.write("\r" + " " * len(self.line) + "\r")
+            self.stream.flush()
+
+    def _draw(self):
+        if self.line and self.stream.isatty():
+            self.stream.write(self.line)
+            self.stream.flush()
+
+    def report(self) -> dict:
+        with self.lock:
+            calls = {}
+            for (service, operation), histogram in sorted(self.calls.items()):
+                calls.setdefault(service, {})[operation] = histogram.summary()
+            waits = {}
+            for (service, reason), (count, seconds) in sorted(self.waits.items()):
+                waits.setdefault(service, {})[reason] = {"count": count, "seconds": round(seconds, 3)}
+            retries = {}
+            for (service, reason), count in sorted(self.retries.items()):
+                retries.setdefault(service, {})[reason] = count
+            return {
+                "script": os.path.basename(sys.argv[0]) if sys.argv and sys.argv[0] else None,
+                "started": time.strftime("%Y-%m-%dT%H:%M:%S%z", time.localtime(self.started)),
+                "seconds": round(time.perf_counter() - self.clock, 3),
+                "stages": {name: stage.summary() for name, stage in self.stages.items()},
+                "calls": calls,
+                "retries": retries,
+                "waits": waits,
+            }
+
+    def prometheus(self) -> str:
+        """The report in the Prometheus text exposition format."""
+        report = self.report()
+        lines = []
+
+        def metric(name: str, kind: str, help_text: str):
+            lines.extend([f"# HELP {METRIC_PREFIX}_{name} {help_text}", f"# TYPE {METRIC_PREFIX}_{name} {kind}"])
+
+        def sample(name: str, value, **labels):
+            text = ",".join(f"{key}={json.dumps(str(label))}" for key, label in [("script", report["script"] or "")]
+                            + list(labels.items()))
+            lines.append(f"{METRIC_PREFIX}_{name}{{{text}}} {value}")
+
+        metric("run_seconds", "gauge", "Wall time of the whole run.")
+        sample("run_seconds", report["seconds"])
+        metric("last_run_timestamp_seconds", "gauge", "When the run started.")
+        sample("last_run_timestamp_seconds", int(self.started))
+        metric("stage_seconds", "gauge", "Wall time of each stage.")
+        for name, stage in report["stages"].items():
+            sample("stage_seconds", stage["seconds"], stage=name)
+        metric("stage_items", "gauge", "Items each stage finished.")
+        for name, stage in report["stages"].items():
+            sample("stage_items", stage["items"], stage=name)
+        metric("stage_failed_items", "gauge", "Items each stage failed.")
+        for name, stage in report["stages"].items():
+            sample("stage_failed_items", stage["failed"], stage=name)
+        metric("call_duration_seconds", "histogram", "Latency of each API call.")
+        for service, operations in report["calls"].items():
+            for operation, summary in operations.items():
+                for bound, count in summary["buckets"].items():
+                    sample("call_duration_seconds_bucket", count, service=service, operation=operation, le=bound)
+                sample("call_duration_seconds_sum", summary["seconds"], service=service, operation=operation)
+                sample("call_duration_seconds_count", summary["count"], service=service, operation=operation)
+        metric("call_errors", "counter", "API calls that raised an error.")
+        for service, operations in report["calls"].items():
+            for operation, summary in operations.items():
+                sample("call_errors", summary["errors"], service=service, operation=operation)
+        metric("retries", "counter", "Requests retried.")
+        for service, reasons in report["retries"].items():
+            for reason, count in reasons.items():
+                sample("retries", count, service=service, reason=reason)
+        metric("wait_seconds", "counter", "Time spent waiting out rate limits and backoffs.")
+        for service, reasons in report["waits"].items():
+            for reason, wait in reasons.items():
+                sample("wait_seconds", wait["seconds"], service=service, reason=reason)
+        return "\n".join(lines) + "\n"
+
+    def write(self, metrics: str = None, prometheus: str = None):
+        if metrics:
+            with open(metrics, "w") as f:
+                json.dump(self.report(), f, indent=2)
+        if prometheus:
+            # node_exporter may read the file at any moment, so it is replaced in one step.
+            temporary = prometheus + ".tmp"
+            with open(temporary, "w") as f:
+                f.write(self.prometheus())
+            os.replace(temporary, prometheus)
+
+
+recorder = Recorder()
+stage = recorder.stage
+call = recorder.call
+observe = recorder.observe
+retry = recorder.retry
+wait = recorder.wait
+sleep = recorder.sleep
+echo = recorder.echo
+
+
+def add_arguments(parser):
+    parser.add_argument("--metrics", type=str, metavar="FILE",
+                        help="Write stage timings, API call latencies, retries and rate-limit waits to this JSON file")
+    parser.add_argument("--prometheus", type=str, metavar="FILE",
+                        help="Also write them as a Prometheus textfile, e.g. for node_exporter's textfile collector")
+    parser.add_argument("--no-progress", action="store_true", help="Do not show progress lines on stderr")
+
+
+def configure(args):
+    """Apply the options from add_arguments() and write the reports when the script exits."""
+    recorder.show_progress = not getattr(args, "no_progress", False)
+    metrics, prometheus = getattr(args, "metrics", None), getattr(args, "prometheus", None)
+    if metrics or prometheus:
+        atexit.register(recorder.write, metrics, prometheus)
@@ -0,0 +1,20 @@
+"""Put the repository, the script directories and benchmarks/ on sys.path, as the scripts expect when run."""
+
+import importlib.util
+import os
+import sys
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+FIXTURES = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures")
+
+for directory in ("", "github", "plagiarism", "drive", "gradescope-exam", "benchmarks"):
+    sys.path.insert(0, os.path.abspath(os.path.join(ROOT, directory)))
+
+
+def load_script(path: str):
+    """A hyphenated script, such as github/end-term.py, loaded as a module without running its __main__ block."""
+    name = os.path.splitext(os.path.basename(path))[0].replace("-", "_")
+    spec = importlib.util.spec_from_file_location(name, os.path.join(ROOT, path))
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
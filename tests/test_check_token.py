@@ -0,0 +1,95 @@
+import csv
+import io
+import json
+import sys
+import time
+
+import pytest
+
+from conftest import load_script
+from fake_service import FakeService, Handler, serve
+
+check_token = load_script("github/check-token.py")
+
+RESET = 1767225600  # 2026-01-01T00:00:00Z
+# token -> (status, body, extra headers, seconds to wait before answering)
+TOKENS = {
+    "ghp_slowvalidtoken0001": (200, {"login": "alice"}, {"X-OAuth-Scopes": "repo, admin:org",
+                                                          "GitHub-Authentication-Token-Expiration":
+                                                              "2026-06-30 00:00:00 UTC"}, 0.2),
+    "github_pat_finegrained0002": (200, {"login": "bob"}, {}, 0.0),
+    "ghp_revokedtoken0003": (401, {"message": "Bad credentials"}, {}, 0.0),
+    "gho_exhaustedtoken0004": (403, {"message": "API rate limit exceeded"}, {"X-RateLimit-Remaining": "0"}, 0.0),
+}
+
+
+class UserHandler(Handler):
+    def handle_request(self):
+        token = self.headers.get("Authorization", "").removeprefix("token ")
+        status, body, headers, wait = TOKENS.get(token, (401, {"message": "Bad credentials"}, {}, 0.0))
+        time.sleep(wait)
+        self.reply(status, body, dict({"X-RateLimit-Limit": "5000", "X-RateLimit-Remaining": "4999",
+                                       "X-RateLimit-Reset": str(RESET)}, **headers))
+
+
+@pytest.fixture
+def api_url() -> str:
+    server = serve(FakeService(), UserHandler)
+    return f"http://127.0.0.1:{server.server_port}"
+
+
+@pytest.fixture
+def token_file(tmp_path) -> str:
+    path = tmp_path / "tokens.txt"
+    path.write_text("# label token\n" + "\n".join(f"ta {i}, {token}" for i, token in enumerate(TOKENS)) + "\n\n")
+    return str(path)
+
+
+def run(monkeypatch, *arguments) -> int:
+    """check-token.py's exit status for arguments."""
+    monkeypatch.setattr(sys, "argv", ["check-token.py", *arguments, "--no-progress"])
+    try:
+        check_token.main()
+    except SystemExit as e:
+        return e.code
+    return 0
+
+
+def test_check_tokens(api_url):
+    results = check_token.check_tokens([(f"ta {i}", token) for i, token in enumerate(TOKENS)], api_url, workers=4)
+    # In the order given, although the first answer arrives last.
+    assert [result["label"] for result in results] == ["ta 0", "ta 1", "ta 2", "ta 3"]
+    alice, bob, revoked, exhausted = results
+    assert alice["valid"] and alice["login"] == "alice" and alice["token_type"] == "classic"
+    assert alice["scopes"] == "repo, admin:org" and alice["expires"] == "2026-06-30 00:00:00 UTC"
+    assert alice["rate_limit"] == 5000 and alice["rate_reset"] == "2026-01-01T00:00:00+00:00"
+    assert alice["token"] == "ghp_...0001"
+    assert bob["valid"] and bob["token_type"] == "fine-grained" and bob["scopes"] == ""
+    assert not revoked["valid"] and revoked["status"] == 401 and revoked["error"] == "Bad credentials"
+    assert not exhausted["valid"] and exhausted["status"] == 403 and exhausted["rate_remaining"] == 0
+    assert exhausted["error"] == "API rate limit exceeded" and exhausted["token_type"] == "oauth"
+
+
+def test_bulk_json(api_url, token_file, monkeypatch, capsys):
+    assert run(monkeypatch, "--bulk", token_file, "--api-url", api_url) == 1
+    captured = capsys.readouterr()
+    results = json.loads(captured.out)
+    assert [(result["label"], result["valid"]) for result in results] == [
+        ("ta 0", True), ("ta 1", True), ("ta 2", False), ("ta 3", False)]
+    assert "2 of 4 tokens valid." in captured.err
+    # Whole tokens are never written out.
+    assert not any(token in captured.out for token in TOKENS)
+
+
+def test_bulk_csv_from_stdin(api_url, token_file, tmp_path, monkeypatch):
+    with open(token_file) as f:
+        lines = f.readlines()
+    monkeypatch.setattr(sys, "stdin", io.StringIO("".join(lines[:3])))
+    output = str(tmp_path / "tokens.csv")
+    # Only the two valid tokens, so the exit status is 0.
+    assert run(monkeypatch, "--bulk", "-", "--format", "csv", "--output", output, "--api-url", api_url) == 0
+    with open(output, newline="") as f:
+        rows = list(csv.DictReader(f))
+    assert list(rows[0]) == check_token.BULK_FIELDS
+    assert [(row["label"], row["login"], row["valid"]) for row in rows] == [("ta 0", "alice", "True"),
+                                                                            ("ta 1", "bob", "True")]
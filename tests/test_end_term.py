@@ -0,0 +1,42 @@
+import shutil
+
+from conftest import load_script
+from fake_github import FakeGitHub, GitHubHandler
+from fake_service import serve
+
+end_term = load_script("github/end-term.py")
+
+
+def test_repository_whose_backup_failed_is_not_deleted(tmp_path, monkeypatch, capsys):
+    monkeypatch.chdir(tmp_path)
+    service = FakeGitHub(repos=4, members=4, owners=1, teams=0, collaborators=0, git_dir=str(tmp_path / "remote"),
+                         read_only=0)
+    server = serve(service, GitHubHandler)
+    limiter = end_term.ratelimit.RateLimiter(
+        end_term.ratelimit.connect("token", f"http://127.0.0.1:{server.server_port}"), interval=0.0)
+    inventory = end_term.org_inventory.collect_inventory(limiter, "course")
+    broken = inventory["repos"][0]["name"]
+    shutil.rmtree(tmp_path / "remote" / f"{broken}.git")
+
+    failed = end_term.clone_org_repos("course", "token", str(tmp_path / "repos"), limiter=limiter, inventory=inventory)
+    assert failed == [broken]
+    end_term.delete_org_repos("course", "token", ignore_owner_check=True, limiter=limiter, inventory=inventory,
+                              backup_failed=failed)
+    assert list(service.repos) == [broken]
+    assert f"Skipping {broken} - backup failed" in capsys.readouterr().out
+
+
+def test_dedupe_groups_repositories_by_inventory_logins(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    service = FakeGitHub(repos=10, members=10, owners=1, teams=0, collaborators=1, git_dir=str(tmp_path / "remote"),
+                         read_only=0)
+    server = serve(service, GitHubHandler)
+    limiter = end_term.ratelimit.RateLimiter(
+        end_term.ratelimit.connect("token", f"http://127.0.0.1:{server.server_port}"), interval=0.0)
+    inventory = end_term.org_inventory.collect_inventory(limiter, "course")
+    failed = end_term.clone_org_repos("course", "token", str(tmp_path / "repos"), dedupe=True, limiter=limiter,
+                                      inventory=inventory)
+    assert failed == []
+    # hw1-student0 and hw1-student5 up to hw5-student4 and hw5-student9: five assignments of two repositories.
+    assert sorted(path.name for path in (tmp_path / "repos" / end_term.repo_backup.OBJECT_STORE).iterdir()) == [
+        f"hw{i}.git" for i in range(1, 6)]
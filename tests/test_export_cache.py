@@ -0,0 +1,111 @@
+import json
+import os
+
+import pyarrow as pa
+import pytest
+
+import evaluations
+from teaching_utilities.export_cache import MANIFEST, ExportCache, default_cache_dir
+
+KIND = "test-1"
+
+
+class Builder:
+    """Parses a source into a one-row table, counting how often it is called."""
+
+    def __init__(self):
+        self.calls = 0
+
+    def __call__(self, source: str) -> pa.Table:
+        self.calls += 1
+        with open(source) as f:
+            return pa.table({"text": [f.read()]})
+
+
+@pytest.fixture
+def cached(tmp_path):
+    """A source file with a saved cache entry, and a function that reopens the cache and reads it through build."""
+    source = tmp_path / "export.csv"
+    source.write_text("first version")
+    build = Builder()
+    with ExportCache(default_cache_dir(str(source))) as cache:
+        cache.table(str(source), KIND, build)
+
+    def read(kind: str = KIND) -> str:
+        with ExportCache(default_cache_dir(str(source))) as cache:
+            return cache.table(str(source), kind, build).column("text")[0].as_py()
+
+    return source, build, read
+
+
+def rewrite(source, text: str):
+    """Write text to source with a later mtime, which a fast same-size edit might not get from the filesystem."""
+    mtime = os.stat(source).st_mtime_ns
+    source.write_text(text)
+    os.utime(source, ns=(mtime + 10 ** 9, mtime + 10 ** 9))
+
+
+def edit_manifest(source, **changes):
+    path = os.path.join(default_cache_dir(str(source)), MANIFEST)
+    with open(path) as f:
+        manifest = json.load(f)
+    manifest[os.path.abspath(source)].update(changes)
+    with open(path, "w") as f:
+        json.dump(manifest, f)
+
+
+def test_unchanged_source_is_read_from_the_cache(cached):
+    source, build, read = cached
+    assert read() == "first version" and build.calls == 1
+    assert default_cache_dir(str(source)) == default_cache_dir(str(source.parent))
+
+
+def test_changed_size_rebuilds(cached):
+    source, build, read = cached
+    edit_manifest(source, size=1)
+    assert read() == "first version" and build.calls == 2
+    source.write_text("a longer second version")
+    assert read() == "a longer second version" and build.calls == 3
+
+
+def test_changed_mtime_and_sha256_rebuild(cached):
+    source, build, read = cached
+    # Same size and contents, but the manifest no longer matches either: the source is hashed and rebuilt.
+    edit_manifest(source, mtime_ns=1, sha256="0" * 64)
+    assert read() == "first version" and build.calls == 2
+    # An edit that keeps the size changes the mtime and the hash.
+    rewrite(source, "first VERSION")
+    assert read() == "first VERSION" and build.calls == 3
+
+
+def test_touched_source_is_hashed_and_kept(cached):
+    source, build, read = cached
+    # Only the mtime differs (re-unzipped, touched): the contents hash the same, so the table is kept.
+    edit_manifest(source, mtime_ns=1)
+    assert read() == "first version" and build.calls == 1
+    with open(os.path.join(default_cache_dir(str(source)), MANIFEST)) as f:
+        assert json.load(f)[os.path.abspath(source)]["mtime_ns"] == os.stat(source).st_mtime_ns
+
+
+def test_changed_kind_or_missing_table_rebuilds(cached):
+    source, build, read = cached
+    assert read("test-2") == "first version" and build.calls == 2
+    for name in os.listdir(default_cache_dir(str(source))):
+        if name.endswith(".arrow"):
+            os.remove(os.path.join(default_cache_dir(str(source)), name))
+    assert read("test-2") == "first version" and build.calls == 3
+
+
+def test_evaluations_reparse_only_changed_items(tmp_path):
+    for item in range(3):
+        (tmp_path / f"{item + 1} Item.csv").write_text(
+            "A,Submission ID,Q,First,Last,SID,Email,Sections,Score,Time,Correct,Adj,Comments,Grader,Tags\n"
+            f"1,10,1,Ada,Lovelace,1,ada@example.edu,,{item},,true,,,,\n")
+    with ExportCache(default_cache_dir(str(tmp_path))) as cache:
+        first = evaluations.load_exam(str(tmp_path), workers=1, cache=cache)
+    assert cache.misses == 3
+    rewrite(tmp_path / "2 Item.csv", (tmp_path / "2 Item.csv").read_text().replace(",1,,true", ",5,,true"))
+    with ExportCache(default_cache_dir(str(tmp_path))) as cache:
+        second = evaluations.load_exam(str(tmp_path), workers=1, cache=cache)
+    assert (cache.misses, cache.hits) == (1, 2)
+    assert list(first.scores[0]) == [0, 1, 2] and list(second.scores[0]) == [0, 5, 2]
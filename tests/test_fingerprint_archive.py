@@ -0,0 +1,74 @@
+import os
+
+import pytest
+
+from fingerprint_archive import FingerprintArchive, Segment, collect_documents, write_segment
+
+FALL = [("alice.txt", {1, 2, 3, 4}), ("bob.txt", {3, 4, 5, 6})]
+SPRING = [("carol.txt", {5, 6, 7, 8}), ("dave.txt", {100})]
+
+
+def test_segment_round_trip(tmp_path):
+    path = str(tmp_path / "segment.idx")
+    write_segment(path, [(1, 0), (1, 2), (7, 1), (2 ** 63 - 1, 3)])
+    segment = Segment(path)
+    try:
+        assert list(segment.lookup(1)) == [0, 2]
+        assert list(segment.lookup(7)) == [1]
+        assert list(segment.lookup(2 ** 63 - 1)) == [3]
+        assert list(segment.lookup(5)) == []
+    finally:
+        segment.close()
+
+
+def test_two_ingests_round_trip(tmp_path):
+    archive_dir = str(tmp_path / "archive")
+    with FingerprintArchive(archive_dir) as archive:
+        assert archive.ingest("fall", str(tmp_path / "fall"), FALL) == 0
+    with FingerprintArchive(archive_dir) as archive:
+        assert archive.ingest("spring", str(tmp_path / "spring"), SPRING) == 1
+
+    # A new instance reads both segments back from disk, with IDs continuing across them.
+    with FingerprintArchive(archive_dir) as archive:
+        assert [(document["id"], document["term"], document["name"]) for document in archive.documents] == [
+            (0, "fall", "alice.txt"), (1, "fall", "bob.txt"), (2, "spring", "carol.txt"), (3, "spring", "dave.txt")]
+        assert [segment["postings"] for segment in archive.segments] == [8, 5]
+        matches = archive.query({3, 4, 5, 6, 7})
+        assert [(match["name"], match["shared"]) for match in matches] == [
+            ("bob.txt", 4), ("carol.txt", 3), ("alice.txt", 2)]
+        assert matches[0]["percent_submission"] == 80.0 and matches[0]["percent_archived"] == 100.0
+        assert [match["name"] for match in archive.query({3, 4, 5, 6, 7}, exclude_terms={"fall"})] == ["carol.txt"]
+        assert [match["name"] for match in archive.query({3, 4, 5, 6, 7}, top=1)] == ["bob.txt"]
+        # Hash 3 and 4 are in two fall documents, more than max_postings allows.
+        assert [(match["name"], match["shared"]) for match in archive.query({3, 4, 5}, max_postings=1)] == [
+            ("bob.txt", 1), ("carol.txt", 1)]
+
+
+def test_reingest_does_not_duplicate_postings(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    os.makedirs("fall")
+    with FingerprintArchive("archive") as archive:
+        archive.ingest("fall", "fall", FALL)
+    with FingerprintArchive("archive") as archive:
+        # The same export, named by an absolute path this time.
+        with pytest.raises(ValueError, match="already ingested for fall"):
+            archive.ingest("fall", str(tmp_path / "fall"), FALL)
+        assert len(archive.documents) == 2 and len(archive.segments) == 1
+        assert [match["shared"] for match in archive.query({1, 2, 3, 4})] == [4, 2]
+    with FingerprintArchive("archive") as archive:
+        assert len(archive.documents) == 2 and len(archive.segments) == 1
+    assert sorted(os.listdir("archive")) == ["documents.jsonl", "segment-00000.idx", "segments.jsonl"]
+
+
+def test_collect_documents(tmp_path):
+    (tmp_path / "alice.txt").write_text("the quick brown fox jumps over the lazy dog again and again")
+    (tmp_path / "empty.txt").write_text("")
+    (tmp_path / "notes.csv").write_text("not a submission")
+    repo = tmp_path / "hw1-bob"
+    repo.mkdir()
+    (repo / "main.py").write_text("def f(x):\n    return x + 1\n\nprint(f(2))\n")
+    (repo / "data.bin").write_text("ignored")
+    documents = collect_documents(str(tmp_path), workers=1)
+    # Empty documents are left out; repositories are fingerprinted by file extension.
+    assert [name for name, _ in documents] == ["alice.txt", "hw1-bob"]
+    assert all(hashes for _, hashes in documents)
@@ -0,0 +1,182 @@
+import asyncio
+import multiprocessing
+import os
+import subprocess
+import sys
+import time
+from types import SimpleNamespace
+
+import pandas as pd
+import pytest
+from openai import RateLimitError
+
+from conftest import ROOT, load_script
+from fake_openai import FakeOpenAI, OpenAIHandler, probability
+from fake_service import serve
+from gradescope_metadata import STUDENT_DATA
+from verdict_cache import VerdictCache, cache_key
+
+chatgpt = load_script("plagiarism/gradescope-to-chatgpt.py")
+
+CELLS = [f"Answer {i}: the loop runs in O(n) time because each element is visited once." for i in range(20)]
+
+
+def expected(cell: str) -> str:
+    # What fake_openai.py answers for the plain prompt of cell.
+    return f"Reads like a student answer.\nProbability: {probability(chatgpt.build_messages(cell)[-1]['content'])}"
+
+
+def base_url(service: FakeOpenAI) -> str:
+    return f"http://127.0.0.1:{serve(service, OpenAIHandler).server_port}/v1"
+
+
+def test_parse_duration():
+    assert chatgpt.parse_duration("20ms") == pytest.approx(0.02)
+    assert chatgpt.parse_duration("1.5s") == 1.5
+    assert chatgpt.parse_duration("6m0s") == 360
+    assert chatgpt.parse_duration("2") == 2
+    assert chatgpt.parse_duration("soon") is None
+    assert chatgpt.parse_duration(None) is None
+
+
+def test_retry_delay():
+    assert chatgpt.retry_delay({"retry-after-ms": "250", "retry-after": "9"}, 0) == 0.25
+    assert chatgpt.retry_delay({"retry-after": "3"}, 0) == 3
+    # The longer of the reset times, so that both limits have recovered.
+    assert chatgpt.retry_delay({"x-ratelimit-reset-requests": "0m45s", "x-ratelimit-reset-tokens": "6ms"}, 0) == 45
+    assert chatgpt.retry_delay({"x-ratelimit-reset-tokens": "2h"}, 0) == chatgpt.MAX_BACKOFF
+    for attempt in range(3):
+        backoff = chatgpt.BASE_BACKOFF * 2 ** attempt
+        assert backoff / 2 <= chatgpt.retry_delay({}, attempt) <= backoff
+
+
+@pytest.mark.parametrize("headers", [{"retry-after-ms": "150"}, {"retry-after": "0.15"},
+                                     {"x-ratelimit-reset-requests": "150ms", "x-ratelimit-reset-tokens": "20ms"}])
+def test_rate_limited_requests_wait_and_retry(headers, capsys):
+    service = FakeOpenAI(latency=0, rate_limit_every=4, rate_limit_headers=headers)
+    start = time.monotonic()
+    with chatgpt.chatgpt_scorer(None, "test", concurrency=4, base_url=base_url(service)) as score:
+        narratives = [narrative for narrative, _ in score(CELLS[:8])]
+    assert narratives == [expected(cell) for cell in CELLS[:8]]
+    limited = service.stats["rate_limited"]
+    assert limited >= 2
+    assert time.monotonic() - start >= 0.15
+    assert f"Retried {limited} rate limited requests" in capsys.readouterr().out
+
+
+def test_insufficient_quota_not_retried():
+    service = FakeOpenAI(latency=0, insufficient_quota=True)
+    with pytest.raises(RateLimitError) as error:
+        with chatgpt.chatgpt_scorer(None, "test", concurrency=2, base_url=base_url(service)) as score:
+            score(CELLS[:1])
+    assert error.value.code == "insufficient_quota"
+    assert service.stats["insufficient_quota"] == 1
+
+
+def test_concurrent_results_in_order():
+    # Random latencies make the responses arrive out of order.
+    service = FakeOpenAI(latency=0, jitter=0.05)
+    with chatgpt.chatgpt_scorer(None, "test", concurrency=8, base_url=base_url(service)) as score:
+        narratives = [narrative for narrative, _ in score(CELLS)]
+    assert narratives == [expected(cell) for cell in CELLS]
+    assert 1 < service.stats["max_in_flight"] <= 8
+
+
+def test_cancelled_wait_for_budget_takes_nothing():
+    budget = multiprocessing.get_context().BoundedSemaphore(1)
+    limiter = chatgpt.RateLimiter(2, budget)
+
+    async def request():
+        async with limiter.slot():
+            await asyncio.sleep(1)
+
+    async def cancel_waiting():
+        budget.acquire()  # Another process holds the whole budget.
+        task = asyncio.create_task(request())
+        await asyncio.sleep(0.1)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+        budget.release()
+        await asyncio.sleep(0.1)
+
+    asyncio.run(cancel_waiting())
+    # The cancelled request must not have taken the slot once it was free.
+    assert budget.acquire(block=False)
+
+
+class BatchClient:
+    """Records the batch files uploaded; enough of OpenAI's client for batch_submit."""
+
+    def __init__(self):
+        self.uploaded = []
+        self.files = self.batches = self
+
+    def create(self, **kwargs):
+        if "file" in kwargs:
+            self.uploaded.append(kwargs["file"].read().decode("utf-8").splitlines())
+        return SimpleNamespace(id=f"id-{len(self.uploaded)}", status="validating")
+
+
+def test_batch_submit_counts_cached_cells(tmp_path, capsys):
+    answers = ["same answer", "same answer", "cached answer", "new answer"]
+    submissions = pd.DataFrame({**{column: ["", ""] for column in STUDENT_DATA}, "Submission ID": ["1", "2"],
+                                **{f"{i}: Item": [answers[i % 4], answers[(i + 2) % 4]] for i in range(1, 9)}})
+    cells = [cell for _, cell in chatgpt.batch_cells(submissions)]
+    with VerdictCache(":memory:") as cache:
+        cache.put_many(chatgpt.MODEL, {cache_key(chatgpt.MODEL, chatgpt.SYSTEM_PROMPT, "same answer"): ("x", 0.1),
+                                       cache_key(chatgpt.MODEL, chatgpt.SYSTEM_PROMPT, "cached answer"): ("y", 0.2)})
+        client = BatchClient()
+        chatgpt.batch_submit(client, submissions, str(tmp_path / "out.csv"), cache)
+    cached = sum(cell in ("same answer", "cached answer") for cell in cells)
+    assert f"{len(cells)} cells, {cached} cached, 1 distinct responses to submit" in capsys.readouterr().out
+    assert len(client.uploaded) == 1 and len(client.uploaded[0]) == 1
+
+
+@pytest.mark.parametrize("options, error", [
+    (["--batch", "submit", "--concurrency", "4"], "Error: --batch submit does not take --concurrency"),
+    (["--batch", "merge", "--pack-tokens", "800", "--dedupe", "0.8"],
+     "Error: --batch merge does not take --pack-tokens, --dedupe"),
+    (["--batch", "submit", "--wait"], "Error: --wait only applies to --batch poll"),
+])
+def test_batch_rejects_options_it_ignores(tmp_path, options, error):
+    process = subprocess.run([sys.executable, os.path.join(ROOT, "plagiarism", "gradescope-to-chatgpt.py"),
+                              str(tmp_path), str(tmp_path / "out.csv"), *options],
+                             cwd=tmp_path, capture_output=True, text=True)
+    assert process.returncode == 1
+    assert process.stdout.strip() == error
+
+
+@pytest.mark.parametrize("options, error", [
+    (["--pack-tokens", "-1"], "Error: --pack-tokens must be 0 or at least 9, enough for one response"),
+    (["--pack-tokens", "8"], "Error: --pack-tokens must be 0 or at least 9, enough for one response"),
+    (["--dedupe", "1.5"], "Error: --dedupe must be 0 (off) or a similarity above 0 and at most 1"),
+    (["--dedupe", "-0.2"], "Error: --dedupe must be 0 (off) or a similarity above 0 and at most 1"),
+])
+@pytest.mark.parametrize("script", ["gradescope-to-chatgpt.py", "plagiarism-batch.py"])
+def test_pack_tokens_and_dedupe_are_checked(tmp_path, script, options, error):
+    process = subprocess.run([sys.executable, os.path.join(ROOT, "plagiarism", script),
+                              str(tmp_path), str(tmp_path / "out"), *options],
+                             cwd=tmp_path, capture_output=True, text=True)
+    assert process.returncode == 1
+    assert process.stdout.strip() == error
+
+
+def test_packed_verdicts_cached_under_the_prompt_sent():
+    service = FakeOpenAI(latency=0)
+    with VerdictCache(":memory:") as cache:
+        with chatgpt.chatgpt_scorer(None, "test", concurrency=2, base_url=base_url(service), pack_tokens=2000) as score:
+            # A pack of one is sent with the plain prompt, and cached under it.
+            narratives, sent = chatgpt.score_with_cache(CELLS[:1], score, cache, chatgpt.PACK_SYSTEM_PROMPT)
+            assert narratives == [expected(CELLS[0])] and sent == 1
+            assert cache.get_many([cache_key(chatgpt.MODEL, chatgpt.PACK_SYSTEM_PROMPT, CELLS[0])]) == {}
+            assert cache.get_many([cache_key(chatgpt.MODEL, chatgpt.SYSTEM_PROMPT, CELLS[0])])
+            # Packed again, the plain verdict is reused and the rest go out in one pack, cached under the pack prompt.
+            narratives, sent = chatgpt.score_with_cache(CELLS[:4], score, cache, chatgpt.PACK_SYSTEM_PROMPT)
+        assert narratives[0] == expected(CELLS[0]) and sent == 3
+        assert service.stats["requests"] == 2
+        packed = [cache_key(chatgpt.MODEL, chatgpt.PACK_SYSTEM_PROMPT, cell) for cell in CELLS[1:4]]
+        assert len(cache.get_many(packed)) == 3
+        # The plain prompt does not take verdicts from the pack prompt.
+        assert chatgpt.score_with_cache(CELLS[1:2], lambda cells: [("plain", chatgpt.SYSTEM_PROMPT)] * len(cells),
+                                        cache) == (["plain"], 1)
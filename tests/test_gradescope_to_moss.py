@@ -0,0 +1,21 @@
+import pandas as pd
+
+from conftest import load_script
+
+moss = load_script("plagiarism/gradescope-to-moss.py")
+
+SUBMISSIONS = pd.DataFrame({"First Name": ["Ada"], "Last Name": ["Lovelace"], "Student ID": ["1"],
+                            "Email": ["ada@example.edu"], "Submission ID": ["10"],
+                            "1: Question": ["first answer"], "2: Question": ["second answer"]})
+
+
+def test_moss_files_include_every_item():
+    [(filename, contents)] = moss.moss_files(SUBMISSIONS)
+    assert filename == "1-Ada-Lovelace.txt"
+    assert "1: Question\n\nfirst answer" in contents
+    assert "2: Question\n\nsecond answer" in contents
+
+
+def test_item_files_match_moss_files():
+    filenames = [filename for filename, _ in moss.moss_item_files(SUBMISSIONS, anonymize=True)]
+    assert filenames == ["001-1-Question/10.txt", "002-2-Question/10.txt"]
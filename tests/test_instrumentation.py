@@ -0,0 +1,41 @@
+import io
+
+from teaching_utilities import instrumentation
+
+
+def log_lines(recorder: instrumentation.Recorder) -> list:
+    return recorder.stream.getvalue().splitlines()
+
+
+def test_short_stage_logged_once():
+    recorder = instrumentation.Recorder(io.StringIO())
+    with recorder.stage("write MOSS files", total=3) as stage:
+        for _ in range(3):
+            stage.advance()
+    [line] = log_lines(recorder)
+    assert line.startswith("write MOSS files: 3/3 (100%)")
+
+
+def test_last_count_not_logged_again(monkeypatch):
+    monkeypatch.setattr(instrumentation, "PROGRESS_INTERVAL", 0.0)
+    recorder = instrumentation.Recorder(io.StringIO())
+    with recorder.stage("write MOSS files", total=2) as stage:
+        stage.advance()
+        stage.advance()
+    assert [line.split(",")[0] for line in log_lines(recorder)] == ["write MOSS files: 1/2 (50%)",
+                                                                    "write MOSS files: 2/2 (100%)"]
+
+
+def test_stage_without_items_logs_its_time():
+    recorder = instrumentation.Recorder(io.StringIO())
+    with recorder.stage("cluster responses"):
+        pass
+    [line] = log_lines(recorder)
+    assert line.startswith("cluster responses: ") and line.endswith("elapsed")
+
+
+def test_eta_with_total():
+    recorder = instrumentation.Recorder(io.StringIO())
+    with recorder.stage("write MOSS files", total=4) as stage:
+        stage.advance(2)
+        assert "ETA" in stage.status()
@@ -0,0 +1,89 @@
+import csv
+import math
+
+import numpy as np
+import pytest
+
+import evaluations
+import item_analysis
+
+# Five students on four right/wrong items, worked by hand below.
+SCORES = np.array([
+    [0, 0, 0, 0],  # total 0, the lower group
+    [1, 0, 0, 0],  # 1
+    [1, 1, 0, 0],  # 2
+    [1, 0, 1, 0],  # 2
+    [1, 1, 0, 1],  # 3, the upper group
+], dtype=np.float64)
+MAX_POINTS = np.ones(4)
+# Item variances (n - 1 = 4): .8/4, 1.2/4, .8/4, .8/4 = .2, .3, .2, .2; they sum to .9.
+# Totals 0, 1, 2, 2, 3: mean 1.6, squared deviations 2.56 + .36 + .16 + .16 + 1.96 = 5.2, variance 1.3.
+ALPHA = 4 / 3 * (1 - 0.9 / 1.3)  # 16/39
+# Without A the totals are 0, 0, 1, 1, 2 (variance .7) and the other items' variances also sum to .7: alpha 0.
+# Without B: 0, 1, 1, 2, 2 (.7) against .6; without C: 0, 1, 2, 1, 3 (1.3) against .7; without D: 0, 1, 2, 2, 2 (.8)
+# against .7.
+ALPHA_IF_DELETED = [0.0, 1.5 * (1 - 0.6 / 0.7), 1.5 * (1 - 0.7 / 1.3), 1.5 * (1 - 0.7 / 0.8)]
+
+
+def test_item_statistics_by_hand():
+    omitted = SCORES == 0
+    statistics = item_analysis.item_statistics(SCORES, MAX_POINTS, omitted)
+    assert statistics["difficulty"] == pytest.approx([0.8, 0.4, 0.2, 0.2])
+    # round(.27 * 5) = 1 student per group: the upper one misses C, the lower one misses everything.
+    assert statistics["discrimination"] == pytest.approx([1, 1, 0, 1])
+    # cov(A, T) sums -.8 * -1.6 + .2 * (-.6 + .4 + .4 + 1.4) = 1.6; A's squared deviations sum to .8.
+    assert statistics["point_biserial"][0] == pytest.approx(1.6 / math.sqrt(0.8 * 5.2))
+    assert statistics["alpha_if_deleted"] == pytest.approx(ALPHA_IF_DELETED)
+    assert statistics["omit_rate"] == pytest.approx([0.2, 0.6, 0.8, 0.8])
+
+
+def test_test_statistics_by_hand():
+    statistics = item_analysis.test_statistics(SCORES, MAX_POINTS)
+    assert statistics["alpha"] == pytest.approx(16 / 39) == pytest.approx(ALPHA)
+    # Every item is right/wrong, so KR-20 is alpha.
+    assert statistics["kr20"] == statistics["alpha"]
+    assert statistics["mean"] == pytest.approx(1.6) and statistics["sd"] == pytest.approx(math.sqrt(1.3))
+    assert statistics["sem"] == pytest.approx(math.sqrt(1.3) * math.sqrt(1 - ALPHA))
+    partial = SCORES * [1, 1, 1, 2]
+    partial[4, 3] = 1
+    assert math.isnan(item_analysis.test_statistics(partial, np.array([1, 1, 1, 2]))["kr20"])
+
+
+def test_alpha_if_deleted_matches_alpha_of_the_rest():
+    scores = np.random.default_rng(3).integers(0, 4, size=(40, 6)).astype(np.float64)
+    expected = [item_analysis.cronbach_alpha(np.delete(scores, item, axis=1)) for item in range(6)]
+    assert item_analysis.alpha_if_deleted(scores) == pytest.approx(expected)
+
+
+def write_item(path, rows):
+    header = ["Assignment Submission ID", "Submission ID", "Question Submission ID", "First Name", "Last Name", "SID",
+              "Email", "Sections", "Score", "Submission Time", "Correct", "No Response", "Adjustment", "Comments",
+              "Grader", "Tags"]
+    with open(path, "w", newline="") as f:
+        csv.writer(f).writerows([header] + rows)
+
+
+def student(submission: str, score: float, no_response: bool = False, tags: str = "") -> list:
+    return ["1", submission, "q" + submission, "First", "Last", "SID" + submission, f"{submission}@example.edu", "",
+            str(score), "", str(score > 0), str(no_response), "", "", "", tags]
+
+
+def test_read_item(tmp_path):
+    path = tmp_path / "2(a) Loops.csv"
+    write_item(path, [student("10", 2, tags="loops, link:2a"), student("11", 0, no_response=True), [],
+                      ["Point Values", "", "", "", "", "", "", "", "", "", "2", "0", "", "", "", ""]])
+    item = evaluations.read_item(str(path))
+    assert item["submissions"] == ["10", "11"] and item["tags"] == ["loops", "link:2a"] and item["part"] == "2a"
+    assert list(item["scores"]) == [2, 0] and list(item["omitted"]) == [False, True]
+    assert item["max_points"] == 2 and item["has_no_response"]
+
+
+def test_empty_item_file(tmp_path):
+    (tmp_path / "1 Intro.csv").touch()
+    write_item(tmp_path / "2 Loops.csv", [student("10", 1), student("11", 0)])
+    empty = evaluations.read_item(str(tmp_path / "1 Intro.csv"))
+    assert empty["submissions"] == [] and len(empty["scores"]) == 0 and empty["max_points"] == 0
+    # Nobody answered the empty item.
+    exam = evaluations.load_exam(str(tmp_path), workers=1)
+    assert exam.items == ["1 Intro", "2 Loops"] and exam.submissions == ["10", "11"]
+    assert exam.omitted[:, 0].all() and list(exam.scores[:, 1]) == [1, 0]
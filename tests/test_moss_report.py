@@ -0,0 +1,63 @@
+import os
+
+import moss_report
+from conftest import FIXTURES
+
+URL = "http://moss.stanford.edu/results/4/2718281828/"
+
+
+def read_fixture() -> str:
+    with open(os.path.join(FIXTURES, "moss_index.html"), encoding="utf-8") as f:
+        return f.read()
+
+
+def test_parse_report():
+    rows = moss_report.parse_report(read_fixture())
+    assert [(row["file1"], row["percent1"], row["file2"], row["percent2"], row["lines"]) for row in rows] == [
+        ("moss/q1/alice.txt", 62, "moss/q1/bob.txt", 91, 48),
+        ("moss/q1/carol.txt", 91, "moss/q1/dave.txt", 88, 48),
+        ("moss/q1/erin (copy).txt", 40, "moss/q1/frank.txt", 35, 130),
+        ("moss/q1/bob.txt", 12, "moss/q1/frank.txt", 9, 7),
+    ]
+    assert rows[0]["url"] == URL + "match0.html"
+
+
+def test_parse_report_ignores_header_and_other_rows():
+    html = ("<TABLE><TR><TH>File 1<TH>File 2<TH>Lines Matched\n"
+            '<TR><TD><A HREF="match0.html">a.txt (50%)</A><TD><A HREF="match0.html">b.txt (40%)</A><TD>12\n'
+            '<TR><TD><A HREF="match1.html">c.txt (50%)</A><TD><A HREF="match1.html">d.txt (40%)</A><TD>n/a\n'
+            '<TR><TD><A HREF="match2.html">e.txt</A><TD><A HREF="match2.html">f.txt</A><TD>3\n'
+            '<TR><TD><A HREF="format.html">How to Read the Results</A><TD>5\n'
+            "<TR><TD>No links here<TD>9\n</TABLE>")
+    rows = moss_report.parse_report(html)
+    assert [(row["file1"], row["file2"]) for row in rows] == [("a.txt", "b.txt")]
+
+
+def test_parse_report_without_rows():
+    assert moss_report.parse_report("<HTML><BODY>Moss Results<p><TABLE></TABLE></BODY></HTML>") == []
+
+
+def test_relative_links_resolved_against_base_url():
+    html = read_fixture().replace(URL, "")
+    assert moss_report.parse_report(html)[1]["url"] == "match1.html"
+    rows = moss_report.parse_report(html, URL + "index.html")
+    assert [row["url"] for row in rows] == [URL + f"match{i}.html" for i in range(4)]
+    # A URL without the trailing slash names a page, so its last segment is replaced.
+    assert moss_report.parse_report(html, URL.rstrip("/"))[0]["url"] == "http://moss.stanford.edu/results/4/match0.html"
+
+
+def test_absolute_links_kept():
+    rows = moss_report.parse_report(read_fixture(), "http://example.edu/mirror/index.html")
+    assert rows[2]["url"] == URL + "match2.html"
+
+
+def test_rank():
+    ranked = moss_report.rank(moss_report.parse_report(read_fixture()))
+    # Ties on the larger percentage go to more lines, then to the larger smaller percentage.
+    assert [(row["rank"], row["url"].rsplit("/", 1)[1]) for row in ranked] == [
+        (1, "match1.html"), (2, "match0.html"), (3, "match2.html"), (4, "match3.html")]
+
+
+def test_rank_lines_break_ties():
+    rows = [{"percent1": 50, "percent2": 70, "lines": 10}, {"percent1": 70, "percent2": 20, "lines": 30}]
+    assert [row["lines"] for row in moss_report.rank(rows)] == [30, 10]
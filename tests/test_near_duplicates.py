@@ -0,0 +1,34 @@
+import pandas as pd
+
+import near_duplicates
+
+WORDS = ["alpha", "bravo", "charlie", "delta", "echo", "foxtrot", "golf", "hotel", "india", "juliet", "kilo", "lima",
+         "mike", "november", "oscar", "papa", "quebec", "romeo", "sierra", "tango", "uniform", "victor", "whiskey",
+         "xray", "yankee", "zulu", "anchor", "beacon", "canyon", "dynamo"]
+# A~B and B~C at about 0.55, A~C at about 0.25.
+A, B, C = (" ".join(WORDS[start:start + 20]) for start in (0, 5, 10))
+
+
+def test_chain_not_merged_through_the_middle():
+    labels, representatives, similarity = near_duplicates.cluster_responses([A, B, C], 0.5)
+    assert labels[0] == labels[1] and labels[2] != labels[0]
+    assert representatives == [0, 0, 2]
+    assert all(value >= 0.5 for value in similarity)
+
+
+def test_every_member_within_threshold_of_representative():
+    texts = [A, B, C, A.upper(), "  " + C, "something else entirely, about tangents and cosines"]
+    labels, representatives, similarity = near_duplicates.cluster_responses(texts, 0.5)
+    # Normalization makes case and whitespace changes exact duplicates.
+    assert labels[3] == labels[0] and labels[4] == labels[2]
+    assert similarity[3] == similarity[4] == 1.0
+    assert len(set(labels)) == 3
+    assert all(texts[representatives[i]] in (A, C, texts[5]) for i in range(len(texts)))
+    assert min(similarity) >= 0.5
+
+
+def test_cluster_columns_sends_representatives():
+    frame = pd.DataFrame({"1: Item": [A, B, C]})
+    clusters, representatives = near_duplicates.cluster_columns(frame, ["1: Item"], 0.5)
+    assert representatives["1: Item"].tolist() == [A, A, C]
+    assert list(clusters.columns) == ["1: Item Cluster", "1: Item Similarity"]
@@ -0,0 +1,82 @@
+import org_inventory
+import ratelimit
+from fake_github import FakeGitHub, GitHubHandler
+from fake_service import serve
+
+INVENTORY = {
+    "organization": "course",
+    "owners": ["instructor0"],
+    "members": ["alice", "bob", "carol"],
+    "repos": [
+        {"name": "hw1-alice", "archived": False, "admin": True, "collaborators": ["alice"]},
+        {"name": "hw1-bob", "archived": False, "admin": True, "collaborators": ["instructor0", "bob"]},
+        {"name": "shared", "archived": False, "admin": False, "collaborators": []},
+        {"name": "hw1-carol", "archived": True, "admin": True, "collaborators": ["carol"]},
+    ],
+    "teams": [
+        {"name": "Team A", "slug": "team-a", "id": 1, "members": ["alice", "bob"]},
+        {"name": "Staff", "slug": "staff", "id": 2, "members": ["instructor0", "carol"]},
+    ],
+}
+
+
+def reasons(plan: list) -> dict:
+    return {(item if isinstance(item, str) else item["name"]): reason or action for item, action, reason in plan}
+
+
+def test_plan_repos():
+    assert reasons(org_inventory.plan_repos(INVENTORY)) == {
+        "hw1-alice": "delete",
+        "hw1-bob": "contains organization owners as collaborators",
+        "shared": "insufficient permissions",
+        "hw1-carol": "delete",
+    }
+    assert reasons(org_inventory.plan_repos(INVENTORY, ignore_owner_check=True))["hw1-bob"] == "delete"
+    assert reasons(org_inventory.plan_repos(INVENTORY, include_repos=["hw1-alice", "shared"],
+                                            backup_failed=["hw1-alice"])) == {
+        "hw1-alice": "backup failed",
+        "hw1-bob": "not in include list",
+        "shared": "insufficient permissions",
+        "hw1-carol": "not in include list",
+    }
+
+
+def test_plan_teams():
+    assert reasons(org_inventory.plan_teams(INVENTORY)) == {"Team A": "delete", "Staff": "contains owners"}
+    assert reasons(org_inventory.plan_teams(INVENTORY, ignore_owner_check=True))["Staff"] == "delete"
+    assert reasons(org_inventory.plan_teams(INVENTORY, include_teams=["Staff"])) == {
+        "Team A": "not in delete list", "Staff": "contains owners"}
+
+
+def test_plan_members():
+    assert reasons(org_inventory.plan_members(INVENTORY)) == {"alice": "remove", "bob": "remove", "carol": "remove"}
+    assert reasons(org_inventory.plan_members(INVENTORY, delete_users=["bob"])) == {
+        "alice": "not in delete list", "bob": "remove", "carol": "not in delete list"}
+
+
+def test_collect_inventory_pages_and_completes_long_lists():
+    # More repositories than a GraphQL page, and collaborator and team member lists longer than a nested page.
+    service = FakeGitHub(repos=120, members=61, owners=2, teams=1, collaborators=1, read_only=2)
+    long = next(iter(service.repos.values()))
+    long["collaborators"] = service.members[:55]
+    server = serve(service, GitHubHandler)
+    limiter = ratelimit.RateLimiter(ratelimit.connect("token", f"http://127.0.0.1:{server.server_port}"),
+                                    interval=0.0)
+    inventory = org_inventory.collect_inventory(limiter, "course")
+
+    assert inventory["owners"] == service.owners and inventory["members"] == service.members
+    assert [repo["name"] for repo in inventory["repos"]] == list(service.repos)
+    repos = {repo["name"]: repo for repo in inventory["repos"]}
+    for name, repo in service.repos.items():
+        assert repos[name]["archived"] == repo["archived"] and repos[name]["admin"] == repo["admin"]
+        if repo["admin"]:
+            assert repos[name]["collaborators"] == service.owners + repo["collaborators"]
+        else:
+            # GraphQL answered null, with an error, for the repositories the token cannot administer.
+            assert repos[name]["collaborators"] == []
+    assert [team["members"] for team in inventory["teams"]] == [service.members]
+    # Two pages of repositories, one each of members and teams.
+    assert service.stats["graphql"] == 4
+
+    plan = reasons(org_inventory.plan_repos(inventory))
+    assert set(plan.values()) == {"contains organization owners as collaborators", "insufficient permissions"}
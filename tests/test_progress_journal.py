@@ -0,0 +1,94 @@
+from conftest import load_script
+from fake_github import FakeGitHub, GitHubHandler
+from fake_service import serve
+from progress_journal import ProgressJournal, print_status
+
+end_term = load_script("github/end-term.py")
+
+ITEMS = ["hw1-alice", "hw1-bob", "hw1-carol"]
+
+
+def identity(item):
+    return item
+
+
+def row(journal: ProgressJournal, stage: str) -> dict:
+    return next(row for row in journal.status("course") if row["stage"] == stage)
+
+
+def test_pending_skips_recorded_objects(capsys):
+    with ProgressJournal(":memory:") as journal:
+        assert journal.pending("repos", "course", ITEMS, identity) == ITEMS
+        journal.record("repos", "course", "hw1-bob")
+        # Another organization's progress is its own.
+        journal.record("repos", "other", "hw1-alice")
+        assert journal.pending("repos", "course", ITEMS, identity) == ["hw1-alice", "hw1-carol"]
+        assert "Resuming repos: 1 of 3 already done" in capsys.readouterr().out
+        assert row(journal, "repos")["done"] == 1 and row(journal, "repos")["total"] == 3
+
+
+def test_resume_after_interruption(tmp_path):
+    path = str(tmp_path / "journal.sqlite")
+    with ProgressJournal(path) as journal:
+        journal.pending("teams", "course", [1, 2, 3, 4], identity)
+        journal.record("teams", "course", 1)
+        journal.record("teams", "course", 3)
+        started = journal.connection.execute("SELECT started_at FROM stages").fetchone()[0]
+    # The process stopped here without finish(); a new run opens the same file.
+    with ProgressJournal(path) as journal:
+        assert journal.pending("teams", "course", [1, 2, 3, 4], identity) == [2, 4]
+        assert journal.connection.execute("SELECT started_at FROM stages").fetchone()[0] == started
+
+
+def test_finish_keeps_the_stage_as_completed(tmp_path, capsys):
+    path = str(tmp_path / "journal.sqlite")
+    with ProgressJournal(path) as journal:
+        journal.pending("clone", "course", ITEMS, identity)
+        for item in ITEMS:
+            journal.record("clone", "course", item)
+        journal.finish("clone", "course")
+        assert journal.completed("clone", "course") == set()
+        clone = row(journal, "clone")
+        assert clone["done"] == clone["total"] == 3 and clone["eta"] == 0.0 and clone["completed"] is not None
+        assert row(journal, "repos")["completed"] is None
+
+        print_status(journal, "course")
+        lines = capsys.readouterr().out.splitlines()
+        assert "remaining: completed" in lines[1] and "3 / 3" in lines[1]
+        assert "remaining: not started" in lines[2]
+
+        # A completed stage is started over by the next run, with nothing skipped.
+        assert journal.pending("clone", "course", ITEMS, identity) == ITEMS
+        assert row(journal, "clone")["completed"] is None and row(journal, "clone")["done"] == 0
+
+
+def test_old_journal_gains_completed_column(tmp_path):
+    path = str(tmp_path / "journal.sqlite")
+    with ProgressJournal(path) as journal:
+        journal.connection.executescript(
+            "DROP TABLE stages; CREATE TABLE stages (stage TEXT NOT NULL, org TEXT NOT NULL, total INTEGER NOT NULL, "
+            "started_at REAL NOT NULL, PRIMARY KEY (stage, org));")
+    with ProgressJournal(path) as journal:
+        journal.pending("members", "course", ITEMS, identity)
+        journal.finish("members", "course")
+        assert row(journal, "members")["completed"] is not None
+
+
+def test_delete_resumes_from_the_journal(tmp_path):
+    service = FakeGitHub(repos=4, members=4, owners=1, teams=0, collaborators=0, read_only=0)
+    server = serve(service, GitHubHandler)
+    limiter = end_term.ratelimit.RateLimiter(
+        end_term.ratelimit.connect("token", f"http://127.0.0.1:{server.server_port}"), interval=0.0)
+    inventory = end_term.org_inventory.collect_inventory(limiter, "course")
+    names = [repo["name"] for repo in inventory["repos"]]
+    with ProgressJournal(str(tmp_path / "journal.sqlite")) as journal:
+        # An interrupted run deleted the first two repositories.
+        journal.pending("repos", "course", names, identity)
+        for name in names[:2]:
+            del service.repos[name]
+            journal.record("repos", "course", name)
+
+        end_term.delete_org_repos("course", "token", ignore_owner_check=True, limiter=limiter, inventory=inventory,
+                                  journal=journal)
+        assert service.stats["deleted"] == 2 and not service.repos
+        assert row(journal, "repos")["completed"] is not None
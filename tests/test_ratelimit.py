@@ -0,0 +1,124 @@
+import time
+
+import pytest
+from github import GithubException
+
+import ratelimit
+from fake_github import FakeGitHub, GitHubHandler
+from fake_service import serve
+
+
+@pytest.fixture
+def sleeps(monkeypatch) -> list:
+    """(seconds, reason) for each wait the limiter asks for, which are recorded instead of slept."""
+    recorded = []
+    monkeypatch.setattr(ratelimit.instrumentation, "sleep",
+                        lambda service, seconds, reason="": recorded.append((round(seconds), reason)))
+    return recorded
+
+
+def limiter_for(service: FakeGitHub, **options) -> ratelimit.RateLimiter:
+    server = serve(service, GitHubHandler)
+    g = ratelimit.connect("token", f"http://127.0.0.1:{server.server_port}")
+    return ratelimit.RateLimiter(g, **options)
+
+
+def get(limiter: ratelimit.RateLimiter, path: str):
+    return limiter.call(limiter.github.requester.requestJsonAndCheck, "GET", path)
+
+
+def delete(limiter: ratelimit.RateLimiter, path: str):
+    # As end-term.py deletes, without fetching the object first.
+    return limiter.call(limiter.github.requester.requestJsonAndCheck, "DELETE", path, mutation=True)
+
+
+def test_retry_delay():
+    assert ratelimit.retry_delay({"Retry-After": "7"}, 0) == 7
+    assert ratelimit.retry_delay({"retry-after": "7", "x-ratelimit-remaining": "0", "x-ratelimit-reset": "500"}, 0) == 7
+    assert ratelimit.retry_delay({"X-RateLimit-Remaining": "0", "X-RateLimit-Reset": "130"}, 0, now=100) == 31
+    assert ratelimit.retry_delay({"Retry-After": "soon"}, 2) == ratelimit.BASE_BACKOFF * 4
+    assert ratelimit.retry_delay({"X-RateLimit-Remaining": "12"}, 1) == ratelimit.BASE_BACKOFF * 2
+
+
+def test_is_rate_limited():
+    assert ratelimit.is_rate_limited(GithubException(429, {}, {}))
+    assert ratelimit.is_rate_limited(GithubException(403, {}, {"Retry-After": "1"}))
+    assert ratelimit.is_rate_limited(GithubException(403, {}, {"X-RateLimit-Remaining": "0"}))
+    assert ratelimit.is_rate_limited(GithubException(403, {"message": "You have exceeded a secondary rate limit."}, {}))
+    assert not ratelimit.is_rate_limited(GithubException(403, {"message": "Must have admin rights to Repository."}, {}))
+    assert not ratelimit.is_rate_limited(GithubException(404, {"message": "Not Found"}, {}))
+
+
+def test_429_retried_after_retry_after(sleeps):
+    limiter = ratelimit.RateLimiter(ratelimit.connect("token", "http://127.0.0.1:1"), reserve=0)
+    responses = [GithubException(429, {"message": "Too many requests"}, {"Retry-After": "3"}), "done"]
+
+    def request():
+        response = responses.pop(0)
+        if isinstance(response, Exception):
+            raise response
+        return response
+
+    assert limiter.call(request) == "done"
+    assert limiter.retries == 1
+    assert sleeps == [(3, "rate limited")]
+
+
+def test_other_errors_not_retried(sleeps):
+    limiter = limiter_for(FakeGitHub(repos=2, members=2, teams=0, read_only=1))
+    with pytest.raises(GithubException) as error:
+        delete(limiter, "/repos/course/hw2-student1")
+    assert error.value.status == 403
+    assert limiter.retries == 0 and sleeps == []
+
+
+def test_exhausted_quota_waits_for_reset(monkeypatch):
+    service = FakeGitHub(repos=2, members=2, teams=0, quota=2)
+    limiter = limiter_for(service, reserve=0)
+    sleeps = []
+
+    def sleep(service_name, seconds, reason=""):
+        # The fake's quota comes back once the limiter has waited for the reset.
+        sleeps.append((round(seconds), reason))
+        service.remaining = service.quota
+
+    monkeypatch.setattr(ratelimit.instrumentation, "sleep", sleep)
+    service.reset = int(time.time()) + 30
+    for _ in range(3):
+        get(limiter, "/orgs/course")
+    assert limiter.retries == 1
+    assert len(sleeps) == 1 and 29 <= sleeps[0][0] <= 32
+
+
+def test_reserve_waits_before_the_quota_runs_out(sleeps):
+    service = FakeGitHub(repos=2, members=2, teams=0, quota=10)
+    limiter = limiter_for(service, reserve=9)
+    service.reset = int(time.time()) + 60
+    for _ in range(3):
+        get(limiter, "/orgs/course")
+    # Two calls leave 8 of the quota, below the reserve, so the third waits for the reset.
+    assert [reason for _, reason in sleeps] == ["rate limit nearly exhausted"]
+    assert 59 <= sleeps[0][0] <= 62
+    assert limiter.retries == 0 and service.stats["rate_limited"] == 0
+
+
+def test_mutations_are_paced():
+    service = FakeGitHub(repos=6, members=6, teams=0, mutation_gap=0.05, read_only=0)
+    limiter = limiter_for(service, workers=4, interval=0.08)
+    paths = [f"/repos/course/{name}" for name in service.repos]
+    start = time.monotonic()
+    limiter.run(lambda path: delete(limiter, path), paths)
+    assert time.monotonic() - start >= 5 * 0.08
+    assert service.repos == {}
+    assert limiter.retries == 0 and service.stats["secondary_limited"] == 0
+
+
+def test_secondary_limit_retried_and_slows_mutations():
+    service = FakeGitHub(repos=6, members=6, teams=0, mutation_gap=0.05, retry_after=0, read_only=0)
+    limiter = limiter_for(service, workers=4, interval=0.0)
+    paths = [f"/repos/course/{name}" for name in service.repos]
+    limiter.run(lambda path: delete(limiter, path), paths)
+    assert service.repos == {}
+    assert limiter.retries >= 1 and limiter.retries == service.stats["secondary_limited"]
+    # Each secondary limit doubles the interval, starting from at least 0.1s.
+    assert limiter.interval >= 0.1
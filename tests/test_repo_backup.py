@@ -0,0 +1,116 @@
+import os
+import shutil
+import subprocess
+
+import pytest
+
+import repo_backup
+
+
+def git(*args, cwd=None) -> str:
+    return subprocess.run(["git", *args], cwd=cwd, check=True, capture_output=True, text=True).stdout
+
+
+@pytest.fixture(autouse=True)
+def identity(monkeypatch):
+    for variable in ("GIT_AUTHOR", "GIT_COMMITTER"):
+        monkeypatch.setenv(f"{variable}_NAME", "Instructor")
+        monkeypatch.setenv(f"{variable}_EMAIL", "instructor@example.edu")
+
+
+@pytest.fixture
+def classroom(tmp_path) -> dict:
+    """Bare repositories for hw1-alice and hw1-john-doe, both copies of a hw1 template, and project-carol."""
+    work = tmp_path / "work"
+    git("init", "-q", "-b", "main", str(work / "template"))
+    (work / "template" / "starter.py").write_text("print('starter code')\n" * 200)
+    git("add", ".", cwd=work / "template")
+    git("commit", "-q", "-m", "Starter code", cwd=work / "template")
+    remotes = {}
+    for name in ("hw1-alice", "hw1-john-doe", "project-carol"):
+        git("clone", "-q", str(work / "template"), str(work / name))
+        (work / name / "solution.py").write_text(f"print('{name}')\n")
+        git("add", ".", cwd=work / name)
+        git("commit", "-q", "-m", "Solution", cwd=work / name)
+        remote = tmp_path / "remote" / f"{name}.git"
+        git("clone", "-q", "--bare", str(work / name), str(remote))
+        # A file:// URL goes through the transport, as a clone from GitHub does, instead of copying the objects.
+        remotes[name] = remote.as_uri()
+    return remotes
+
+
+def alternates(path: str) -> list:
+    file = os.path.join(path, ".git", "objects", "info", "alternates")
+    if not os.path.exists(file):
+        return []
+    with open(file) as f:
+        return f.read().split()
+
+
+LOGINS = {"alice", "john-doe", "carol"}
+
+
+def assignments_for(names) -> dict:
+    return {name: repo_backup.assignment_name(name, logins=LOGINS) for name in names}
+
+
+def test_assignment_name():
+    assert repo_backup.assignment_name("hw1-alice", logins=LOGINS) == "hw1"
+    # A login with a '-' of its own is stripped whole.
+    assert repo_backup.assignment_name("hw1-john-doe", logins=LOGINS) == "hw1"
+    assert repo_backup.assignment_name("lab-2-John-Doe", logins=LOGINS) == "lab-2"
+    assert repo_backup.assignment_name("lab-2-octo-cat", prefixes=["lab-2-", "lab-"]) == "lab-2"
+    assert repo_backup.assignment_name("hw1-alice", template="hw1-starter") == "hw1-starter"
+    # Without a known login there is no assignment, and the repository is cloned on its own.
+    assert repo_backup.assignment_name("hw1-mallory", logins=LOGINS) is None
+    assert repo_backup.assignment_name("hw1", logins=LOGINS) is None
+    assert repo_backup.assignment_name("alice", logins=LOGINS) is None
+
+
+def test_deduplicated_clones_borrow_from_store(classroom, tmp_path):
+    backup = tmp_path / "backup"
+    jobs = [(name, url, str(backup / name)) for name, url in classroom.items()]
+    assignments = assignments_for(classroom)
+    results = repo_backup.backup_deduplicated(jobs, str(backup), assignments, workers=2)
+
+    assert sorted((result["name"], result["action"], result["error"]) for result in results) == [
+        ("hw1-alice", "cloned", None), ("hw1-john-doe", "cloned", None), ("project-carol", "cloned", None)]
+    store = repo_backup.store_path(str(backup), "hw1")
+    assert sorted(os.listdir(backup / repo_backup.OBJECT_STORE)) == ["hw1.git"]
+    assert git("config", "gc.auto", cwd=store).strip() == "0"
+    assert git("config", "gc.pruneExpire", cwd=store).strip() == "never"
+    for name in ("hw1-alice", "hw1-john-doe"):
+        assert alternates(str(backup / name)) == [os.path.join(os.path.abspath(store), "objects")]
+        assert (backup / name / "solution.py").read_text() == f"print('{name}')\n"
+    # An assignment of one has nothing to share and is cloned on its own.
+    assert alternates(str(backup / "project-carol")) == []
+
+
+def test_second_backup_fetches(classroom, tmp_path):
+    backup = tmp_path / "backup"
+    jobs = [(name, url, str(backup / name)) for name, url in classroom.items()]
+    assignments = assignments_for(classroom)
+    repo_backup.backup_deduplicated(jobs, str(backup), assignments, workers=2)
+    results = repo_backup.backup_deduplicated(jobs, str(backup), assignments, workers=2)
+    assert {result["action"] for result in results} == {"fetched"}
+
+
+def test_restore_is_standalone(classroom, tmp_path):
+    backup = tmp_path / "backup"
+    jobs = [(name, url, str(backup / name)) for name, url in classroom.items()]
+    assignments = assignments_for(classroom)
+    repo_backup.backup_deduplicated(jobs, str(backup), assignments, workers=2)
+
+    restored, bare = tmp_path / "restored" / "hw1-alice", tmp_path / "restored" / "hw1-alice.git"
+    repo_backup.restore_repo(str(backup / "hw1-alice"), str(restored))
+    repo_backup.restore_repo(str(backup / "hw1-alice"), str(bare), bare=True)
+    # Without the object store, the borrowing backup is broken and the restored copies are not.
+    shutil.rmtree(backup / repo_backup.OBJECT_STORE)
+    with pytest.raises(subprocess.CalledProcessError):
+        git("fsck", "--full", cwd=backup / "hw1-alice")
+    assert alternates(str(restored)) == []
+    assert not os.path.exists(bare / "objects" / "info" / "alternates")
+    for path in (restored, bare):
+        git("fsck", "--full", cwd=path)
+    assert (restored / "starter.py").exists()
+    assert git("log", "--format=%s", cwd=bare).split("\n")[:2] == ["Solution", "Starter code"]
@@ -0,0 +1,92 @@
+import pytest
+
+import drive_api
+from conftest import load_script
+from drive_api import DriveClient
+from fake_drive import DriveHandler, FakeDrive
+from fake_service import serve
+
+revoke = load_script("drive/revoke-access.py")
+
+
+@pytest.fixture(autouse=True)
+def no_backoff(monkeypatch):
+    monkeypatch.setattr(drive_api.instrumentation, "sleep", lambda service, seconds, reason="": None)
+
+
+def client_for(drive: FakeDrive) -> DriveClient:
+    server = serve(drive, DriveHandler)
+    return DriveClient("token", api_url=f"http://127.0.0.1:{server.server_port}")
+
+
+def share(role: str, kind: str = "user", email: str = "student@example.edu", **fields) -> dict:
+    return dict({"id": f"{kind}-{role}", "type": kind, "role": role, "emailAddress": email}, **fields)
+
+
+def test_revocable_matches_the_apps_script():
+    permissions = [share("owner"), share("reader"), share("commenter"), share("writer", "group"),
+                   share("reader", "anyone", None), share("writer", "domain", None),
+                   share("writer", email="staff@example.edu",
+                         permissionDetails=[{"permissionType": "file", "inherited": True}]),
+                   share("reader", email="Co-Instructor@example.edu")]
+    roles = [(permission["type"], permission["role"])
+             for permission in revoke.revocable(permissions, {"co-instructor@example.edu"})]
+    assert roles == [("user", "reader"), ("user", "commenter"), ("group", "writer")]
+    every = revoke.revocable(permissions, {"co-instructor@example.edu"}, all_sharing=True)
+    assert [permission["type"] for permission in every] == ["user", "user", "group", "anyone", "domain"]
+
+
+def test_batch_delete_reports_each_status():
+    drive = FakeDrive(depth=0, files=2, permissions=2, shared_drive=True)
+    with client_for(drive) as client:
+        statuses = client.delete_permissions([("root-f0", "root-f0-p0"), ("root-f0", "root-f0-p0"),
+                                              ("root-f1", "staff"), ("root-f1", "root-f1-p1")])
+    assert statuses == [204, 404, 403, 204]
+    assert drive.stats["batches"] == 1
+    assert set(drive.files["root-f0"]["permissions"]) == {"owner", "root-f0-p1", "staff"}
+
+
+def test_batch_retries_rate_limited_calls():
+    drive = FakeDrive(depth=0, files=3, permissions=3, rate_limit_every=4)
+    pairs = [(f"root-f{i}", f"root-f{i}-p{j}") for i in range(3) for j in range(3)]
+    with client_for(drive) as client:
+        assert client.delete_permissions(pairs) == [204] * len(pairs)
+        assert client.retries > 0
+    assert drive.stats["rate_limited"] > 0
+    # Only the share of the folder itself is left.
+    assert drive.remaining() == 1
+
+
+def test_file_permissions_through_batch():
+    drive = FakeDrive(depth=0, files=3, permissions=3, shared_drive=True)
+    with client_for(drive) as client:
+        permissions = client.file_permissions(["root-f0", "root-f1", "root-f2"])
+    assert drive.stats["batches"] == 1
+    assert [sorted(permission["id"] for permission in listed) for listed in permissions] == \
+           [sorted(["owner", "staff", f"root-f{i}-p0", f"root-f{i}-p1", f"root-f{i}-p2"]) for i in range(3)]
+
+
+@pytest.mark.parametrize("shared_drive", [False, True])
+def test_revoke_tree_removes_every_share(shared_drive):
+    drive = FakeDrive(depth=2, fanout=2, files=4, permissions=3, shared_drive=shared_drive)
+    with client_for(drive) as client:
+        counts = revoke.revoke_tree(client, revoke.Checkpoint(None, "root"), ["*"], folders=True, workers=4,
+                                    batch_size=5)
+    # Commenters go by default; the owner and shares inherited from the shared drive stay. The root folder is
+    # fetched on its own, so only the subfolders count as files.
+    assert drive.remaining() == 0
+    assert counts["folders"] == 7 and counts["files"] == 6 + 28
+    assert counts["revoked"] == 7 + 28 * 3 and counts["failed"] == 0
+    assert all(permission["role"] == "owner" or FakeDrive.inherited(permission)
+               for file in drive.files.values() for permission in file["permissions"].values())
+
+
+def test_revoke_tree_keeps_addresses_and_dry_run_removes_nothing():
+    drive = FakeDrive(depth=0, files=4, permissions=3)
+    with client_for(drive) as client:
+        dry = revoke.revoke_tree(client, revoke.Checkpoint(None, "root"), ["*"], dry_run=True)
+        assert dry["would remove"] == 12 and drive.stats["deletes"] == 0
+        counts = revoke.revoke_tree(client, revoke.Checkpoint(None, "root"), ["*"], keep={"student1@example.edu"})
+    assert counts["revoked"] == 8
+    # The kept writer on each file, and the folder's own share.
+    assert drive.remaining() == 4 + 1
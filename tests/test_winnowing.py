@@ -0,0 +1,108 @@
+import random
+
+import winnowing
+
+ORIGINAL = '''# Bubble sort, assignment 3
+def bubble_sort(values):
+    n = len(values)
+    for i in range(n):
+        for j in range(0, n - i - 1):
+            if values[j] > values[j + 1]:
+                values[j], values[j + 1] = values[j + 1], values[j]
+    return values
+
+print(bubble_sort([5, 2, 9, 1]), "# sorted")
+'''
+
+# The same program with every identifier renamed, other literals and different comments.
+RENAMED = '''def sort_list(items):
+    # my own work
+    length = len(items)
+    for a in range(length):
+        for b in range(0, length - a - 1):
+            if items[b] > items[b + 1]:  # swap them
+                items[b], items[b + 1] = items[b + 1], items[b]
+    return items
+
+print(sort_list([3, 8, 4, 7]), "done")
+'''
+
+UNRELATED = '''import math
+
+class Circle:
+    def __init__(self, radius):
+        self.radius = radius
+
+    def area(self):
+        return math.pi * self.radius ** 2
+
+    def scale(self, factor):
+        return Circle(self.radius * factor)
+
+print(Circle(2).scale(3).area())
+'''
+
+
+def test_comment_markers_inside_strings_are_kept():
+    assert winnowing.strip_comments('x = "#1"  # note\n', "python") == 'x = "#1"        \n'
+    assert winnowing.strip_comments('url = "http://x"; // note', "c") == 'url = "http://x";        '
+    assert winnowing.strip_comments("select '--' -- note", "sql") == "select '--'        "
+    assert winnowing.strip_comments('s = "/* not */"; /* a\ncomment */ t;', "java") == \
+           's = "/* not */";     \n           t;'
+    assert winnowing.strip_comments('"""docstring # not a comment\n"""\n', "python") == \
+           '"""docstring # not a comment\n"""\n'
+    assert [token for token, _ in winnowing.tokenize('x = "a#b" + 1  # c', "python")] == ["V", "=", "S", "+", "N"]
+
+
+def test_comments_keep_line_numbers():
+    tokens = winnowing.tokenize("/* one\ntwo */ int x;\n// three\nreturn x;", "c")
+    assert tokens == [("int", 2), ("V", 2), (";", 2), ("return", 4), ("V", 4), (";", 4)]
+
+
+def test_renaming_does_not_change_fingerprints():
+    # Only the line numbers differ: the copy moved its first comment below the def.
+    assert [value for value, _, _ in winnowing.winnow(winnowing.tokenize(ORIGINAL, "python"))] == \
+           [value for value, _, _ in winnowing.winnow(winnowing.tokenize(RENAMED, "python"))]
+
+
+def test_shared_run_guarantees_a_shared_fingerprint():
+    # Any common run of at least k + w - 1 tokens shares a fingerprint, whatever surrounds it.
+    generator = random.Random(1)
+    for _ in range(20):
+        common = [str(generator.randrange(1000)) for _ in range(winnowing.K + winnowing.WINDOW - 1)]
+        a = [str(generator.randrange(1000)) for _ in range(generator.randrange(30))] + common
+        b = common + [str(generator.randrange(1000)) for _ in range(generator.randrange(30))]
+        prints_a = {value for value, _, _ in winnowing.winnow([(token, 1) for token in a])}
+        prints_b = {value for value, _, _ in winnowing.winnow([(token, 1) for token in b])}
+        assert prints_a & prints_b
+
+
+def test_winnow_lines_and_short_documents():
+    tokens = [(f"t{i}", i // 3 + 1) for i in range(30)]
+    prints = winnowing.winnow(tokens)
+    # Each fingerprint covers the lines of its k-gram, and no window of w k-grams goes without one.
+    assert all(last - first <= (winnowing.K - 1) // 3 + 1 for _, first, last in prints)
+    assert len(prints) >= (30 - winnowing.K + 1) // winnowing.WINDOW
+    assert winnowing.winnow([("a", 1), ("b", 2)]) == [(winnowing.kgram_hash(["a", "b"]), 1, 2)]
+    assert winnowing.winnow([]) == []
+
+
+def test_renamed_copy_ranks_first(tmp_path):
+    documents = {"original.py": ORIGINAL, "unrelated.py": UNRELATED, "renamed.py": RENAMED}
+    paths = []
+    for name, source in documents.items():
+        (tmp_path / name).write_text(source)
+        paths.append(str(tmp_path / name))
+    prints = winnowing.fingerprint_files(paths, "python", workers=1)
+
+    pairs = winnowing.rank_pairs(prints)
+    assert (pairs[0]["a"], pairs[0]["b"]) == (0, 2)
+    assert pairs[0]["percent_a"] == pairs[0]["percent_b"] == 100.0
+    assert all(max(pair["percent_a"], pair["percent_b"]) < 50 for pair in pairs[1:])
+    ranges_a, ranges_b = winnowing.matched_lines(prints[0], prints[2])
+    assert ranges_a[0][0] <= 2 and ranges_b[0][0] <= 1
+
+    # Ignoring every hash the two share leaves nothing to rank them by.
+    shared = {value for value, _, _ in prints[0]} & {value for value, _, _ in prints[2]}
+    assert all({pair["a"], pair["b"]} != {0, 2} for pair in winnowing.rank_pairs(prints, ignore=shared))
+    assert winnowing.rank_pairs(prints, min_shared=10 ** 6) == []